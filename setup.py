@@ -53,6 +53,7 @@ setuptools.setup(name="bexchange",
             "server_info = bexchange.client.cmd:ServerInfo",
             "file_arrival = bexchange.client.cmd:FileArrival",
             "supervise = bexchange.client.cmd:Supervise",
+            "job_status = bexchange.client.cmd:JobStatus",
         ],
         "bexchange.config.commands": [
             "create_keys = bexchange.client.cfgcmd:CreateKeys",
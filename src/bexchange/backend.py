@@ -57,6 +57,7 @@ class Backend(object):
         :param json_message: The json message
         :type path: string
         :param nodename: The origin that sent the message
+        :return: list of jobs that were submitted to the job executor
         """
         raise NotImplementedError()
 
@@ -90,3 +91,44 @@ class Backend(object):
         :return the temporary folder name
         """
         raise NotImplementedError()
+
+    def get_spool(self):
+        """Returns the spool manager used for sharing published files
+        :return the spool manager or None if files aren't spooled
+        """
+        return None
+
+    def get_decorator_pool(self):
+        """Returns the pool used for running decorators in separate processes
+        :return the decorator pool or None if decorators are run in the publisher threads
+        """
+        return None
+
+    def get_decoration_cache(self):
+        """Returns the cache used for sharing decorated files between publishers
+        :return the decoration cache or None if decorated files aren't cached
+        """
+        return None
+
+    def get_arrival_index(self):
+        """Returns the in-memory index of recent file arrivals used for supervision
+        :return the arrival index or None if supervision queries always uses the statistics database
+        """
+        return None
+
+    def shutdown(self):
+        """Stops any background processing so that the server can be stopped without loosing accepted files
+        """
+        pass
+
+    def get_job_executor(self):
+        """Returns the executor running triggered jobs
+        :return the job executor or None if triggered jobs are run in the request thread
+        """
+        return None
+
+    def get_fetch_state(self):
+        """Returns the store keeping track of files fetched by the fetchers
+        :return the fetch state or None if the fetchers fetches all matching files on each trigger
+        """
+        return None
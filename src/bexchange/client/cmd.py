@@ -38,7 +38,6 @@ from http import client as httplibclient
 
 # This should always be available
 from baltradcrypto import crypto
-from baltradcrypto.crypto import keyczarcrypto
 from baltradutils import resources
 
 class ExecutionError(RuntimeError):
@@ -249,7 +248,30 @@ Example: baltrad-exchange-client post_message '{"trigger":"trigger_4"}'
         parser.set_usage(usage)
 
     def execute(self, server, opts, args):
-        entry = server.post_json_message(args[0])
+        jobs = server.post_json_message(args[0])
+        for j in jobs:
+            print("%s %s %s"%(j["id"], j["name"], j["state"]))
+
+class JobStatus(Command):
+    def update_optionparser(self, parser):
+        usg = parser.get_usage().strip()
+
+        description = """
+
+Queries the exchange server for the status of a job. The job id is printed by post_message when
+the server runs the triggered job in the background.
+
+Example: baltrad-exchange-client job_status 5b1d4c3e-7a3c-4f0e-9c1e-2a3b4c5d6e7f
+        """
+
+        usage = usg + " JOB_ID" + description
+
+        parser.set_usage(usage)
+
+    def execute(self, server, opts, args):
+        if len(args) != 1:
+            raise ExecutionError("Expected a job id")
+        print(json.dumps(server.get_job(args[0]), indent=2))
 
 class GetStatistics(Command):
     def update_optionparser(self, parser):
@@ -300,9 +322,18 @@ Example: baltrad-exchange-client get_statistics --spid=server-incomming --totals
             help="The origins that should be included in query"
         )
 
+        parser.add_option(
+            "--after_id", dest="after_id", type="int", default=None,
+            help="Only return entries with an id greater than this. Use the id of the last entry in previous result to get next page"
+        )
+
+        parser.add_option(
+            "--limit", dest="limit", type="int", default=None,
+            help="Max number of entries to return. The entries will be ordered by id"
+        )
 
     def execute(self, server, opts, args):
-        response = server.get_statistics(opts.spid, opts.sources, opts.totals, opts.method, opts.filter, opts.object_type, opts.origins)
+        response = server.get_statistics(opts.spid, opts.sources, opts.totals, opts.method, opts.filter, opts.object_type, opts.origins, opts.after_id, opts.limit)
         if response.status == httplibclient.OK:
             ldata = json.loads(response.read())
             for l in ldata:
@@ -348,6 +379,20 @@ Provides some useful information about the server. Currently the following thing
 
   publickey - The public key that can be used to identify myself as
 
+  ingest    - Information about the asynchronous ingest queue, like depth and wait times
+
+  routing   - Information about the routing indexes for subscriptions and publications, like bucket sizes
+
+  spool     - Information about the spool used for sharing published files, like number of files and references
+
+  decorators - Information about the decoration cache, like number of cached files, hits and misses
+
+  statistics - Information about the statistics recorder, like pending entries and flush times
+
+  arrivals  - Information about the arrival index used for supervision, like number of queries answered from memory
+
+  jobs      - Information about the job executor running triggered jobs, like number of queued and coalesced jobs
+
 Example: baltrad-exchange-client server_info uptime
         """
 
@@ -357,7 +402,7 @@ Example: baltrad-exchange-client server_info uptime
 
     def execute(self, server, opts, args):
         if len(args) == 1:
-            if args[0] == "uptime" or args[0] == "nodename" or args[0] == "publickey":
+            if args[0] in ["uptime", "nodename", "publickey", "ingest", "routing", "spool", "decorators", "statistics", "arrivals", "jobs"]:
                 response = server.get_server_info(args[0])
                 if response.status == httplibclient.OK:
                     if args[0] != "publickey":
@@ -369,7 +414,7 @@ Example: baltrad-exchange-client server_info uptime
                 else:
                     raise Exception("Unhandled response code: %s"%response.status)
             else:
-                print("Only valid subcommands are uptime and nodename")
+                print("Only valid subcommands are uptime, nodename, publickey, ingest, routing, spool, decorators, statistics, arrivals and jobs")
 
 class FileArrival(Command):
     def update_optionparser(self, parser):
@@ -423,6 +468,12 @@ Functionality for supervising a node. Usually, the response will be a string tha
 
 Example: baltrad-exchange-client supervise --type=filearrival --source=sella --object_type=PVOL --limit=300
 OK
+
+It is also possible to check several sources in one request by specifying a file containing a json list of checks.
+Each check can contain the members source, origins, object_type, limit, entrylimit, delay and count.
+The status of each check is printed and the overall status is returned.
+
+Example: baltrad-exchange-client supervise --batch=checks.json
         """
 
         usage = usg + description
@@ -466,10 +517,31 @@ OK
             help="Counts matches and validates that there are at least count number of occurances."
         )
 
+        parser.add_option(
+            "--batch", dest="batch", default=None,
+            help="A json file containing a list of checks that should be performed in one request."
+        )
+
     def execute(self, server, opts, args):
+        if opts.batch:
+            return self.execute_batch(server, opts.batch)
         response = server.supervise(opts.infotype, opts.source, opts.origins, opts.object_type, opts.limit, opts.entrylimit, opts.delay, opts.count)
         if response.status == httplibclient.OK:
             ldata = json.loads(response.read())
             return ldata["status"]
         else:
             return '{"status":"ERROR"}'
+
+    def execute_batch(self, server, filename):
+        with open(filename) as fp:
+            checks = json.load(fp)
+        if isinstance(checks, dict):
+            checks = checks["checks"]
+        response = server.supervise_batch(checks)
+        if response.status == httplibclient.OK:
+            ldata = json.loads(response.read())
+            for check in ldata["checks"]:
+                print("%s %s %s"%(check.get("source", ""), check.get("object_type", "") or "", check["status"]))
+            return ldata["status"]
+        else:
+            return '{"status":"ERROR"}'
@@ -35,7 +35,6 @@ import hashlib
 
 from http import client as httplibclient
 
-from baltradcrypto.crypto import keyczarcrypto
 from baltradcrypto import crypto
 from bexchange.net.exceptions import DuplicateException
 
@@ -80,7 +79,7 @@ class RestfulServer(object):
 
         response = self.execute_request(request)
         
-        if response.status == httplibclient.OK:
+        if response.status == httplibclient.OK or response.status == httplibclient.ACCEPTED:
             return True
         elif response.status == httplibclient.CONFLICT:
             raise DuplicateException("Duplicate file, response status: %s"%response.status)
@@ -92,6 +91,7 @@ class RestfulServer(object):
     def post_json_message(self, json_message):
         """posts a json message to the exchange server. 
         :param data: The data
+        :return: list of jobs that were submitted by the server
         """
         request = Request(
             "POST", "/json_message/", json_message,
@@ -104,14 +104,41 @@ class RestfulServer(object):
 
         response = self.execute_request(request)
         
+        if response.status in (httplibclient.OK, httplibclient.ACCEPTED):
+            data = response.read()
+            if not data:
+                return []
+            return json.loads(data).get("jobs", [])
+        else:
+            raise RuntimeError(
+                "Unhandled response code: %s" % response.status
+            )
+
+    def get_job(self, job_id):
+        """queries the exchange server for the status of a job
+        :param job_id: the job id returned when posting a json message
+        :return: the job as a dictionary
+        """
+        request = Request(
+            "GET", "/jobs/%s"%job_id,
+            headers={
+                "content-type": "application/json",
+                "message-id": str(uuid.uuid4()),
+                "date":datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+            }
+        )
+
+        response = self.execute_request(request)
         if response.status == httplibclient.OK:
-            return True
+            return json.loads(response.read())
+        elif response.status == httplibclient.NOT_FOUND:
+            raise LookupError("No such job: %s"%job_id)
         else:
             raise RuntimeError(
                 "Unhandled response code: %s" % response.status
             )
 
-    def get_statistics(self, spid, sources, totals=False, qmethod=None, qfilter=None, object_type=None, origins=None):
+    def get_statistics(self, spid, sources, totals=False, qmethod=None, qfilter=None, object_type=None, origins=None, after_id=None, limit=None):
         """posts a json message to the exchange server. 
         :param data: The data
         """
@@ -122,7 +149,9 @@ class RestfulServer(object):
             "method":qmethod,
             "filter":qfilter,
             "object_type":object_type,
-            "origins":origins
+            "origins":origins,
+            "after_id":after_id,
+            "limit":limit
         }
         request = Request(
             "GET", "/statistics/", json.dumps(json_message_d),
@@ -217,6 +246,26 @@ class RestfulServer(object):
         response = self.execute_request(request)
         return response
 
+    def supervise_batch(self, checks):
+        """posts a batch of supervision checks to the exchange server.
+        :param checks: a list of dictionaries with the members source, origins, object_type, limit, entrylimit, delay and count
+        """
+        json_message_d = {
+            "checks":checks
+        }
+
+        request = Request(
+            "GET", "/supervise/batch",json.dumps(json_message_d),
+            headers={
+                "content-type": "application/json",
+                "message-id": str(uuid.uuid4()),
+                "date":datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+            }
+        )
+
+        response = self.execute_request(request)
+        return response
+
     def execute_request(self, req):
         """Exececutes the actual rest request over http or https. Will also add credentials to the request
         :param req: The REST request
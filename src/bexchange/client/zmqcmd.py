@@ -128,6 +128,12 @@ Connects to a publisher and monitors the published files.
             default=False,
             help="If quantities should be extracted or not. Default False.")
 
+        parser.add_option(
+            "--sqlite_profile",
+            action="store_true",
+            default=False,
+            help="If the sqlite profile (WAL journal, synchronous=NORMAL, busy timeout and pooled connections) should be used for the db-file. Default False.")
+
     def execute(self, opts, args):
         try:
             import zmq
@@ -137,5 +143,9 @@ Connects to a publisher and monitors the published files.
         from bexchange.net.zmq.zmqmonitor import zmqmonitor
 
         logger.info("Starting monitor")
-        monitor = zmqmonitor(opts.address, opts.hmac, opts.dburi, opts.tmpdir, opts.quantities)
+        profile = None
+        if opts.sqlite_profile:
+            from bexchange.db.util import sqlite_profile
+            profile = sqlite_profile()
+        monitor = zmqmonitor(opts.address, opts.hmac, opts.dburi, opts.tmpdir, opts.quantities, profile)
         monitor.run(opts.nrfiles)
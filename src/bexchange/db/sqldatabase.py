@@ -28,7 +28,7 @@ import contextlib
 import datetime
 import logging
 
-from sqlalchemy import asc,desc,func,text
+from sqlalchemy import asc,desc,func,text,inspect
 from sqlalchemy import engine, event, exc as sqlexc, sql
 from sqlalchemy.orm import registry, sessionmaker
 
@@ -44,6 +44,7 @@ from sqlalchemy.types import (
 from sqlalchemy import (
     Column,
     ForeignKey,
+    Index,
     MetaData,
     PrimaryKeyConstraint,
     UniqueConstraint,
@@ -83,7 +84,10 @@ db_statentry = Table("exchange_statentry", dbmeta,
                 Column("datetime", DateTime, nullable=True),
                 Column("object_type", Text, nullable=True),
                 Column("elevation_angle", Float, nullable=True),
-                UniqueConstraint("spid", "origin", "source", "entrytime")
+                UniqueConstraint("spid", "origin", "source", "entrytime"),
+                Index("exchange_statentry_spid_source_datetime_idx", "spid", "source", "datetime"),
+                Index("exchange_statentry_spid_datetime_idx", "spid", "datetime"),
+                Index("exchange_statentry_entrytime_idx", "entrytime")
 )
 
 class statistics(object):
@@ -149,6 +153,8 @@ class statentry(object):
             "object_type":self.object_type,
             "elevation_angle":self.elevation_angle
         }
+        if self.id is not None:
+            result["id"] = self.id
         if "attributes" in self.__dict__:
             for a in self.attributes:
                 result[a] = self.attributes[a]
@@ -175,12 +181,13 @@ def force_sqlite_foreign_keys(dbapi_con, con_record):
         dbapi_con.execute("pragma foreign_keys=ON")
 
 class SqlAlchemyDatabase(object):
-    def __init__(self, uri="sqlite:///tmp/baltrad-exchange.db", poolsize=10):
+    def __init__(self, uri="sqlite:///tmp/baltrad-exchange.db", poolsize=10, sqlite_profile=None):
         """Constructor
         :param uri: The uri pointing to the database.
         :param poolsize: How many database connections we should use
+        :param sqlite_profile: the bexchange.db.util.sqlite_profile to use if the uri points to a sqlite file
         """
-        self._engine = dbutil.create_engine_from_url(uri, poolsize)
+        self._engine = dbutil.create_engine_from_url(uri, poolsize, sqlite_profile)
         if self._engine.driver == "pysqlite":
             event.listen(self._engine, "connect", force_sqlite_foreign_keys)
         self.init_tables()
@@ -195,8 +202,21 @@ class SqlAlchemyDatabase(object):
 
     def init_tables(self):
         dbmeta.create_all(self._engine)
+        self.migrate_tables()
         logger.info("Initialized alchemy database")
 
+    def migrate_tables(self):
+        """Upgrades tables created by earlier versions in place. create_all only creates the indexes
+        when the table is created so indexes that has been added afterwards are created here.
+        """
+        inspector = inspect(self._engine)
+        for table in dbmeta.sorted_tables:
+            existing = set([i["name"] for i in inspector.get_indexes(table.name)])
+            for index in table.indexes:
+                if index.name not in existing:
+                    logger.info("Creating index %s on %s"%(index.name, table.name))
+                    index.create(self._engine)
+
     def get_connection(self):
         """get a context managed connection to the database
         """
@@ -232,7 +252,19 @@ class SqlAlchemyDatabase(object):
                 q = q.filter(statistics.source.in_(sources))
             return q.all()
 
-    def find_statentries(self, spid, origins, sources, hashid=None, filters=None, object_type=None):
+    def find_statentries(self, spid, origins, sources, hashid=None, filters=None, object_type=None, after_id=None, limit=None):
+        """Finds the statentries matching the criterias. When after_id or limit is specified the entries are ordered by id
+        so that the result can be paged by using the id of the last entry as after_id in the next query.
+        :param spid: the statistics id
+        :param origins: list of origins, empty means all
+        :param sources: list of sources, empty means all
+        :param hashid: the hash id
+        :param filters: list of [name, operator, value] where name is one of datetime, entrytime, optime or delay
+        :param object_type: the object type
+        :param after_id: only return entries with id greater than after_id
+        :param limit: max number of entries to return
+        :return: the list of statentries
+        """
         with self.get_session() as s:
             q = s.query(statentry).filter(statentry.spid == spid)
             if origins and len(origins) > 0:
@@ -291,9 +323,16 @@ class SqlAlchemyDatabase(object):
             if object_type:
                 q = q.filter(statentry.object_type == object_type)
 
-            q = q.order_by(asc(statentry.origin)) \
-                .order_by(asc(statentry.source)) \
-                .order_by(asc(statentry.entrytime))
+            if after_id is not None or limit is not None:
+                if after_id is not None:
+                    q = q.filter(statentry.id > after_id)
+                q = q.order_by(asc(statentry.id))
+                if limit is not None:
+                    q = q.limit(limit)
+            else:
+                q = q.order_by(asc(statentry.origin)) \
+                    .order_by(asc(statentry.source)) \
+                    .order_by(asc(statentry.entrytime))
             
             return q.all()
 
@@ -319,13 +358,24 @@ class SqlAlchemyDatabase(object):
             return result
 
 
-    def cleanup_statentries(self, maxagedt):
-        logger.info("Cleanup of statentries older than %s"%maxagedt.strftime("%Y-%m-%d %H:%M"))
-        q = db_statentry.delete().where(db_statentry.c.entrytime < maxagedt.strftime("%Y-%m-%d %H:%M"))
+    def cleanup_statentries(self, maxagedt, limit=None):
+        """Removes the statentries older than maxagedt.
+        :param maxagedt: the max age
+        :param limit: max number of entries to remove in this call so that the transaction is kept short. None means no limit.
+        :return: number of removed entries
+        """
+        logger.debug("Cleanup of statentries older than %s"%maxagedt.strftime("%Y-%m-%d %H:%M"))
+        condition = db_statentry.c.entrytime < maxagedt.strftime("%Y-%m-%d %H:%M")
+        if limit is None:
+            q = db_statentry.delete().where(condition)
+        else:
+            ids = sql.select(db_statentry.c.id).where(condition).limit(limit).scalar_subquery()
+            q = db_statentry.delete().where(db_statentry.c.id.in_(ids))
         logger.debug("Query: %s"%q)
         with self.get_connection() as conn:
-            conn.execute(q)
+            result = conn.execute(q)
             conn.commit()
+            return result.rowcount
 
     def increment_statistics(self, spid, origin, source):
         with self.get_session() as session:
@@ -343,6 +393,57 @@ class SqlAlchemyDatabase(object):
             finally:
                 session.close()
 
+    def increment_statistics_batch(self, counters):
+        """Increments several counters in one transaction. On sqlite and postgresql this is done with one upsert.
+        :param counters: a dictionary with (spid, origin, source) as key and the increment as value
+        """
+        now = datetime.datetime.now()
+        rows = [{"spid":k[0], "origin":k[1], "source":k[2], "counter":v, "updated_at":now} for k, v in counters.items()]
+        if not rows:
+            return
+        dialect = self._engine.dialect.name
+        with self._engine.begin() as conn:
+            if dialect in ["sqlite", "postgresql"]:
+                if dialect == "sqlite":
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert
+                stmt = insert(db_statistics)
+                stmt = stmt.on_conflict_do_update(index_elements=["spid", "origin", "source"],
+                                                  set_={"counter":db_statistics.c.counter + stmt.excluded.counter,
+                                                        "updated_at":stmt.excluded.updated_at})
+                conn.execute(stmt, rows)
+            else:
+                for row in rows:
+                    q = db_statistics.update().where(db_statistics.c.spid == row["spid"]) \
+                                              .where(db_statistics.c.origin == row["origin"]) \
+                                              .where(db_statistics.c.source == row["source"]) \
+                                              .values(counter=db_statistics.c.counter + row["counter"], updated_at=now)
+                    if conn.execute(q).rowcount == 0:
+                        conn.execute(db_statistics.insert(), row)
+
+    def add_statentries(self, entries):
+        """Inserts several statentries in one transaction using executemany. If the batch violates a constraint
+        the entries are inserted one by one and the failing entries are skipped.
+        :param entries: a list of statentry
+        """
+        rows = [{"spid":e.spid, "origin":e.origin, "source":e.source, "hashid":e.hashid, "entrytime":e.entrytime,
+                 "optime":e.optime, "delay":e.delay, "optime_info":e.optime_info, "datetime":e.datetime,
+                 "object_type":e.object_type, "elevation_angle":e.elevation_angle} for e in entries]
+        if not rows:
+            return
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(db_statentry.insert(), rows)
+        except sqlexc.IntegrityError:
+            logger.warning("Batch insert of %d statentries failed, inserting them one by one"%len(rows))
+            for row in rows:
+                try:
+                    with self._engine.begin() as conn:
+                        conn.execute(db_statentry.insert(), row)
+                except sqlexc.IntegrityError:
+                    logger.info("Skipping duplicate statentry for spid:%s, origin:%s, source:%s"%(row["spid"], row["origin"], row["source"]))
+
     def add(self, obj):
         session = self.Session()
         xlist = obj
@@ -24,27 +24,98 @@
 from __future__ import absolute_import
 
 import logging
-from sqlalchemy import engine
+from sqlalchemy import engine, event
 from sqlalchemy.pool import QueuePool
 
 from urllib.parse import urlparse
 
 logger = logging.getLogger("bexchange.db.util")
 
-def create_engine_from_url(url, poolsize=10):
+class sqlite_profile(object):
+    """Connection settings applied to file based sqlite databases. Every new connection gets the pragmas
+    journal_mode, synchronous, busy_timeout, cache_size and mmap_size. The connections are kept in a pool that
+    can be shared between threads so that the pragmas and page cache survive between requests.
+    """
+    def __init__(self, journal_mode="wal", synchronous="normal", busy_timeout=5000, cache_size=-20000, mmap_size=268435456, poolsize=10):
+        """Constructor
+        :param journal_mode: the journal mode, e.g. wal, delete or truncate
+        :param synchronous: the synchronous level, e.g. off, normal or full
+        :param busy_timeout: milliseconds to wait for a lock before failing with database is locked
+        :param cache_size: page cache size. Negative value is in KiB, positive in pages
+        :param mmap_size: max number of bytes to memory map, 0 disables memory mapping
+        :param poolsize: number of connections kept in the pool
+        """
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.poolsize = poolsize
+
+    def pragmas(self):
+        """
+        :return: a list of pragma statements that should be executed on each new connection
+        """
+        return [
+            "pragma busy_timeout=%d"%self.busy_timeout,
+            "pragma journal_mode=%s"%self.journal_mode,
+            "pragma synchronous=%s"%self.synchronous,
+            "pragma cache_size=%d"%self.cache_size,
+            "pragma mmap_size=%d"%self.mmap_size
+        ]
+
+    def apply(self, dbapi_con, con_record=None):
+        """Executes the pragmas on a new connection. Can be used as a sqlalchemy connect listener.
+        :param dbapi_con: the dbapi connection
+        :param con_record: the connection record, not used
+        """
+        for pragma in self.pragmas():
+            dbapi_con.execute(pragma)
+
+    @classmethod
+    def from_conf(cls, conf):
+        """Creates a profile from configuration. The parameters are looked up without prefix, e.g. journal_mode
+        :param conf: the filtered configuration
+        :return: the profile or None if the profile isn't enabled
+        """
+        if not conf.get_boolean("enabled", False):
+            return None
+        return sqlite_profile(
+            journal_mode = conf.get("journal_mode", "wal"),
+            synchronous = conf.get("synchronous", "normal"),
+            busy_timeout = conf.get_int("busy_timeout", 5000),
+            cache_size = conf.get_int("cache_size", -20000),
+            mmap_size = conf.get_int("mmap_size", 268435456),
+            poolsize = conf.get_int("poolsize", 10))
+
+def is_sqlite_file(parsed):
+    """
+    :param parsed: the result of urlparse
+    :return: if the url points to a sqlite file, i.e. not an in memory database
+    """
+    path = parsed.path
+    return parsed.scheme == "sqlite" and path not in ["", "/", "/:memory:"] and "mode=memory" not in parsed.query
+
+def create_engine_from_url(url, poolsize=10, profile=None):
     """Creates a sqlalchemy engine from the specified url. If the scheme is sqlite, the poolsize will not be used.
     :param url: The uri
     :param poolsize: The number of connections in pool
+    :param profile: a sqlite_profile that is used if the url points to a sqlite file
     :return: the engine
     """
     result = None
     try:
         parsed = urlparse(url)
         if parsed.scheme == "sqlite":
-            result = engine.create_engine(url, echo=False)
+            if profile is not None and is_sqlite_file(parsed):
+                result = engine.create_engine(url, echo=False, poolclass=QueuePool, pool_size=profile.poolsize,
+                                              connect_args={"check_same_thread":False, "timeout":profile.busy_timeout/1000.0})
+                event.listen(result, "connect", profile.apply)
+            else:
+                result = engine.create_engine(url, echo=False)
         else:
             result = engine.create_engine(url, echo=False, pool_size=poolsize)
     except:
         result = engine.create_engine(url, echo=False)
 
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,198 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Cache of decorated files so that publishers with identical decorator chains
+## only decorates each file once.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import copy
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+
+from bexchange.decorators.decorator import decorator_file
+
+logger = logging.getLogger("bexchange.decorators.cache")
+
+class decoration_cache_entry(object):
+    """A decorated file in the cache
+    """
+    def __init__(self, path, meta):
+        """Constructor
+        :param path: the cached file or None if the decorators discarded the file
+        :param meta: the metadata of the decorated file
+        """
+        self.path = path
+        self.meta = meta
+        self.created = time.time()
+
+class decoration_cache(object):
+    """Keeps the result of a decorator chain identified by the metadata hash of the incomming file and the configuration
+    of the decorators. The first publisher decorates the file and the other publishers with the same decorator chain
+    gets a link to the decorated file. Publishers decorating the same file at the same time will wait for the first one.
+    """
+    def __init__(self, folder, limit=100, ttl=60):
+        """Constructor
+        :param folder: the folder where the decorated files are kept
+        :param limit: max number of decorated files to keep
+        :param ttl: max age in seconds of a decorated file
+        """
+        self._folder = folder
+        self._limit = limit
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        for f in os.listdir(folder):
+            try:
+                os.unlink(os.path.join(folder, f))
+            except OSError:
+                pass
+
+    def key(self, meta, decorators):
+        """Creates the cache key for the file and decorators.
+        :param meta: the metadata of the incomming file
+        :param decorators: the decorators
+        :return: the key or None if any of the decorators can't be identified by its configuration or isn't cacheable
+        """
+        configurations = []
+        for d in decorators:
+            if not d.cacheable():
+                return None
+            configuration = d.configuration()
+            if configuration is None:
+                return None
+            configurations.append(configuration)
+        return "%s:%s"%(meta.bdb_metadata_hash, json.dumps(configurations, sort_keys=True, default=str))
+
+    def _link(self, path):
+        """Links or copies the file into the cache folder
+        :param path: the file
+        :return: the new file
+        """
+        newpath = os.path.join(self._folder, "%s.h5"%uuid.uuid4().hex)
+        try:
+            os.link(path, newpath)
+        except OSError:
+            shutil.copyfile(path, newpath)
+        return newpath
+
+    def _remove(self, entry):
+        if entry.path:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def _expire(self, now):
+        """Removes expired and superfluous entries. Must be called with the lock held.
+        :param now: the current time
+        """
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) > self._limit or (self._ttl is not None and entry.created + self._ttl < now):
+                del self._entries[key]
+                self._remove(entry)
+                self._evicted = self._evicted + 1
+            else:
+                break
+
+    def _lookup(self, key, tmpfile):
+        """Returns a private copy of the cached file and metadata. Must be called with the lock held.
+        :param key: the key
+        :param tmpfile: the incomming file that will be closed on a hit
+        :return: a tuple (file, meta) or None if not found
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._hits = self._hits + 1
+        tmpfile.close()
+        if entry.path is None:
+            return None, copy.deepcopy(entry.meta)
+        return decorator_file(self._link(entry.path)), copy.deepcopy(entry.meta)
+
+    def decorate(self, key, tmpfile, meta, decorate):
+        """Returns the decorated file from the cache or calls decorate and caches the result.
+        :param key: the key, see key()
+        :param tmpfile: the incomming file
+        :param meta: the metadata of the incomming file
+        :param decorate: function called as decorate(tmpfile, meta) returning a tuple (file, meta) where file is None if discarded
+        :return: a tuple (file, meta) where file is None if the file has been discarded
+        """
+        with self._lock:
+            self._expire(time.time())
+            result = self._lookup(key, tmpfile)
+            if result is not None:
+                return result
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            pending.wait()
+            with self._lock:
+                result = self._lookup(key, tmpfile)
+                if result is not None:
+                    return result
+                self._misses = self._misses + 1
+            return decorate(tmpfile, meta)
+
+        try:
+            with self._lock:
+                self._misses = self._misses + 1
+            newfile, newmeta = decorate(tmpfile, meta)
+            entry = decoration_cache_entry(self._link(newfile.name) if newfile is not None else None, copy.deepcopy(newmeta))
+            with self._lock:
+                self._entries[key] = entry
+                self._expire(time.time())
+            return newfile, newmeta
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with the number of cached files, hits, misses and evicted files
+        """
+        with self._lock:
+            return {
+                "folder": self._folder,
+                "limit": self._limit,
+                "ttl": self._ttl,
+                "files": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evicted": self._evicted
+            }
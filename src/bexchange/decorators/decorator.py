@@ -22,9 +22,18 @@
 ## @author Anders Henja, SMHI
 ## @date 2021-08-30
 import importlib
+import os
+import shutil
 import sys
 import logging
+import multiprocessing
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from datetime import timedelta, datetime, timezone
+from bexchange.matching import filecontext
 
 logger = logging.getLogger("bexchange.decorators.decorator")
 
@@ -43,6 +52,8 @@ class decorator(object):
         self._backend = backend
         self._discard_on_none = discard_on_none
         self._can_return_invalid_file_content = can_return_invalid_file_content
+        self._timeout = None
+        self._configuration = None
     
     def backend(self):
         """
@@ -62,10 +73,42 @@ class decorator(object):
         """
         return self._can_return_invalid_file_content
 
+    def timeout(self):
+        """ Returns the max number of seconds the decorator is allowed to run when it is run in a separate process
+        :return: the timeout in seconds or None if there is no timeout
+        """
+        return self._timeout
+
+    def set_timeout(self, timeout):
+        """ Sets the max number of seconds the decorator is allowed to run when it is run in a separate process
+        :param timeout: the timeout in seconds or None
+        """
+        self._timeout = timeout
+
+    def cacheable(self):
+        """ Returns if the result of this decorator only depends on the file, the metadata and the configuration so that
+        the result can be shared between publishers by the decoration cache. Decorators depending on for example the
+        current time must return False.
+        :return: True if the result can be cached
+        """
+        return True
+
+    def configuration(self):
+        """ Returns the configuration used to create this decorator so that it can be recreated in another process.
+        :return: a tuple (clz, discard_on_none, can_return_invalid_file_content, arguments) or None if not created by the decorator_manager
+        """
+        return self._configuration
+
+    def set_configuration(self, clz, discard_on_none, can_return_invalid_file_content, arguments):
+        """ Sets the configuration used to create this decorator.
+        """
+        self._configuration = (clz, discard_on_none, can_return_invalid_file_content, arguments)
+
 
     def decorate(self, ino, meta):
-        """If this decorator decorates the infile, then a new temporary file will be created and returned.
-        :param ino: A tempfile.NamedTemporaryFile instance
+        """If this decorator decorates the infile, then a new temporary file will be created and returned. The infile
+        must not be modified since it might be shared with other publishers.
+        :param ino: A tempfile.NamedTemporaryFile instance or a spool handle
         :returns: A tempfile.NamedTemporaryFile instance
         """
         raise Exception("Not implemented")
@@ -97,12 +140,17 @@ class max_age_filter(decorator):
         self._max_acceptable_age = max_acceptable_age
         self._max_acceptable_age_block = max_acceptable_age_block
         self._target_name = target_name
+
+    def cacheable(self):
+        """ The result depends on when the file is decorated so it must never be cached
+        """
+        return False
     
     def decorate(self, inf, meta):
         """ Will  use the metadata to know if the file should be filtered or not.
         """
         if self._max_acceptable_age > 0 and self._max_acceptable_age_block > 0:
-            fileUTC = datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, tzinfo=timezone.utc)
+            fileUTC = filecontext.get_context(meta).nominal_datetime_utc()
             nowUTC = datetime.now(timezone.utc)
             file_delay = nowUTC - fileUTC
             if file_delay < timedelta(seconds = self._max_acceptable_age):
@@ -141,17 +189,203 @@ class decorator_manager:
         pass
     
     @classmethod
-    def create(self, backend, clz, discard_on_none, can_return_invalid_file_content, arguments):
+    def create(self, backend, clz, discard_on_none, can_return_invalid_file_content, arguments, timeout=None):
         """Creates an instance of clz with specified arguments
         :param clz: class name specified as <module>.<classname>
         :param discard_on_none: If decorate returns None, then this file should be discarded.
         :param arguments: a list of arguments that should be used to initialize the class       
+        :param timeout: max number of seconds the decorator is allowed to run when run in a separate process
         """
         logger.info("Creating decorator: %s"%clz)
         if clz.find(".") > 0:
             lastdot = clz.rfind(".")
             module = importlib.import_module(clz[:lastdot])
             classname = clz[lastdot+1:]
-            return getattr(module, classname)(backend, discard_on_none, can_return_invalid_file_content, **arguments)
+            result = getattr(module, classname)(backend, discard_on_none, can_return_invalid_file_content, **arguments)
+            result.set_timeout(timeout)
+            result.set_configuration(clz, discard_on_none, can_return_invalid_file_content, arguments)
+            return result
         else:
             raise Exception("Must specify class as module.class")
+
+##
+# Support for running decorators in a process pool
+#
+class decorator_file(object):
+    """Minimal NamedTemporaryFile replacement for a file that already exists. Used for passing files between
+    the publishers and the decorators that are run in a separate process.
+    """
+    def __init__(self, path, remove_on_close=True):
+        """Constructor
+        :param path: the file
+        :param remove_on_close: if the file should be removed when closed
+        """
+        self.name = path
+        self._remove_on_close = remove_on_close
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """Removes the file if remove_on_close was specified
+        """
+        if self._remove_on_close:
+            self._remove_on_close = False
+            try:
+                os.unlink(self.name)
+            except OSError:
+                pass
+
+class decorator_process_backend(object):
+    """The backend available to decorators that are run in a separate process. Only provides the temporary folder.
+    """
+    def __init__(self, tmpfolder):
+        self._tmpfolder = tmpfolder
+
+    def get_tmp_folder(self):
+        return self._tmpfolder
+
+_process_decorators = {}
+
+def init_decorator_process(syspath):
+    """Initializer for the decorator processes so that plugins can be found
+    :param syspath: the sys.path of the server
+    """
+    sys.path[:] = syspath
+
+def decorate_in_process(tmpfolder, configuration, path, meta):
+    """Runs a decorator in a separate process. The decorators are created once in each process.
+    :param tmpfolder: the temporary folder
+    :param configuration: the decorator configuration, see decorator.configuration()
+    :param path: the file to decorate
+    :param meta: the metadata
+    :return: None if the decorator returned None, path if the file wasn't changed, otherwise the name of the decorated file
+             that the caller is responsible for removing.
+    """
+    key = (tmpfolder, repr(configuration))
+    d = _process_decorators.get(key)
+    if d is None:
+        clz, discard_on_none, can_return_invalid_file_content, arguments = configuration
+        d = decorator_manager.create(decorator_process_backend(tmpfolder), clz, discard_on_none, can_return_invalid_file_content, arguments)
+        _process_decorators[key] = d
+
+    inf = decorator_file(path, False)
+    result = d.decorate(inf, meta)
+    if result is None:
+        return None
+    if result is inf or result.name == path:
+        return path
+
+    newpath = "%s.decorated"%result.name
+    try:
+        os.link(result.name, newpath)
+    except OSError:
+        shutil.copyfile(result.name, newpath)
+    result.close()
+    return newpath
+
+def remove_late_result(path, future):
+    """Done-callback for a decorator that has timed out. Removes the decorated file if the decorator finished
+    after the caller stopped waiting for it since nobody else will.
+    :param path: the file that was decorated
+    :param future: the future
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if result is not None and result != path:
+        try:
+            os.unlink(result)
+        except OSError:
+            pass
+
+class decorator_pool(object):
+    """Pool of processes running decorators. A decorator that is running can't be cancelled so when a
+    decorator times out, the processes are terminated and replaced with new processes. Other decorators that
+    were running in the terminated processes are resubmitted once to the new processes.
+    """
+    def __init__(self, nrprocesses, syspath=None):
+        """Constructor
+        :param nrprocesses: number of processes
+        :param syspath: the sys.path used by the processes. Defaults to the current sys.path.
+        """
+        self._nrprocesses = nrprocesses
+        self._syspath = list(syspath if syspath is not None else sys.path)
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+        self._timeouts = 0
+        self._recycled = 0
+        self._shutdown = False
+
+    def _create_executor(self):
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(self._nrprocesses, mp_context=context, initializer=init_decorator_process, initargs=(self._syspath,))
+
+    def decorate(self, tmpfolder, configuration, path, meta, timeout=None):
+        """Runs a decorator in one of the processes, see decorate_in_process.
+        :param tmpfolder: the temporary folder
+        :param configuration: the decorator configuration
+        :param path: the file to decorate
+        :param meta: the metadata
+        :param timeout: max number of seconds to wait for the decorator or None to wait until it has finished
+        :return: the result from decorate_in_process
+        :raise: Exception if the decorator timed out
+        """
+        for attempt in range(2):
+            with self._lock:
+                executor = self._executor
+            try:
+                future = executor.submit(decorate_in_process, tmpfolder, configuration, path, meta)
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                future.add_done_callback(partial(remove_late_result, path))
+                with self._lock:
+                    self._timeouts = self._timeouts + 1
+                self.recycle(executor)
+                raise Exception("Decorator %s timed out after %s seconds"%(configuration[0], timeout))
+            except (BrokenProcessPool, RuntimeError):
+                with self._lock:
+                    recycled = executor is not self._executor
+                if not recycled:
+                    self.recycle(executor)
+                if not recycled or attempt > 0:
+                    raise
+                logger.info("Decorator processes were replaced while running %s, running it again"%configuration[0])
+
+    def recycle(self, executor):
+        """Terminates the processes of the executor and replaces it with a new executor unless that already has been done
+        :param executor: the executor that should be replaced
+        """
+        with self._lock:
+            if executor is not self._executor or self._shutdown:
+                return
+            self._executor = self._create_executor()
+            self._recycled = self._recycled + 1
+        logger.warning("Replacing the decorator processes")
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        for p in processes:
+            try:
+                p.terminate()
+            except Exception:
+                pass
+        executor.shutdown(wait=False)
+
+    def shutdown(self, wait=True):
+        """Shuts down the processes. Decorators submitted after this will fail.
+        :param wait: if running decorators should be waited for
+        """
+        with self._lock:
+            self._shutdown = True
+            executor = self._executor
+        executor.shutdown(wait=wait)
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with number of processes, timeouts and number of times the processes have been replaced
+        """
+        with self._lock:
+            return {
+                "processes": self._nrprocesses,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled
+            }
@@ -0,0 +1,144 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Per-file context with values derived from the metadata, like the nominal datetime
+## and the parsed source, so that they only are calculated once for each file.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import datetime
+
+from bexchange.matching import metaindex
+
+##
+# Name of the attribute used to keep the context in the metadata
+CONTEXT_ATTRIBUTE = "_bexchange_file_context"
+
+_UNSET = object()
+
+class file_context(object):
+    """Values derived from the metadata of a file. Each value is calculated the first time it is requested
+    and then kept. The context should be created when the metadata is complete, i.e. after the source has
+    been identified, since changes to the metadata afterwards will not be seen. The returned values are
+    shared and must not be modified. When formatted as a string the file id is returned so the context can
+    be passed as argument to the loggers without creating the file id unless the message is logged.
+    """
+    __slots__ = ("_meta", "_nominal_datetime", "_nominal_datetime_utc", "_source", "_what_source", "_scan_elangle", "_fileid")
+
+    def __init__(self, meta):
+        """Constructor
+        :param meta: the metadata
+        """
+        object.__setattr__(self, "_meta", meta)
+        for name in self.__slots__[1:]:
+            object.__setattr__(self, name, _UNSET)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("file_context is immutable")
+
+    def _cache(self, name, value):
+        object.__setattr__(self, name, value)
+        return value
+
+    def nominal_datetime(self):
+        """
+        :return: the nominal datetime (what/date and what/time) of the file without time zone
+        """
+        result = self._nominal_datetime
+        if result is _UNSET:
+            meta = self._meta
+            result = self._cache("_nominal_datetime", datetime.datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0))
+        return result
+
+    def nominal_datetime_utc(self):
+        """
+        :return: the nominal datetime (what/date and what/time) of the file in UTC
+        """
+        result = self._nominal_datetime_utc
+        if result is _UNSET:
+            result = self._cache("_nominal_datetime_utc", self.nominal_datetime().replace(tzinfo=datetime.timezone.utc))
+        return result
+
+    def source(self):
+        """
+        :return: the identified source (_bdb/source) of the file
+        """
+        result = self._source
+        if result is _UNSET:
+            from baltrad.bdbcommon.oh5 import Source
+            result = self._cache("_source", Source.from_string(self._meta.bdb_source))
+        return result
+
+    def what_source(self):
+        """
+        :return: the source as specified in what/source in the file
+        """
+        result = self._what_source
+        if result is _UNSET:
+            from baltrad.bdbcommon.oh5 import Source
+            result = self._cache("_what_source", Source.from_string(self._meta.what_source))
+        return result
+
+    def scan_elangle(self):
+        """
+        :return: the value of /dataset1/where/elangle or /where/elangle. None if neither exists.
+        """
+        result = self._scan_elangle
+        if result is _UNSET:
+            mn = metaindex.get_index(self._meta).scan_elangle()
+            result = self._cache("_scan_elangle", mn.value if mn else None)
+        return result
+
+    def fileid(self):
+        """
+        :return: the string used to identify the file in the logs
+        """
+        result = self._fileid
+        if result is _UNSET:
+            meta = self._meta
+            file_object = meta.what_object
+            file_datetime = self.nominal_datetime().strftime("%Y-%m-%dT%H:%M:%SZ")
+            if file_object == "SCAN":
+                result = "nod:%s, object:%s, time:%s, elangle:%s, hash:%s"%(meta.bdb_source_name, file_object, file_datetime, self.scan_elangle(), meta.bdb_metadata_hash)
+            else:
+                result = "nod:%s, object:%s, time:%s, hash:%s"%(meta.bdb_source_name, file_object, file_datetime, meta.bdb_metadata_hash)
+            result = self._cache("_fileid", result)
+        return result
+
+    def __reduce__(self):
+        # The cached values are not pickled, they will be recalculated when needed
+        return (file_context, (self._meta,))
+
+    def __str__(self):
+        return self.fileid()
+
+def get_context(meta):
+    """Returns the context for the metadata. The context is created the first time it is requested and
+    then kept in the metadata.
+    :param meta: the metadata
+    :return: the file_context
+    """
+    context = getattr(meta, CONTEXT_ATTRIBUTE, None)
+    if context is None:
+        context = file_context(meta)
+        try:
+            setattr(meta, CONTEXT_ATTRIBUTE, context)
+        except AttributeError:
+            pass
+    return context
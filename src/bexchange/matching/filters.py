@@ -27,6 +27,8 @@ import threading
 import json
 import re
 
+from bexchange.matching import metadata_matcher
+
 from baltrad.bdbcommon.oh5 import (
     Attribute,
     Group,
@@ -49,6 +51,38 @@ class node_filter:
         """
         raise NotImplementedError("")
 
+    def compile(self):
+        """Compiles the filter into a function that is called with the metadata and returns True or False. Filters that
+        doesn't implement compile will be evaluated using the metadata_matcher.
+        :return: a function called with the metadata
+        """
+        xpr = self.to_xpr()
+        matcher = metadata_matcher.metadata_matcher()
+        return lambda meta: matcher.match(meta, xpr)
+
+    def compiled(self):
+        """Returns the compiled version of this filter. The filter is compiled the first time this method is called.
+        :return: a function called with the metadata
+        """
+        compiled = getattr(self, "_compiled", None)
+        if compiled is None:
+            compiled = self.compile()
+            self._compiled = compiled
+        return compiled
+
+    def attribute_names(self):
+        """
+        :return: the attribute names that are referenced by this filter
+        """
+        return []
+
+    def matches(self, meta):
+        """Matches the metadata against the compiled version of this filter.
+        :param meta: The metadata
+        :return: True or False
+        """
+        return self.compiled()(meta)
+
 ##
 # Attribute filter
 #
@@ -110,6 +144,22 @@ class attribute_filter(node_filter):
         """
         return [expr.symbol(self.operation), [expr.symbol("attr"), self.name, self.value_type], self.value]
 
+    def attribute_names(self):
+        """
+        :return: the attribute names that are referenced by this filter
+        """
+        return [self.name]
+
+    def compile(self):
+        """Compiles the attribute filter into a function. If the operation isn't supported by the compiler
+        the metadata_matcher will be used.
+        :return: a function called with the metadata
+        """
+        compiled = metadata_matcher.compile_attribute(self.name, self.operation, self.value_type, self.value)
+        if compiled is None:
+            return super(attribute_filter, self).compile()
+        return compiled
+
 ##
 # And filter
 class and_filter(node_filter):
@@ -170,6 +220,22 @@ class and_filter(node_filter):
         for child in self.value:
             result.append(child.to_xpr())
         return result
+
+    def attribute_names(self):
+        """
+        :return: the attribute names that are referenced by this filter
+        """
+        result = []
+        for child in self.value:
+            result.extend(child.attribute_names())
+        return result
+
+    def compile(self):
+        """Compiles the and filter into a function.
+        :return: a function called with the metadata
+        """
+        childs = [child.compile() for child in self.value]
+        return lambda meta: all(c(meta) for c in childs)
     
 ##
 # Or filter
@@ -230,7 +296,24 @@ class or_filter(node_filter):
         result = [expr.symbol("or")]
         for child in self.value:
             result.append(child.to_xpr())
-        return result    
+        return result
+
+    def attribute_names(self):
+        """
+        :return: the attribute names that are referenced by this filter
+        """
+        result = []
+        for child in self.value:
+            result.extend(child.attribute_names())
+        return result
+
+    def compile(self):
+        """Compiles the or filter into a function.
+        :return: a function called with the metadata
+        """
+        childs = [child.compile() for child in self.value]
+        return lambda meta: any(c(meta) for c in childs)
+    
 ##
 # Not filter
 class not_filter(node_filter):
@@ -278,6 +361,19 @@ class not_filter(node_filter):
         result.append(self.value.to_xpr())
         return result
 
+    def attribute_names(self):
+        """
+        :return: the attribute names that are referenced by this filter
+        """
+        return self.value.attribute_names()
+
+    def compile(self):
+        """Compiles the not filter into a function.
+        :return: a function called with the metadata
+        """
+        child = self.value.compile()
+        return lambda meta: not child(meta)
+
 ##
 # Always true
 class always_filter(node_filter):
@@ -319,6 +415,12 @@ class always_filter(node_filter):
         """
         return True
 
+    def compile(self):
+        """Compiles the always filter into a function.
+        :return: a function called with the metadata
+        """
+        return lambda meta: True
+
 class filter_manager:
     """The filter manager is used to create a filter from a dictionary or json entry
     """
@@ -357,7 +459,7 @@ class filter_manager:
         :param ifilter: The filter to be jsonifyed...
         :return: a filter as a json string
         """
-        return json.dumps(ifilter, default=lambda o: o.__dict__)
+        return json.dumps(ifilter, default=lambda o: dict([(k, v) for k, v in o.__dict__.items() if not k.startswith("_")]))
     
     def to_xpr(self, ifilter):
         """Creates an expression to be used when matching against metadata.
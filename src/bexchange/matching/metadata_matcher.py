@@ -28,9 +28,183 @@ import re, datetime
 
 from baltrad.bdbcommon import expr
 
-from baltrad.bdbcommon.oh5 import (
-    Source,
-)
+from bexchange.matching import metaindex, filecontext
+
+def find_source(name, source):
+    """Finds a source identifier within the source.
+    :param name: The source identifier
+    :param source: The data source
+    :return the found value
+    """
+    key = name[name.rfind(":") + 1:]
+    if key in source:
+        return [source[key]]
+    return []
+
+def match_path(split_path, nodepath):
+    """Matches the paths
+    """
+    node_split_path = nodepath.split("/")
+    from_index = len(node_split_path) - len(split_path)
+    result = False
+    if from_index >= 0:
+        result = split_path == node_split_path[from_index:]
+    return result
+
+def create_value_converter(ttype):
+    """Creates the function used for converting attribute values to wanted type
+    :param ttype: The type, double, int or anything else for string
+    :return: a function converting a node to a literal
+    """
+    def as_double(node):
+        try:
+            return expr.literal(float(node.value))
+        except:
+            return expr.literal(node.value_str())
+    def as_int(node):
+        try:
+            return expr.literal(int(node.value))
+        except:
+            return expr.literal(node.value_str())
+    def as_str(node):
+        return expr.literal(node.value_str())
+    if ttype == "double":
+        return as_double
+    elif ttype == "int":
+        return as_int
+    return as_str
+
+def find_plain(meta, name, ttype):
+    """Finds any name within the metadata.
+    :param meta: The metadata
+    :param name: The name of the attribute
+    :param ttype: The type the values should be converted to if possible
+    :return: The value
+    """
+    converter = create_value_converter(ttype)
+    return [converter(node) for node in metaindex.get_index(meta).find_nodes(name)]
+
+def what_age(meta):
+    """
+    :return: the age of the file in seconds
+    """
+    whatdt = filecontext.get_context(meta).nominal_datetime_utc()
+    nowdt = datetime.datetime.now(datetime.timezone.utc)
+    return (nowdt - whatdt).seconds
+
+def create_attribute_lookup(name, ttype):
+    """Creates a function that will find the value of an attribute in the metadata in the same way as
+    metadata_matcher.find_value does.
+    :param name: The name that is requested
+    :param ttype: The type we are looking for
+    :return: a function called with the metadata
+    """
+    if name.startswith("what/source:"):
+        return lambda meta: find_source(name, meta.source())
+    elif name.startswith("_bdb/source:"):
+        return lambda meta: find_source(name, filecontext.get_context(meta).source())
+    elif name.startswith("_bdb/source_name"):
+        return lambda meta: [meta.bdb_source_name]
+    elif name.startswith("_exchange/what_age"):
+        return what_age
+    elif name.startswith("_exchange/time"):
+        xstr = name[len("_exchange/time"):]
+        if xstr == ":hour":
+            return lambda meta: ["%02d"%meta.what_time.hour]
+        elif xstr == ":minute":
+            return lambda meta: ["%02d"%meta.what_time.minute]
+        elif xstr == ":second":
+            return lambda meta: ["%02d"%meta.what_time.second]
+        return lambda meta: ["%02d%02d%02d"%(meta.what_time.hour, meta.what_time.minute, meta.what_time.second)]
+
+    converter = create_value_converter(ttype)
+    def lookup(meta):
+        return [converter(node) for node in metaindex.get_index(meta).find_nodes(name)]
+    return lookup
+
+def in_(lhs, rhs):
+    """Matches if items in lhs exists in the rhs.
+    :param lhs: Left hand side which is a list of values
+    :param rhs: Right hand side which is matched against
+    :return: True or False
+    """
+    return any(item in rhs for item in lhs)
+
+def notin(lhs, rhs):
+    """Matches if no items in lhs exists in the rhs.
+    :param lhs: Left hand side which is a list of values
+    :param rhs: Right hand side which is matched against
+    :return: True or False
+    """
+    return not any(item in rhs for item in lhs)
+
+def like_pattern(rhs):
+    """Creates the regular expression used by like from a \*-pattern.
+    :param rhs: the pattern or a list where first item is the pattern
+    :return: the compiled regular expression
+    """
+    if isinstance(rhs, list) and len(rhs) > 0:
+        rhs = rhs[0]
+    return re.compile(rhs.replace("*", ".*"))
+
+def like(lhs, rhs):
+    """Matches against a \*-pattern.
+    :param lhs: Left hand side which is a list of value
+    :param rhs: Right hand side which is pattern
+    :return: True or False
+    """
+    p = like_pattern(rhs)
+    for i in lhs:
+        if p.match(i):
+            return True
+    return False
+
+##
+# Operations that can be compiled
+COMPILABLE_OPERATIONS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "in": in_,
+    "not_in": notin,
+    "like": like
+}
+
+def compile_attribute(name, op, ttype, value):
+    """Compiles an attribute expression into a function that can be called with the metadata. The function
+    will return the same result as metadata_matcher.match would do with the corresponding expression. The
+    function doesn't keep any state and can be used from several threads at the same time.
+    :param name: The name of the attribute
+    :param op: The operation
+    :param ttype: The value type
+    :param value: The value to compare against
+    :return: a function called with the metadata returning True or False. None if operation can't be compiled.
+    """
+    if op not in COMPILABLE_OPERATIONS:
+        return None
+
+    lookup = create_attribute_lookup(name, ttype)
+
+    if op in ["in", "not_in"] and isinstance(value, list):
+        try:
+            values = frozenset(value)
+            if op == "in":
+                return lambda meta: any(item in values for item in lookup(meta))
+            return lambda meta: not any(item in values for item in lookup(meta))
+        except TypeError:
+            pass
+    elif op == "like":
+        try:
+            pattern = like_pattern(value)
+            return lambda meta: any(pattern.match(i) for i in lookup(meta))
+        except (AttributeError, TypeError, re.error):
+            pass
+
+    operation = COMPILABLE_OPERATIONS[op]
+    return lambda meta: operation(lookup(meta), value)
 
 ##
 # Used for matching metadata against an expression
@@ -80,31 +254,7 @@ class metadata_matcher:
         :param ttype: The type we are looking for
         :return: the value if found
         """
-        result = None
-        if name.startswith("what/source:"):
-            result =  self.find_source(name, self.meta.source())
-        elif name.startswith("_bdb/source:"):
-            result =  self.find_source(name, Source.from_string(self.meta.bdb_source))
-        elif name.startswith("_bdb/source_name"):
-            result = [self.meta.bdb_source_name]
-        elif name.startswith("_exchange/what_age"):
-            whatdt = datetime.datetime(self.meta.what_date.year, self.meta.what_date.month, self.meta.what_date.day, self.meta.what_time.hour, self.meta.what_time.minute, self.meta.what_time.second, tzinfo=datetime.timezone.utc)
-            nowdt = datetime.datetime.now(datetime.timezone.utc)
-            seconds = (nowdt - whatdt).seconds
-            result =seconds
-        elif name.startswith("_exchange/time"):
-            xstr = name[len("_exchange/time"):]
-            if xstr == ":hour":
-                return ["%02d"%self.meta.what_time.hour]
-            elif xstr == ":minute":
-                return ["%02d"%self.meta.what_time.minute]
-            elif xstr == ":second":
-                return ["%02d"%self.meta.what_time.second]
-            else:
-                return ["%02d%02d%02d"%(self.meta.what_time.hour, self.meta.what_time.minute, self.meta.what_time.second)]
-        else:
-            result = self.find_plain(name, ttype)
-        return result
+        return create_attribute_lookup(name, ttype)(self.meta)
 
     def find_source(self, name, source):
         """Finds a source identifier within the source.
@@ -112,45 +262,20 @@ class metadata_matcher:
         :param source: The data source
         :return the found value
         """
-        key = name[name.rfind(":") + 1:]
-        if key in source:
-            return [source[key]]
-        return []
+        return find_source(name, source)
     
     def find_plain(self, name, ttype):
         """Finds any name within the metadata.
         :param name: The name of the attribute
-        :param ttype: Not used
+        :param ttype: The type the values should be converted to if possible
         :return: The value
         """
-        result = []
-        split_path = name.split("/")
-        for node in self.meta.iternodes():
-            if self.match_path(split_path, node.path()):
-                if ttype == "double":
-                    try:
-                        result.append(expr.literal(float(node.value)))
-                        continue
-                    except:
-                        pass
-                elif ttype == "int":
-                    try:
-                        result.append(expr.literal(int(node.value)))
-                        continue 
-                    except:
-                        pass
-                result.append(expr.literal(node.value_str())) 
-        return result
+        return find_plain(self.meta, name, ttype)
   
     def match_path(self, split_path, nodepath):
         """Matches the paths
         """
-        node_split_path = nodepath.split("/")
-        from_index = len(node_split_path) - len(split_path)
-        result = False
-        if from_index >= 0:
-            result = split_path == node_split_path[from_index:]
-        return result
+        return match_path(split_path, nodepath)
 
     def in_(self, lhs, rhs):
         """Matches if items in lhs exists in the rhs.
@@ -158,8 +283,7 @@ class metadata_matcher:
         :param rhs: Right hand side which is matched against
         :return: True or False
         """
-        #print("in_", lhs, rhs, any(item in rhs for item in lhs))
-        return any(item in rhs for item in lhs)
+        return in_(lhs, rhs)
 
     def notin(self, lhs, rhs):
         """Matches if items in lhs exists in the rhs.
@@ -167,7 +291,7 @@ class metadata_matcher:
         :param rhs: Right hand side which is matched against
         :return: True or False
         """
-        return not any(item in rhs for item in lhs)
+        return notin(lhs, rhs)
 
     def eq(self, lhs, rhs):
         return operator.eq(lhs, rhs)
@@ -190,14 +314,7 @@ class metadata_matcher:
         :param rhs: Right hand side which is pattern
         :return: True or False
         """
-        if isinstance(rhs, list) and len(rhs) > 0:
-            rhs = rhs[0]
-        pattern = rhs.replace("*", ".*")
-        p = re.compile(pattern)
-        for i in lhs:
-            if p.match(i):
-                return True
-        return False
+        return like(lhs, rhs)
 
     #Synchronize!!!
     def match(self, metadata, xpr):
@@ -0,0 +1,184 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Per-file index over the nodes in the metadata so that matchers, namers and storages
+## doesn't have to traverse the complete metadata tree for every attribute lookup.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import re
+
+##
+# Name of the attribute used to keep the index in the metadata
+INDEX_ATTRIBUTE = "_bexchange_metadata_index"
+
+DATASET_PATTERN = re.compile(r"^/dataset([1-9][0-9]*)$")
+QUANTITY_PATTERN = re.compile(r"^/dataset([1-9][0-9]*)/data([1-9][0-9]*)/what/quantity$")
+ELANGLE_PATTERN = re.compile(r"^/dataset([1-9][0-9]*)/where/elangle$")
+
+def is_normalized(path):
+    """
+    :param path: a node path
+    :return: True if the path is absolute and doesn't contain any empty names
+    """
+    return path == "/" or (path.startswith("/") and not path.endswith("/") and "//" not in path)
+
+class metadata_index(object):
+    """Index over the nodes in a metadata. The index is built from meta.iternodes() and contains a
+    dictionary from full path to node and a dictionary from the last name in the path to the nodes.
+    Suffix lookups are resolved from the latter and memoized. The dataset, quantity and elangle lists
+    are created the first time they are requested. The index should be created when the metadata is
+    complete since nodes added afterwards will not be seen.
+    """
+    def __init__(self, meta):
+        """Constructor
+        :param meta: the metadata
+        """
+        self._nodes = {}
+        self._by_name = {}
+        self._suffixes = {}
+        self._datasets = None
+        self._quantities = None
+        self._elangles = None
+        for node in meta.iternodes():
+            path = node.path()
+            split_path = path.split("/")
+            self._nodes[path] = node
+            self._by_name.setdefault(split_path[-1], []).append((split_path, node))
+
+    def find_node(self, path):
+        """
+        :param path: a normalized absolute path
+        :return: the node or None if there is no node with that path
+        """
+        return self._nodes.get(path)
+
+    def find_nodes(self, name):
+        """Returns all nodes which path ends with name in the same order as meta.iternodes() would
+        return them. E.g. what/quantity will return all quantity attributes.
+        :param name: the path suffix
+        :return: a list of nodes
+        """
+        result = self._suffixes.get(name)
+        if result is None:
+            split_name = name.split("/")
+            nlen = len(split_name)
+            result = [node for split_path, node in self._by_name.get(split_name[-1], []) if len(split_path) >= nlen and split_path[len(split_path) - nlen:] == split_name]
+            self._suffixes[name] = result
+        return result
+
+    def _index_datasets(self):
+        """Creates the dataset, quantity and elangle lists
+        """
+        datasets = []
+        quantities = {}
+        elangles = []
+        for path, node in self._nodes.items():
+            if not path.startswith("/dataset"):
+                continue
+            m = DATASET_PATTERN.match(path)
+            if m:
+                datasets.append((int(m.group(1)), node))
+                continue
+            m = QUANTITY_PATTERN.match(path)
+            if m:
+                quantities.setdefault(int(m.group(1)), []).append((int(m.group(2)), node))
+                continue
+            m = ELANGLE_PATTERN.match(path)
+            if m:
+                elangles.append((int(m.group(1)), node))
+        for v in quantities.values():
+            v.sort(key=lambda x: x[0])
+        datasets.sort(key=lambda x: x[0])
+        elangles.sort(key=lambda x: x[0])
+        self._quantities = quantities
+        self._elangles = elangles
+        self._datasets = datasets
+
+    def datasets(self):
+        """
+        :return: a list of (index, node) for all /datasetN groups ordered by index
+        """
+        if self._datasets is None:
+            self._index_datasets()
+        return self._datasets
+
+    def quantities(self, dsindex):
+        """
+        :param dsindex: the dataset index
+        :return: a list of (index, node) for all /datasetN/dataM/what/quantity attributes in dataset N ordered by M
+        """
+        if self._datasets is None:
+            self._index_datasets()
+        return self._quantities.get(dsindex, [])
+
+    def elangles(self):
+        """
+        :return: a list of (index, node) for all /datasetN/where/elangle attributes ordered by N
+        """
+        if self._datasets is None:
+            self._index_datasets()
+        return self._elangles
+
+    def scan_elangle(self):
+        """
+        :return: the elangle node that identifies a scan, /dataset1/where/elangle or /where/elangle. None if neither exists.
+        """
+        mn = self._nodes.get("/dataset1/where/elangle")
+        if not mn:
+            mn = self._nodes.get("/where/elangle")
+        return mn
+
+def get_index(meta):
+    """Returns the index for the metadata. The index is created the first time it is requested and
+    then kept in the metadata.
+    :param meta: the metadata
+    :return: the metadata_index
+    """
+    index = getattr(meta, INDEX_ATTRIBUTE, None)
+    if index is None:
+        index = metadata_index(meta)
+        try:
+            setattr(meta, INDEX_ATTRIBUTE, index)
+        except AttributeError:
+            pass
+    return index
+
+def find_node(meta, path):
+    """Same as meta.find_node(path) but uses the index when path is normalized.
+    :param meta: the metadata
+    :param path: the path
+    :return: the node or None if not found
+    """
+    if is_normalized(path):
+        return get_index(meta).find_node(path)
+    return meta.find_node(path)
+
+def node(meta, path):
+    """Same as meta.node(path) but uses the index when path is normalized.
+    :param meta: the metadata
+    :param path: the path
+    :return: the node
+    :raises LookupError: if there is no node with that path
+    """
+    if is_normalized(path):
+        result = get_index(meta).find_node(path)
+        if result is not None:
+            return result
+    return meta.node(path)
@@ -0,0 +1,204 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Routing index used to find the subscriptions / publications that are interested
+## in a file without having to evaluate every filter.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import logging
+
+logger = logging.getLogger("bexchange.matching.routing")
+
+##
+# The attribute names that can be used as keys in the index. Ordered by preference
+# since a source identifier usually is more selective than an object type.
+INDEXED_NAMES = ["_bdb/source_name", "what/source:", "/what/object"]
+
+def key_values(meta, name):
+    """Returns the values for an indexed attribute name in the same way as the metadata_matcher
+    would find them.
+    :param meta: the metadata
+    :param name: the attribute name
+    :return: a list of values
+    """
+    if name == "_bdb/source_name":
+        return [meta.bdb_source_name]
+    elif name.startswith("what/source:"):
+        key = name[name.rfind(":") + 1:]
+        source = meta.source()
+        if key in source:
+            return [source[key]]
+        return []
+    elif name == "/what/object":
+        value = meta.what_object
+        if value is None:
+            return []
+        return [value]
+    raise LookupError("Attribute %s can not be indexed"%name)
+
+def indexed_values(ifilter):
+    """Returns the values that a filter can be indexed on if it is possible to index it.
+    :param ifilter: the filter
+    :return: a tuple of (name, values) or None if filter can't be indexed.
+    """
+    if getattr(ifilter, "filter_type", None) != "attribute_filter":
+        return None
+    name = ifilter.name
+    if not isinstance(name, str) or not (name in INDEXED_NAMES or name.startswith("what/source:")):
+        return None
+    values = ifilter.value
+    if not isinstance(values, (list, tuple)) or not all(isinstance(v, str) for v in values):
+        return None
+    if ifilter.operation == "in":
+        return (name, list(values))
+    elif ifilter.operation == "=" and len(values) == 1:
+        return (name, list(values))
+    return None
+
+def name_order(name):
+    """Used when deciding which attribute that should be used as key
+    """
+    if name.startswith("what/source:"):
+        name = "what/source:"
+    return INDEXED_NAMES.index(name)
+
+class routing_entry(object):
+    """An item in the routing index
+    """
+    def __init__(self, position, item, residual=None, fallback=False):
+        """Constructor
+        :param position: the position of the item in the original list
+        :param item: the item (subscription, publication...)
+        :param residual: the filter that has to be evaluated when key has matched. None if no evaluation needed.
+        :param fallback: if the item couldn't be indexed and the complete filter has to be evaluated
+        """
+        self.position = position
+        self.item = item
+        self.residual = residual
+        self.fallback = fallback
+
+class routing_index(object):
+    """Index over a list of items that all have a filter. Filters that are an attribute_filter or an and_filter
+    containing an attribute_filter with in or = on one of the INDEXED_NAMES are placed in hash buckets. The rest
+    of the and_filter is kept as a residual filter that is evaluated when the key has matched. All other filters are
+    evaluated for every file. The index is not modified after it has been created so when items are changed a new
+    index should be created and replace the old one.
+    """
+    def __init__(self, items, filter_of, matcher, fallback):
+        """Constructor
+        :param items: the items to index
+        :param filter_of: function returning the filter of an item
+        :param matcher: function called as matcher(meta, ifilter) returning True if meta matches the residual filter
+        :param fallback: function called as fallback(meta, item) returning True if meta matches the items filter when
+                         the filter couldn't be indexed
+        """
+        self._items = items
+        self._size = len(items)
+        self._matcher = matcher
+        self._fallback = fallback
+        self._buckets = {}
+        self._unindexed = []
+        for position, item in enumerate(items):
+            self._add(position, item, filter_of(item))
+
+    def _add(self, position, item, ifilter):
+        """Adds an item to the index
+        """
+        if ifilter is None or getattr(ifilter, "filter_type", None) == "always_filter":
+            self._unindexed.append(routing_entry(position, item))
+            return
+
+        childs = [ifilter]
+        if getattr(ifilter, "filter_type", None) == "and_filter":
+            childs = list(ifilter.value)
+
+        best = None
+        for idx, child in enumerate(childs):
+            indexed = indexed_values(child)
+            if indexed and (best is None or name_order(indexed[0]) < name_order(best[1][0])):
+                best = (idx, indexed)
+
+        if best is None:
+            self._unindexed.append(routing_entry(position, item, fallback=True))
+            return
+
+        residual = None
+        remaining = childs[:best[0]] + childs[best[0]+1:]
+        if len(remaining) > 0:
+            residual = type(ifilter)(remaining)
+
+        name, values = best[1]
+        entry = routing_entry(position, item, residual)
+        buckets = self._buckets.setdefault(name, {})
+        for v in set(values):
+            buckets.setdefault(v, []).append(entry)
+
+    def is_current(self, items):
+        """The list is expected to be replaced and not modified in place when items are changed. The size is only
+        compared as a safety net in case it has been modified anyway.
+        :param items: the list of items
+        :return: if this index has been created from the provided list
+        """
+        return self._items is items and self._size == len(items)
+
+    def candidates(self, meta):
+        """Returns the entries that might match the metadata in the order they where added.
+        :param meta: the metadata
+        :return: a list of routing entries
+        """
+        result = {}
+        for name, buckets in self._buckets.items():
+            for v in key_values(meta, name):
+                for entry in buckets.get(v, []):
+                    result[entry.position] = entry
+        for entry in self._unindexed:
+            result[entry.position] = entry
+        return [result[k] for k in sorted(result)]
+
+    def match(self, meta):
+        """Returns the items that are matching the metadata in the order they where added.
+        :param meta: the metadata
+        :return: a list of items
+        """
+        result = []
+        for entry in self.candidates(meta):
+            if entry.fallback:
+                if self._fallback(meta, entry.item):
+                    result.append(entry.item)
+            elif entry.residual is None or self._matcher(meta, entry.residual):
+                result.append(entry.item)
+        return result
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with information about the index
+        """
+        keys = {}
+        for name, buckets in self._buckets.items():
+            keys[name] = {
+                "buckets": len(buckets),
+                "max_bucket_size": max([len(b) for b in buckets.values()] + [0]),
+                "bucket_sizes": dict([(v, len(b)) for v, b in buckets.items()])
+            }
+        return {
+            "entries": self._size,
+            "unindexed": len(self._unindexed),
+            "keys": keys
+        }
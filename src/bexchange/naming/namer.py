@@ -22,17 +22,16 @@
 ## @author Anders Henja, SMHI
 ## @date 2021-08-18
 import re
+import ast
 import logging
 import importlib
 import math
 import json
 import os
-from io import StringIO
+import weakref
 from datetime import datetime, timedelta, timezone
 from bexchange import config
-from baltrad.bdbcommon.oh5 import (
-    Source,
-)
+from bexchange.matching import metaindex, filecontext
 
 logger = logging.getLogger("bexchange.naming.namer")
 
@@ -51,6 +50,20 @@ BALTRAD_DATETIMEL_PATTERN=re.compile("^_baltrad/datetime_l:([0-9]{2})(:[A-Za-z0-
 CURRENT_DATETIME_PATTERN=re.compile("^_baltrad/currentdt(:[A-Za-z0-9\\-/: _%]+)?$", flags=re.IGNORECASE)
 
 
+##
+# All namers that have been created and not yet garbage collected. Used for finding the attributes that are used by the
+# namers when the metadata reader is restricted to a set of attributes.
+_namers = weakref.WeakSet()
+
+def referenced_attribute_names():
+    """
+    :return: the attribute names referenced by the templates of all namers
+    """
+    result = set()
+    for n in list(_namers):
+        result.update(n.attribute_names())
+    return result
+
 class NamerError(Exception):
     """problem
     """
@@ -63,6 +76,32 @@ class suboperation_helper:
         self.eval_value = self.value
         self.suboperations = suboperations
 
+    @classmethod
+    def compile(cls, suboperations):
+        """Parses the suboperation(s) into a list of (method name, arguments) that can be applied with apply.
+        :param suboperations: the suboperation string, e.g. .tolower().substring(0,2)
+        :return: a list of tuples (method name, argument tuple)
+        """
+        result = []
+        m = re.search(SUBOP_PATTERN, suboperations)
+        while m:
+            span = m.span()
+            suboperations = suboperations[span[1]:]
+            args = m.group(3)
+            result.append((m.group(1), ast.literal_eval("(%s,)"%args) if args else ()))
+            m = re.search(SUBOP_PATTERN, suboperations)
+        return result
+
+    def apply(self, operations):
+        """Executes the compiled suboperation(s) on the value from left to right
+        :param operations: the operations as returned by compile
+        :return: the evaluated value
+        """
+        self.eval_value = self.value
+        for name, args in operations:
+            self.eval_value = getattr(self, name)(*args)
+        return self.eval_value
+
     def eval(self):
         """Executes the suboperation(s) on the value in from left to right
         """
@@ -217,6 +256,12 @@ class metadata_namer_operation(object):
         """
         raise RuntimeError("Subclass must implement create")
 
+    def attribute_names(self):
+        """Subclasses reading attributes that are not always read from the file should return them here.
+        :return: the attribute names used by the operation
+        """
+        return []
+
 ##
 # Used to create file names from metadata associated with a ODIM h5 file.
 class metadata_namer:
@@ -229,6 +274,8 @@ class metadata_namer:
         self.tmpl = tmpl
         self.tagoperations={}
         self._properties = {}
+        self._compiled = None
+        _namers.add(self)
     
     def register_operation(self, tag, operation):
         """Registers a namer operation
@@ -236,6 +283,7 @@ class metadata_namer:
         :param operation: a metadata_namer_operation instance
         """
         self.tagoperations[tag] = operation
+        self._compiled = None
 
     def set_properties(self, properties):
         """Sets properties in the namer. Can either provide a property file name or else a dictionary.
@@ -262,92 +310,154 @@ class metadata_namer:
         """
         return self.tmpl
 
-    def name(self, meta, fail_on_missing_placeholder=False, keep_missing_placeholder=True, replace_slash_in_placeholder=False):
+    def attribute_names(self):
         """
-        :param meta: the metadata to create the name from
-        :return: the created string
+        :return: the attribute names referenced by the template in the same form as the filters, i.e. without
+                 the :key part in for example what/source:NOD
         """
-        buffer = StringIO()
-        
-        parsed_tmpl = self.tmpl
-        m = re.search(PATTERN, parsed_tmpl)
-        while m:
-            span = m.span() # Keeps track on where in file this pattern is matching
-            placeholder = m.group(2);
-            suboperation = m.group(3);
-            
-            # This is the beginning of the name until the first match
-            buffer.write(parsed_tmpl[0:span[0]])
-            if placeholder.startswith("_baltrad/source:"):
-                replacement_value = self.get_source_item(placeholder[16:], Source.from_string(meta.bdb_source))
-            elif placeholder.startswith("_baltrad/source_name"):
-                replacement_value = meta.bdb_source_name
-            elif placeholder.startswith("what/source:"):
-                replacement_value = self.get_source_item(placeholder[12:], Source.from_string(meta.what_source))
-            elif placeholder.startswith("/what/source:"):
-                replacement_value = self.get_source_item(placeholder[13:], Source.from_string(meta.what_source))
-            elif placeholder.startswith("_property:"):
-                replacement_value = self.get_property(placeholder[10:])
-            elif placeholder in self.tagoperations:
-                replacement_value = self.tagoperations[placeholder].create(placeholder, meta)
-            elif BALTRAD_DATETIME_PATTERN.search(placeholder):
-                m = BALTRAD_DATETIME_PATTERN.match(placeholder)
-                t = m.group(1)
-                if t and t.find(":") >= 0:
-                    t = t[t.find(":")+1:]
-                if not t:
-                    t = "%Y%m%d%H%M%S"
-                dt = datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0)
-                replacement_value = dt.strftime(t)
-            elif BALTRAD_DATETIMEU_PATTERN.search(placeholder):
-                m = BALTRAD_DATETIMEU_PATTERN.match(placeholder)
-                i = int(m.group(1))
-                t = m.group(2)
-                if t and t.find(":") >= 0:
-                    t = t[t.find(":")+1:]
-                if not t:
-                    t = "%Y%m%d%H%M%S"
-                    
-                dt = datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0)
+        result = set()
+        for m in PATTERN.finditer(self.tmpl):
+            placeholder = m.group(2)
+            if placeholder is None:
+                continue
+            if placeholder in self.tagoperations:
+                result.update(self.tagoperations[placeholder].attribute_names())
+                continue
+            if placeholder.startswith("_"):
+                continue
+            if ":" in placeholder:
+                placeholder = placeholder[:placeholder.find(":")]
+            result.add(placeholder)
+        return result
+
+    def create_datetime_resolver(self, placeholder):
+        """Creates a resolver for the _baltrad/datetime* and _baltrad/currentdt placeholders
+        :param placeholder: the placeholder
+        :return: a function called with the metadata or None if placeholder isn't a datetime placeholder
+        """
+        m = BALTRAD_DATETIME_PATTERN.match(placeholder)
+        if m:
+            t = self.datetime_format(m.group(1))
+            return lambda meta: self.nominal_datetime(meta).strftime(t)
+
+        m = BALTRAD_DATETIMEU_PATTERN.match(placeholder)
+        if m:
+            i = int(m.group(1))
+            t = self.datetime_format(m.group(2))
+            def datetime_u(meta):
                 period = int(meta.what_time.minute/i)
                 nminute = (period+1)*int(i)
-                dt = dt + timedelta(minutes=nminute - meta.what_time.minute)
-                    
-                replacement_value = dt.strftime(t)
-
-            elif BALTRAD_DATETIMEL_PATTERN.search(placeholder):
-                m = BALTRAD_DATETIMEL_PATTERN.match(placeholder)
-                i = int(m.group(1))
-                t = m.group(2)
-                if t and t.find(":") >= 0:
-                    t = t[t.find(":")+1:]
-                if not t:
-                    t = "%Y%m%d%H%M%S"
-                    
-                dt = datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0)
+                return (self.nominal_datetime(meta) + timedelta(minutes=nminute - meta.what_time.minute)).strftime(t)
+            return datetime_u
+
+        m = BALTRAD_DATETIMEL_PATTERN.match(placeholder)
+        if m:
+            i = int(m.group(1))
+            t = self.datetime_format(m.group(2))
+            def datetime_l(meta):
                 nminute = meta.what_time.minute%int(i)
-                dt = dt - timedelta(minutes=nminute)
-                    
-                replacement_value = dt.strftime(t)
-
-            elif CURRENT_DATETIME_PATTERN.search(placeholder):
-                m = CURRENT_DATETIME_PATTERN.match(placeholder)
-                t = m.group(1)
-                if t and t.find(":") >= 0:
-                    t = t[t.find(":")+1:]
-                if not t:
-                    t = "%Y%m%d%H%M%S"
-                dt = datetime.now(timezone.utc)
-                replacement_value = dt.strftime(t)
+                return (self.nominal_datetime(meta) - timedelta(minutes=nminute)).strftime(t)
+            return datetime_l
+
+        m = CURRENT_DATETIME_PATTERN.match(placeholder)
+        if m:
+            t = self.datetime_format(m.group(1))
+            return lambda meta: datetime.now(timezone.utc).strftime(t)
 
+        return None
+
+    def datetime_format(self, t):
+        """
+        :param t: the format part of a datetime placeholder, e.g. :%Y%m%d
+        :return: the strftime format
+        """
+        if t and t.find(":") >= 0:
+            t = t[t.find(":")+1:]
+        if not t:
+            t = "%Y%m%d%H%M%S"
+        return t
+
+    def nominal_datetime(self, meta):
+        """
+        :param meta: the metadata
+        :return: the nominal datetime of the file
+        """
+        return filecontext.get_context(meta).nominal_datetime()
+
+    def create_resolver(self, placeholder):
+        """Creates the function that returns the value of a placeholder
+        :param placeholder: the placeholder
+        :return: a function called with the metadata returning the value or None if it can't be resolved
+        """
+        if placeholder.startswith("_baltrad/source:"):
+            key = placeholder[16:]
+            return lambda meta: self.get_source_item(key, filecontext.get_context(meta).source())
+        elif placeholder.startswith("_baltrad/source_name"):
+            return lambda meta: meta.bdb_source_name
+        elif placeholder.startswith("what/source:"):
+            key = placeholder[12:]
+            return lambda meta: self.get_source_item(key, filecontext.get_context(meta).what_source())
+        elif placeholder.startswith("/what/source:"):
+            key = placeholder[13:]
+            return lambda meta: self.get_source_item(key, filecontext.get_context(meta).what_source())
+        elif placeholder.startswith("_property:"):
+            key = placeholder[10:]
+            return lambda meta: self.get_property(key)
+        elif placeholder in self.tagoperations:
+            operation = self.tagoperations[placeholder]
+            return lambda meta: operation.create(placeholder, meta)
+
+        resolver = self.create_datetime_resolver(placeholder)
+        if resolver is None:
+            resolver = lambda meta: self.get_attribute_value(placeholder, meta)
+        return resolver
+
+    def compile(self):
+        """Parses the template into a list where each item either is a literal string or a tuple
+        (resolver, suboperations, placeholder text). The result is cached until an operation is registered.
+        :return: the compiled template
+        """
+        compiled = self._compiled
+        if compiled is not None and compiled[0] == self.tmpl:
+            return compiled[1]
+
+        segments = []
+        pos = 0
+        for m in PATTERN.finditer(self.tmpl):
+            span = m.span()
+            if span[0] > pos:
+                segments.append(self.tmpl[pos:span[0]])
+            placeholder = m.group(2)
+            if placeholder is None: # $$
+                segments.append((lambda meta: None, None, m.group(0)))
             else:
-                replacement_value = self.get_attribute_value(placeholder, meta)
+                suboperations = suboperation_helper.compile(m.group(3)) if m.group(3) else None
+                segments.append((self.create_resolver(placeholder), suboperations, m.group(0)))
+            pos = span[1]
+        if pos < len(self.tmpl):
+            segments.append(self.tmpl[pos:])
 
+        self._compiled = (self.tmpl, segments)
+        return segments
+
+    def name(self, meta, fail_on_missing_placeholder=False, keep_missing_placeholder=True, replace_slash_in_placeholder=False):
+        """
+        :param meta: the metadata to create the name from
+        :return: the created string
+        """
+        result = []
+        for segment in self.compile():
+            if segment.__class__ is str:
+                result.append(segment)
+                continue
+
+            resolver, suboperations, text = segment
+            replacement_value = resolver(meta)
             if replacement_value is not None:
-                if suboperation:
-                    replacement_value = suboperation_helper(replacement_value,suboperation).eval()
+                if suboperations:
+                    replacement_value = suboperation_helper(replacement_value, "").apply(suboperations)
             else:
-                replacement_value = parsed_tmpl[span[0]:span[1]]
+                replacement_value = text
                 if fail_on_missing_placeholder:
                     raise NamerError("No placeholder '%s'"%replacement_value)
                 elif keep_missing_placeholder == False:
@@ -356,15 +466,14 @@ class metadata_namer:
                     replacement_value = replacement_value.replace('/', '|')
 
             if isinstance(replacement_value,float):
-                buffer.write("%g"%replacement_value)
+                result.append("%g"%replacement_value)
             elif isinstance(replacement_value,int):
-                buffer.write("%d"%replacement_value)
+                result.append("%d"%replacement_value)
+            elif isinstance(replacement_value,str):
+                result.append(replacement_value)
             else:
-                buffer.write(replacement_value)
-            parsed_tmpl = parsed_tmpl[span[1]:]
-            m = re.search(PATTERN, parsed_tmpl)
-        buffer.write(parsed_tmpl)   
-        return buffer.getvalue()
+                raise TypeError("string argument expected, got '%s'"%type(replacement_value).__name__)
+        return "".join(result)
     
     def get_attribute_value(self, name, meta):
         """
@@ -374,7 +483,7 @@ class metadata_namer:
         :throws LookupError: if name not could be found
         """
         try:
-            return meta.node(name).value
+            return metaindex.node(meta, name).value
         except LookupError:
             return None
 
@@ -394,41 +503,28 @@ class property_metadata_namer(metadata_namer):
         """
         super(property_metadata_namer, self).__init__(tmpl)
 
+    def attribute_names(self):
+        """
+        :return: an empty set since only _property placeholders are replaced
+        """
+        return set()
+
+    def create_resolver(self, placeholder):
+        """Only _property placeholders are replaced, all other placeholders are kept as is.
+        :param placeholder: the placeholder
+        :return: a function called with the metadata returning the value or None if it can't be resolved
+        """
+        if placeholder.startswith("_property:"):
+            key = placeholder[10:]
+            return lambda meta: self.get_property(key)
+        return lambda meta: None
+
     def name(self, meta):
         """
         :param meta: the metadata to create the name from
         :return: the created string
         """
-        buffer = StringIO()
-        
-        parsed_tmpl = self.tmpl
-        m = re.search(PATTERN, parsed_tmpl)
-        while m:
-            span = m.span() # Keeps track on where in file this pattern is matching
-            placeholder = m.group(2);
-            suboperation = m.group(3);
-            
-            # This is the beginning of the name until the first match
-            buffer.write(parsed_tmpl[0:span[0]])
-            replacement_value=None
-            if placeholder.startswith("_property:"):
-                replacement_value = self.get_property(placeholder[10:])
-
-            if replacement_value is not None:
-                if suboperation:
-                    replacement_value = suboperation_helper(replacement_value,suboperation).eval()
-            else:
-                replacement_value = parsed_tmpl[span[0]:span[1]]
-            if isinstance(replacement_value,float):
-                buffer.write("%g"%replacement_value)
-            elif isinstance(replacement_value,int):
-                buffer.write("%d"%replacement_value)
-            else:
-                buffer.write(replacement_value)
-            parsed_tmpl = parsed_tmpl[span[1]:]
-            m = re.search(PATTERN, parsed_tmpl)
-        buffer.write(parsed_tmpl)   
-        return buffer.getvalue()
+        return super(property_metadata_namer, self).name(meta)
 
 class metadata_namer_manager:
     def __init__(self):
@@ -485,6 +581,12 @@ class opera_filename_namer(metadata_namer_operation):
         else:
             raise Exception("Must provide namer_config in arguments")
 
+    def attribute_names(self):
+        """
+        :return: the attributes used for identifying the quantities and elevation angles in the file
+        """
+        return ["what/quantity", "where/elangle"]
+
     def read_config(self, filename):
         with open(filename, "r") as fp:
             cfg = json.load(fp)
@@ -520,16 +622,17 @@ class opera_filename_namer(metadata_namer_operation):
             A2=None
             quantities = []
             elangles = []
-            for setctr in range(1,30):
-                setnode = meta.find_node(f"/dataset{setctr}")
+            index = metaindex.get_index(meta)
+            for setctr, setnode in index.datasets():
+                if setctr >= 30:
+                    break
                 if setnode:
-                    elangle = meta.find_node(f"/dataset1/where/elangle")
+                    elangle = index.find_node("/dataset1/where/elangle")
                     if not elangle:
                         break
                     elangles.append(elangle.value)
-                    for paramctr in range(1,40):
-                        paramnode = meta.find_node(f"/dataset{setctr}/data{paramctr}/what/quantity")
-                        if not paramnode:
+                    for paramctr, (dataidx, paramnode) in enumerate(index.quantities(setctr), 1):
+                        if paramctr >= 40 or dataidx != paramctr or not paramnode:
                             break
                         paramname = paramnode.value_str()
                         if paramname not in quantities:
@@ -574,14 +677,14 @@ class opera_filename_namer(metadata_namer_operation):
                     A2="Y"
 
             CCCC=meta.source_parent["CCCC"]
-            ii = Source.from_string(meta.bdb_source)["RAD"][2:]
+            ii = filecontext.get_context(meta).source()["RAD"][2:]
             
-            dt = datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0)
+            dt = filecontext.get_context(meta).nominal_datetime()
             yyyyMMddhhmmss = dt.strftime("%Y%m%d%H%M%S")
             opera_name=f"T_PA{A1}{A2}{ii}_C_{CCCC}_{yyyyMMddhhmmss}"
         elif meta.what_object in ["VP"]:
             source_name = meta.bdb_source_name
-            dt = datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0)
+            dt = filecontext.get_context(meta).nominal_datetime()
             yyyyMMddhhmmss = dt.strftime("%Y%m%dT%H%M%SZ")
             opera_name=f"{source_name}_vp_{yyyyMMddhhmmss}"
         else:
@@ -111,11 +111,11 @@ class failover_connection(publisher_connection):
         for sender in self._senders:
             try:
                 sender.send(path, meta)
-                logger.info("failover_connection: Successfully sent file to %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.info("failover_connection: Successfully sent file to %s, ID:'%s'", sender.id(), util.fileid(meta))
                 successful = True
                 break
             except:
-                logger.exception("failover_connection: Failed to send file to %s, ID:'%s', trying next in list"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.exception("failover_connection: Failed to send file to %s, ID:'%s', trying next in list", sender.id(), util.fileid(meta))
         if not successful:
             raise Exception("Failed to publish using the failover connection")
 
@@ -135,9 +135,9 @@ class backup_connection(publisher_connection):
         for sender in self._senders:
             try:
                 sender.send(path, meta)
-                logger.info("Successfully sent file to %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.info("Successfully sent file to %s, ID:'%s'", sender.id(), util.fileid(meta))
             except Exception as e:
-                logger.exception("Failed to send file to %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.exception("Failed to send file to %s, ID:'%s'", sender.id(), util.fileid(meta))
 
 
 class distributed_connection(publisher_connection):
@@ -157,9 +157,9 @@ class distributed_connection(publisher_connection):
         for sender in self._senders:
             try:
                 sender.send(path, meta)
-                logger.info("Successfully sent file to %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.info("Successfully sent file to %s, ID:'%s'", sender.id(), util.fileid(meta))
             except Exception as e:
-                logger.exception("Failed to send file to %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.exception("Failed to send file to %s, ID:'%s'", sender.id(), util.fileid(meta))
 
 
 class parallel_connection_sender(object):
@@ -180,15 +180,19 @@ class parallel_connection_sender(object):
         :param path: the path to the physical file
         :param meta: the meta information
         """
-        tmpfile = NamedTemporaryFile(dir=self._sender.backend().get_tmp_folder())
-        with open(path, "rb") as fp:
-            shutil.copyfileobj(fp, tmpfile)
-        tmpfile.flush()        
+        spool = self._sender.backend().get_spool()
+        if spool is not None:
+            tmpfile = spool.acquire(path)
+        else:
+            tmpfile = NamedTemporaryFile(dir=self._sender.backend().get_tmp_folder())
+            with open(path, "rb") as fp:
+                shutil.copyfileobj(fp, tmpfile)
+            tmpfile.flush()
 
         try:
             self._queue.put((tmpfile, meta))
         except Full as e:
-            logger.exception("Queue for sender '%s' is full, dropping message with ID:'%s'"%(self.id(), util.create_fileid_from_meta(meta)))
+            logger.exception("Queue for sender '%s' is full, dropping message with ID:'%s'", self.id(), util.fileid(meta))
             try:
                 tmpfile.close()
             except:
@@ -204,14 +208,14 @@ class parallel_connection_sender(object):
             try:
                  # In 3.13 there will be support for shutdown. So we need to use nowait and instead use _event.wait for notification purposes
                 tmpfile, meta = self._queue.get()
-                self._sender.send(tmpfile, meta)
+                self._sender.send(tmpfile.name, meta)
 
                 self._queue.task_done()
 
-                logger.info("Successfully sent file to %s using threaded sender, ID:'%s'"%(self._sender.id(), util.create_fileid_from_meta(meta)))
+                logger.info("Successfully sent file to %s using threaded sender, ID:'%s'", self._sender.id(), util.fileid(meta))
             except Exception:
                 if meta:
-                    logger.exception("Failed to send file to %s, ID:'%s'"%(self._sender.id(), util.create_fileid_from_meta(meta)))
+                    logger.exception("Failed to send file to %s, ID:'%s'", self._sender.id(), util.fileid(meta))
                 else:
                     logger.exception("Failed to send unknown item to %s" % self._sender.id())
 
@@ -279,9 +283,9 @@ class parallel_connection(publisher_connection):
         for sender in self._senders:
             try:
                 sender.send(path, meta)
-                logger.debug("Successfully passed file to threaded %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.debug("Successfully passed file to threaded %s, ID:'%s'", sender.id(), util.fileid(meta))
             except Exception as e:
-                logger.exception("Failed to pass file to threaded %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.exception("Failed to pass file to threaded %s, ID:'%s'", sender.id(), util.fileid(meta))
 
     def stop(self):
         for sender in self._senders:
@@ -317,7 +321,7 @@ class combined_connection(publisher_connection):
             try:
                 connection.publish(path, meta)
             except Exception as e:
-                logger.exception("Failed to publish file to %s, ID:'%s'"%(sender.id(), util.create_fileid_from_meta(meta)))
+                logger.exception("Failed to publish file to %s, ID:'%s'", sender.id(), util.fileid(meta))
 
 
 class connection_manager(object):
@@ -6,27 +6,42 @@ import urllib.parse as urlparse
 import re
 import os
 import fnmatch
-from tempfile import NamedTemporaryFile, TemporaryDirectory
-from paramiko import SSHClient
-from scp import SCPClient
+from tempfile import NamedTemporaryFile
 import ftplib
 import glob
+import stat
+import calendar
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bexchange.net.exceptions import DuplicateException
 
-from bexchange.net.sftpclient import sftpclient
 
 logger = logging.getLogger("bexchange.net.fetchers")
 
 class fetcher(object):
     """Base fetcher. All classes implementing this should provide ability to fetch files in some way. 
     """
-    def __init__(self, backend, aid):
+    def __init__(self, backend, aid, arguments=None):
         """Constructor
         :param backend: The server backend
         :param aid: An id identifying this fetcher
+        :param arguments: The fetcher arguments. If "incremental" is false, all matching files are fetched
+          on each trigger even if the server keeps track of fetched files.
         """
         super(fetcher, self).__init__()
         self._backend = backend
         self._id = aid
+        self._incremental = True
+        self._parallel_downloads = 1
+        if arguments and "incremental" in arguments:
+            self._incremental = arguments["incremental"]
+        if arguments and "parallel_downloads" in arguments:
+            self._parallel_downloads = arguments["parallel_downloads"]
+            if not isinstance(self._parallel_downloads, int) or self._parallel_downloads < 1:
+                raise AttributeError("parallel_downloads should be a positive integer")
         
     def id(self):
         """Returns this fetcher id
@@ -44,6 +59,115 @@ class fetcher(object):
         """
         raise NotImplementedError("Not implemented")
 
+    def fetch_state(self):
+        """
+        :return the store keeping track of fetched files or None if all matching files should be fetched
+        """
+        if not self._incremental:
+            return None
+        return self.backend().get_fetch_state()
+
+    def new_files(self, entries):
+        """Filters the listed files so that only files that are new or have been modified since they were fetched are returned
+        :param entries: list of tuples (name, size, mtime). size and mtime can be None if they aren't known
+        :return the entries that should be fetched
+        """
+        state = self.fetch_state()
+        if state is None:
+            return entries
+        result = state.changed(self.id(), entries)
+        logger.debug("%s: %d of %d listed files are new or modified"%(self.id(), len(result), len(entries)))
+        return result
+
+    def store_fetched(self, filename, entry):
+        """Stores the fetched file in the backend and marks it as fetched. Duplicates are logged and marked as fetched.
+        :param filename: the local file
+        :param entry: the listed entry (name, size, mtime) for the file
+        """
+        try:
+            self.backend().store_file(filename, self.id())
+        except DuplicateException as e:
+            logger.info("%s: %s"%(self.id(), str(e)))
+        state = self.fetch_state()
+        if state is not None:
+            state.fetched(self.id(), entry)
+
+    def fetch_parallel(self, entries, open_channel, close_channel, download):
+        """Downloads the files in parallel_downloads worker threads and stores them in the calling thread in the listed
+        order. The next files are downloaded while the previous file is stored and at most twice as many files as there
+        are worker threads are downloaded ahead. Files that couldn't be downloaded or stored are logged and skipped so
+        that they are fetched again on the next trigger.
+        :param entries: list of tuples (name, size, mtime) to fetch
+        :param open_channel: called once in each worker thread to open the channel used by the thread
+        :param close_channel: called with each opened channel when all files have been fetched
+        :param download: called as download(channel, entry, filename) in a worker thread to download the file
+        :raise: Exception if some of the files couldn't be fetched
+        """
+        if not entries:
+            return
+        tmpfolder = self.backend().get_tmp_folder()
+        local = threading.local()
+        lock = threading.Lock()
+        channels = []
+
+        def worker(entry):
+            channel = getattr(local, "channel", None)
+            if channel is None:
+                channel = open_channel()
+                local.channel = channel
+                with lock:
+                    channels.append(channel)
+            with NamedTemporaryFile(dir=tmpfolder, delete=False) as tfo:
+                filename = tfo.name
+            try:
+                download(channel, entry, filename)
+            except:
+                os.unlink(filename)
+                raise
+            return filename
+
+        pending = deque()
+        remaining = deque(entries)
+        window = 2 * self._parallel_downloads
+        failed = 0
+        try:
+            with ThreadPoolExecutor(self._parallel_downloads, thread_name_prefix="fetcher") as executor:
+                try:
+                    while remaining or pending:
+                        while remaining and len(pending) < window:
+                            entry = remaining.popleft()
+                            pending.append((entry, executor.submit(worker, entry)))
+                        entry, future = pending.popleft()
+                        try:
+                            filename = future.result()
+                        except Exception:
+                            logger.exception("%s: Failed to download %s"%(self.id(), entry[0]))
+                            failed = failed + 1
+                            continue
+                        try:
+                            self.store_fetched(filename, entry)
+                        except Exception:
+                            logger.exception("%s: Failed to store %s"%(self.id(), entry[0]))
+                            failed = failed + 1
+                        finally:
+                            os.unlink(filename)
+                finally:
+                    for entry, future in pending:
+                        if not future.cancel():
+                            try:
+                                os.unlink(future.result())
+                            except Exception:
+                                pass
+        finally:
+            for channel in channels:
+                try:
+                    close_channel(channel)
+                except Exception:
+                    logger.exception("%s: Failed to close channel"%self.id())
+
+        if failed > 0:
+            raise Exception("%d of %d files could not be fetched"%(failed, len(entries)))
+
 class baseuri_fetcher(fetcher):
     """Base class for fetching data using basic file transmission protocols like sftp, ftp, ...
     """
@@ -59,7 +183,7 @@ class baseuri_fetcher(fetcher):
          This is a base class so the uri is parsed and appropriate members are set. There is no support for any sort of 
          routing appropriate scheme to correct fetcher.
         """
-        super(baseuri_fetcher, self).__init__(backend, aid)
+        super(baseuri_fetcher, self).__init__(backend, aid, arguments)
         self._arguments = arguments
         self._uri = None
         self._hostname = None
@@ -176,27 +300,35 @@ class sftp_fetcher(baseuri_patternmatching_fetcher):
         if not self.fnpattern() and not self.pattern():
             raise Exception("Neither fnpattern or pattern provided") 
         
+    def download(self, channel, entry, filename):
+        """Downloads the file using read ahead since the size is known from the listing
+        :param channel: the sftpclient used by the worker thread
+        :param entry: the listed entry (name, size, mtime)
+        :param filename: the local file to write to
+        """
+        with open(filename, "wb") as fp:
+            channel.getfo("%s/%s"%(self.path(), entry[0]), fp, entry[1])
+
     def fetch(self, **kwargs):
         """Fetches the file using sftp.
         :param file: path to file that should be published
         :param meta: the meta object for all metadata of file
         """
         logger.debug("Running sftp_fetcher: %s"%self.hostname())
+        from bexchange.net.sftpclient import sftpclient
         with sftpclient(self.hostname(), port=self.port(), username=self.username(), password=self.password()) as c:
-            files = c.listdir(self.path())
-            for f in files:
+            entries = []
+            for attr in c.listdir_attr(self.path()):
+                f = attr.filename
                 if self.fnpattern() and not fnmatch.fnmatch(f, self.fnpattern()):
                     continue
                 if self.pattern_matcher() and not self.pattern_matcher().match(f):
                     continue
-                
-                fullname = "%s/%s"%(self.path(), f)
-                if not c.isfile(fullname):
+                if attr.st_mode is not None and not stat.S_ISREG(attr.st_mode):
                     continue
-                ntfargs={"dir":self.backend().get_tmp_folder()}
-                with NamedTemporaryFile(**ntfargs) as tfo:
-                    c.getfo(fullname, tfo)
-                    self.backend().store_file(fullname, self.id())
+                entries.append((f, attr.st_size, attr.st_mtime))
+
+            self.fetch_parallel(self.new_files(entries), c.open_channel, lambda channel: channel.disconnect(), self.download)
 
 class scp_fetcher(baseuri_patternmatching_fetcher):
     """Fetcher file(s) using scp
@@ -218,35 +350,60 @@ class scp_fetcher(baseuri_patternmatching_fetcher):
         :param meta: the meta object for all metadata of file
         """
         logger.debug("Running scp_fetcher: %s"%self.hostname())
+        from paramiko import SSHClient
+        from scp import SCPClient
         ssh = None
-        scp = None
         try:
             ssh = SSHClient()
             ssh.load_system_host_keys()
             ssh.connect(self.hostname(), self.port(), self.username(), self.password());
-            _, sout, _ = ssh.exec_command("ls -1 %s"%self.path())
-            files = str(sout.read(), "utf-8").split("\n")
-            scp = SCPClient(ssh.get_transport())
-            tdargs={}
-            with TemporaryDirectory(**tdargs) as tmpdir:
-                for f in files:
-                    if f.strip():
-                        bname = os.path.basename(f)
-                        fullname = os.path.join(tmpdir, bname)
-                        scp.get(f.strip(), fullname)
-                        self.backend().store_file(fullname, self.id())
+            entries = self.list_files(ssh)
+            self.fetch_parallel(self.new_files(entries),
+                                lambda: SCPClient(ssh.get_transport()),
+                                lambda channel: channel.close(),
+                                lambda channel, entry, filename: channel.get(entry[0], filename))
         finally:
-            if scp:
-                try:
-                    scp.close()
-                except:
-                    pass
             if ssh:
                 try:
                     ssh.close()
                 except:
                     pass
 
+    def list_files(self, ssh):
+        """Lists the files on the remote host. The size and modification time are read using stat. If stat isn't
+        available (e.g. a non GNU host), the files are listed with ls and size and modification time are unknown.
+        :param ssh: the connected ssh client
+        :return a list of tuples (name, size, mtime)
+        """
+        path = self.path()
+        if not any(c in path for c in "*?["):
+            path = "%s/*"%path.rstrip("/")
+        _, sout, _ = ssh.exec_command("stat -L -c '%%f %%s %%Y %%n' %s"%path)
+        lines = str(sout.read(), "utf-8").split("\n")
+        entries = []
+        try:
+            if sout.channel.recv_exit_status() != 0:
+                raise ValueError("stat failed")
+            for line in lines:
+                if line.strip():
+                    mode, size, mtime, name = line.split(" ", 3)
+                    if stat.S_ISREG(int(mode, 16)):
+                        entries.append((name, int(size), float(mtime)))
+        except ValueError:
+            logger.info("%s: Could not stat files on %s, fetching all files"%(self.id(), self.hostname()))
+            _, sout, _ = ssh.exec_command("ls -1 %s"%self.path())
+            entries = [(f.strip(), None, None) for f in str(sout.read(), "utf-8").split("\n") if f.strip()]
+
+        result = []
+        for entry in entries:
+            bname = os.path.basename(entry[0])
+            if self.fnpattern() and not fnmatch.fnmatch(bname, self.fnpattern()):
+                continue
+            if self.pattern_matcher() and not self.pattern_matcher().match(bname):
+                continue
+            result.append(entry)
+        return result
+
 class ftp_fetcher(baseuri_patternmatching_fetcher):
     """Fetcher file(s) using scp
     """
@@ -275,25 +432,46 @@ class ftp_fetcher(baseuri_patternmatching_fetcher):
         if not ftp:
             raise Exception("Failed to connect to remove ftp server")
 
-        files=[]
         try:
             ftp.cwd(self.path())
-            files = ftp.nlst()
-            
-            for f in files:
-                tdargs={"dir":self.backend().get_tmp_folder()}
-                if self.fnpattern() and not fnmatch.fnmatch(f, self.fnpattern()):
+            entries = []
+            for entry in self.list_files(ftp):
+                if self.fnpattern() and not fnmatch.fnmatch(entry[0], self.fnpattern()):
                     continue
-                if self.pattern_matcher() and not self.pattern_matcher().match(f):
+                if self.pattern_matcher() and not self.pattern_matcher().match(entry[0]):
                     continue
-                
+                entries.append(entry)
+
+            for entry in self.new_files(entries):
+                tdargs={"dir":self.backend().get_tmp_folder()}
                 with NamedTemporaryFile(**tdargs) as fp:
-                    ftp.retrbinary("RETR %s"%f, fp.write)
+                    ftp.retrbinary("RETR %s"%entry[0], fp.write)
                     fp.flush()
-                    self.backend().store_file(fp.name, self.id())
+                    self.store_fetched(fp.name, entry)
         finally:
             ftp.quit()
 
+    def list_files(self, ftp):
+        """Lists the files in the current directory using MLSD so that size and modification time are known. If the
+        server doesn't support MLSD, NLST is used and size and modification time are unknown.
+        :param ftp: the connected ftp client
+        :return a list of tuples (name, size, mtime)
+        """
+        try:
+            entries = []
+            for name, facts in ftp.mlsd(facts=["type", "size", "modify"]):
+                if facts.get("type", "file") != "file":
+                    continue
+                size = int(facts["size"]) if "size" in facts else None
+                mtime = None
+                if "modify" in facts:
+                    mtime = float(calendar.timegm(time.strptime(facts["modify"][:14], "%Y%m%d%H%M%S")))
+                entries.append((name, size, mtime))
+            return entries
+        except ftplib.error_perm:
+            logger.info("%s: MLSD not supported by %s, fetching all files"%(self.id(), self.hostname()))
+            return [(f, None, None) for f in ftp.nlst()]
+
     ##
     # Connects to remote server
     def connect(self):
@@ -315,7 +493,7 @@ class copy_fetcher(fetcher):
            "path":"....",
          }
         """
-        super(copy_fetcher, self).__init__(backend, aid)
+        super(copy_fetcher, self).__init__(backend, aid, arguments)
         self._path = arguments["path"]
         self._pattern = None
         self._fnpattern = "*.h5"
@@ -338,11 +516,20 @@ class copy_fetcher(fetcher):
 
         files = glob.glob("%s/%s"%(self._path, self._fnpattern))
         
+        entries = []
         for f in files:
             bname = os.path.basename(f)
             if self.pattern_matcher() and not self.pattern_matcher().match(bname):
                 continue
-            self.backend().store_file(f, self.id())
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                entries.append((f, st.st_size, st.st_mtime))
+
+        for entry in self.new_files(entries):
+            self.store_fetched(entry[0], entry)
 
     def pattern_matcher(self):
         """
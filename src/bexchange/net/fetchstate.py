@@ -0,0 +1,118 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Keeps track of the remote files that have been fetched so that the fetchers only
+## have to download new or modified files.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import os
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger("bexchange.net.fetchstate")
+
+class fetch_state(object):
+    """Persistent store with the name, size and modification time of each file fetched by a fetcher. When a
+    fetcher has listed the remote directory, the listing is compared with the store and only files that are new
+    or where size or modification time has changed are returned. Entries for files that no longer are listed
+    are removed at the same time. Files where size and modification time are unknown are always fetched.
+    """
+    def __init__(self, filename):
+        """Constructor
+        :param filename: name of the sqlite file
+        """
+        dirname = os.path.dirname(filename)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        self._filename = filename
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS fetched_files (fetcher TEXT NOT NULL, name TEXT NOT NULL, size INTEGER, mtime REAL, PRIMARY KEY (fetcher, name))")
+        self._listed = 0
+        self._changed = 0
+        self._pruned = 0
+
+    def changed(self, fetcherid, entries):
+        """Compares the listed files with the already fetched files and removes the entries that no longer are listed.
+        :param fetcherid: the fetcher id
+        :param entries: list of tuples (name, size, mtime) with the listed files
+        :return: the entries that are new or modified
+        """
+        with self._lock:
+            fetched = {}
+            for name, size, mtime in self._conn.execute("SELECT name, size, mtime FROM fetched_files WHERE fetcher = ?", (fetcherid,)):
+                fetched[name] = (size, mtime)
+
+            result = []
+            for entry in entries:
+                name, size, mtime = entry
+                if size is None or mtime is None or fetched.get(name) != (size, mtime):
+                    result.append(entry)
+
+            listed = set([e[0] for e in entries])
+            obsolete = [(fetcherid, name) for name in fetched if name not in listed]
+            if obsolete:
+                self._conn.executemany("DELETE FROM fetched_files WHERE fetcher = ? AND name = ?", obsolete)
+
+            self._listed = self._listed + len(entries)
+            self._changed = self._changed + len(result)
+            self._pruned = self._pruned + len(obsolete)
+            return result
+
+    def fetched(self, fetcherid, entry):
+        """Marks the file as fetched
+        :param fetcherid: the fetcher id
+        :param entry: tuple (name, size, mtime) as provided to changed
+        """
+        name, size, mtime = entry
+        if size is None or mtime is None:
+            return
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO fetched_files (fetcher, name, size, mtime) VALUES (?, ?, ?, ?)", (fetcherid, name, size, mtime))
+
+    def forget(self, fetcherid):
+        """Removes all entries for the fetcher so that all files are fetched again
+        :param fetcherid: the fetcher id
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM fetched_files WHERE fetcher = ?", (fetcherid,))
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with number of listed, changed and pruned files
+        """
+        with self._lock:
+            return {
+                "entries": self._conn.execute("SELECT COUNT(*) FROM fetched_files").fetchone()[0],
+                "listed": self._listed,
+                "changed": self._changed,
+                "pruned": self._pruned
+            }
+
+    def close(self):
+        """Closes the store
+        """
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
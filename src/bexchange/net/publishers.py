@@ -24,7 +24,7 @@
 import os
 
 from bexchange.client import rest
-from threading import Thread, Condition
+from threading import Thread, Condition, Lock
 from queue import Queue, Full, Empty
 import http.client as httplib
 import ftplib
@@ -37,7 +37,7 @@ from bexchange.matching import filters
 from bexchange.matching.filters import filter_manager
 from tempfile import NamedTemporaryFile
 import shutil
-from bexchange.decorators.decorator import decorator_manager
+from bexchange.decorators.decorator import decorator_manager, decorator_file
 from bexchange.net.connections import connection_manager
 from bexchange.statistics.statistics import statistics_manager
 from bexchange import util
@@ -66,8 +66,11 @@ class publisher(object):
         self._active = active
         self._origin = origin
         self._filter = ifilter
+        if isinstance(ifilter, filters.node_filter):
+            ifilter.compiled()
         self._connections = connections
         self._decorators = decorators
+        self._configuration = None
     
     def publish(self, file, meta):
         """publishes a file
@@ -120,11 +123,38 @@ class publisher(object):
         """
         return self._decorators
 
+    def configuration(self):
+        """Returns the configuration this publisher was created from
+        :return: the configuration or None if not created from configuration
+        """
+        return self._configuration
+
+    def set_configuration(self, config):
+        """Sets the configuration this publisher was created from
+        :param config: the json config in a dict
+        """
+        self._configuration = config
+
     def initialize(self):
         """Initializes the publisher before it is started.
         """
         pass
 
+    def take_over(self, previous):
+        """Lets this publisher take over the queue, threads and connections from a running publisher so that the
+        configuration can be replaced without dropping queued files. The publisher should not be initialized or started.
+        :param previous: the publisher to take over from
+        :return: True if this publisher took over, otherwise False and previous has to be stopped and this publisher started
+        """
+        return False
+
+    def release(self, successor):
+        """Called when successor has taken over from this publisher. Should release resources that aren't used by
+        successor.
+        :param successor: the publisher that took over
+        """
+        pass
+
     def start(self):
         """A publisher should most likely be managing threads and as such a start method is needed
         """
@@ -192,6 +222,53 @@ class pubQueue:
             self._shutdown = True
             self._condition.notify_all()
 
+class pubSlot:
+    """Points out the publisher that should handle the files consumed by a set of threads. When a publisher takes
+    over the threads, the slot is pointed to the new publisher. Keeps track of how many files each publisher is
+    handling so that the previous publisher can wait until its files have been handled.
+    """
+    def __init__(self, publisher):
+        """Constructor
+        :param publisher: the publisher
+        """
+        self.publisher = publisher
+        self._inflight = {}
+        self._condition = Condition()
+
+    def acquire(self):
+        """Returns the current publisher and registers one more file as handled by it
+        :return: the publisher
+        """
+        with self._condition:
+            p = self.publisher
+            self._inflight[id(p)] = self._inflight.get(id(p), 0) + 1
+            return p
+
+    def done(self, publisher):
+        """Registers that the publisher has handled a file
+        :param publisher: the publisher returned by acquire
+        """
+        with self._condition:
+            self._inflight[id(publisher)] = self._inflight[id(publisher)] - 1
+            if self._inflight[id(publisher)] == 0:
+                del self._inflight[id(publisher)]
+            self._condition.notify_all()
+
+    def replace(self, publisher):
+        """Points the slot to a new publisher. Files acquired after this call will be handled by publisher.
+        :param publisher: the new publisher
+        """
+        with self._condition:
+            self.publisher = publisher
+
+    def wait_idle(self, publisher):
+        """Waits until the publisher isn't handling any files
+        :param publisher: the publisher
+        """
+        with self._condition:
+            while id(publisher) in self._inflight:
+                self._condition.wait(1)
+
 class standard_publisher(publisher):
     """Standard publisher used for most situations. Provides two arguments. One is threads. The other is queue_size.
     """
@@ -222,6 +299,7 @@ class standard_publisher(publisher):
         self._queue_size = queue_size
         self._threads=[]
         self._queue = pubQueue(self._queue_size)
+        self._slot = pubSlot(self)
         self._running = False
 
         self._statistics_ok_plugin = None
@@ -241,40 +319,19 @@ class standard_publisher(publisher):
             logger.info("Publisher is going down, will not handle more files")
             return
 
-        tmpfile = NamedTemporaryFile(dir=self.backend().get_tmp_folder())
-        with open(file, "rb") as fp:
-            shutil.copyfileobj(fp, tmpfile)
-        tmpfile.flush()
+        spool = self.backend().get_spool()
+        if spool is not None:
+            tmpfile = spool.acquire(file)
+        else:
+            tmpfile = NamedTemporaryFile(dir=self.backend().get_tmp_folder())
+            with open(file, "rb") as fp:
+                shutil.copyfileobj(fp, tmpfile)
+            tmpfile.flush()
         
-        logger.debug("Decorating file '%s' with %d decorators before adding it on queue"%(tmpfile.name, len(self._decorators)))
-        if len(self._decorators) > 0:
-            fileid = util.create_fileid_from_meta(meta)
-            for d in self._decorators:
-                logger.info("Running decorator %s on ID:'%s'"%(type(d), fileid))
-                newtmpfile = d.decorate(tmpfile, meta)
-                if newtmpfile is None and d.discard_on_none():
-                    logger.info("Discarding %s completely since decorator configured for '%s' has discard_on_none=True"%(self.name(), fileid))
-                    tmpfile.close()
-                    return
-                elif newtmpfile is not None and newtmpfile != tmpfile:
-                    try:
-                        tmpfile.close()
-                    except:
-                        pass
-                    tmpfile = newtmpfile
-                elif newtmpfile is None:
-                    continue
-                
-                try:
-                    meta = self.backend().metadata_from_file(tmpfile.name)
-                except:
-                    if not d.can_return_invalid_file_content():
-                        raise
-
         try:
             self._queue.put((tmpfile, meta))
         except Full as e:
-            logger.exception("Queue for publisher '%s' is full, dropping message with ID:'%s'"%(self.name(), util.create_fileid_from_meta(meta)))
+            logger.exception("Queue for publisher '%s' is full, dropping message with ID:'%s'", self.name(), util.fileid(meta))
             try:
                 tmpfile.close()
             except:
@@ -284,6 +341,56 @@ class standard_publisher(publisher):
                 self._statistics_error_plugin.increment(self.name(), meta)
 
 
+    def run_decorator(self, d, tmpfile, meta):
+        """Runs the decorator. If the backend provides a decorator pool, the decorator is run in the pool.
+        :param d: the decorator
+        :param tmpfile: the file to decorate
+        :param meta: the metadata
+        :return: the result from the decorator
+        """
+        pool = self.backend().get_decorator_pool()
+        if pool is None or d.configuration() is None:
+            return d.decorate(tmpfile, meta)
+
+        result = pool.decorate(self.backend().get_tmp_folder(), d.configuration(), tmpfile.name, meta, d.timeout())
+        if result is None:
+            return None
+        elif result == tmpfile.name:
+            return tmpfile
+        return decorator_file(result)
+
+    def decorate(self, tmpfile, meta):
+        """Runs the decorators on the file.
+        :param tmpfile: the file to decorate
+        :param meta: the metadata
+        :return: a tuple (file, metadata) where file is None if the file should be discarded
+        """
+        logger.debug("Decorating file '%s' with %d decorators"%(tmpfile.name, len(self._decorators)))
+        fileid = util.create_fileid_from_meta(meta)
+        for d in self._decorators:
+            logger.info("Running decorator %s on ID:'%s'"%(type(d), fileid))
+            newtmpfile = self.run_decorator(d, tmpfile, meta)
+            if newtmpfile is None and d.discard_on_none():
+                logger.info("Discarding %s completely since decorator configured for '%s' has discard_on_none=True"%(self.name(), fileid))
+                tmpfile.close()
+                return None, meta
+            elif newtmpfile is not None and newtmpfile != tmpfile:
+                try:
+                    tmpfile.close()
+                except:
+                    pass
+                tmpfile = newtmpfile
+            elif newtmpfile is None:
+                continue
+
+            try:
+                meta = self.backend().metadata_from_file(tmpfile.name)
+            except:
+                if not d.can_return_invalid_file_content():
+                    tmpfile.close()
+                    raise
+        return tmpfile, meta
+
     def do_publish(self, tmpfile, meta):
         """Passes a file to all connections
         """
@@ -298,27 +405,46 @@ class standard_publisher(publisher):
         :param meta: the meta data
         """
         try:
+            if len(self._decorators) > 0:
+                cache = self.backend().get_decoration_cache()
+                key = cache.key(meta, self._decorators) if cache is not None else None
+                if key is not None:
+                    tmpfile, meta = cache.decorate(key, tmpfile, meta, self.decorate)
+                else:
+                    tmpfile, meta = self.decorate(tmpfile, meta)
+                if tmpfile is None:
+                    return
             self.do_publish(tmpfile, meta)
             if self._statistics_ok_plugin:
                 self._statistics_ok_plugin.increment(self.name(), meta)
         except Exception as e:
-            logger.exception("Publisher: '%s' failed to publish with ID:'%s'"%(self.name(), util.create_fileid_from_meta(meta)))
+            logger.exception("Publisher: '%s' failed to publish with ID:'%s'", self.name(), util.fileid(meta))
             if self._statistics_error_plugin:
                 self._statistics_error_plugin.increment(self.name(), meta)
+        finally:
+            try:
+                tmpfile.close()
+            except:
+                pass
 
     def consumer(self):
         """ The consumer called by the individual threads. Will grab one entry from the queue and pass it on to the connections.
+        The file is handled by the publisher currently owning the threads, see take_over.
         """
-        while self._running:
+        while self._slot.publisher._running:
             try:
                  # In 3.13 there will be support for shutdown. So we need to use nowait and instead use _event.wait for notification purposes
                 tmpfile, meta = self._queue.get()
 
-                self.handle_consumer_file(tmpfile, meta)
+                p = self._slot.acquire()
+                try:
+                    p.handle_consumer_file(tmpfile, meta)
+                finally:
+                    self._slot.done(p)
 
                 self._queue.task_done()
             except Exception:
-                if not self._running:
+                if not self._slot.publisher._running:
                     break
 
     def initialize(self):
@@ -326,6 +452,50 @@ class standard_publisher(publisher):
         """
         super(standard_publisher, self).initialize()
 
+    def take_over(self, previous):
+        """Takes over the queue and consumer threads from previous if it is a running publisher of the same type
+        with the same number of threads and queue size. Files already taken from the queue are handled by previous
+        and the remaining files by this publisher. If the connection configuration is unchanged, the connections
+        of previous are used instead of the ones created for this publisher.
+        :param previous: the publisher to take over from
+        :return: True if this publisher took over
+        """
+        if type(previous) is not type(self) or not previous._running or previous._slot.publisher is not previous:
+            return False
+        if previous._nrthreads != self._nrthreads or previous._queue_size != self._queue_size:
+            return False
+
+        if self.configuration() is not None and previous.configuration() is not None and \
+            self.configuration().get("connection") == previous.configuration().get("connection"):
+            for c in self._connections:
+                try:
+                    c.stop()
+                except:
+                    pass
+            self._connections = previous._connections
+
+        self._queue = previous._queue
+        self._threads = previous._threads
+        self._slot = previous._slot
+        self._running = True
+        self._slot.replace(self)
+        logger.info("Publisher '%s' took over %d threads and queue"%(self.name(), len(self._threads)))
+        return True
+
+    def release(self, successor):
+        """Waits until the files being handled by this publisher are done and stops the connections
+        that aren't used by successor.
+        :param successor: the publisher that took over
+        """
+        self._slot.wait_idle(self)
+        for c in self._connections:
+            if c not in successor.connections():
+                try:
+                    c.stop()
+                except:
+                    logger.exception("Failed to stop connection")
+        logger.info("Publisher '%s' released"%self.name())
+
     def start(self):
         """ Starts all consumer threads as daemon threads
         """
@@ -378,10 +548,11 @@ class publisher_manager:
             raise Exception("Must specify class as module.class")
     
     @classmethod
-    def from_conf(self, config, backend):
+    def from_conf(self, config, backend, start=True):
         """Creates the publisher instance from provided configuration.
         :param config: The json config in a dict
         :param backend: The backend the publisher shall have access to
+        :param start: If the publisher should be initialized and started
         :return: the created publisher
         """
         filter_manager = filters.filter_manager()
@@ -433,7 +604,8 @@ class publisher_manager:
                     discard_on_none=ds["discard_on_none"]
                 if "can_return_invalid_file_content" in ds:
                     can_return_invalid_file_content=ds["can_return_invalid_file_content"]
-                decorator = decorator_manager.create(backend, ds["decorator"], discard_on_none, can_return_invalid_file_content, ds["arguments"])
+                timeout = ds.get("timeout", None)
+                decorator = decorator_manager.create(backend, ds["decorator"], discard_on_none, can_return_invalid_file_content, ds["arguments"], timeout)
                 decorators.append(decorator)
 
         ifilter = filter_manager.from_value({"filter_type":"always_filter", "value":{}})
@@ -441,9 +613,10 @@ class publisher_manager:
             ifilter = filter_manager.from_value(config["filter"])
         
         p = self.create_publisher(name, publisher_clazz, backend, active, subscription_origin, ifilter, connections, decorators, extra_arguments)
+        p.set_configuration(config)
 
-        p.initialize()
-
-        p.start()
+        if start:
+            p.initialize()
+            p.start()
 
         return p
\ No newline at end of file
@@ -32,21 +32,17 @@ import os
 import ssl
 import stat
 import uuid
-import paramiko
 import ftplib
 import shutil
 import time
 import re
-from paramiko import SSHClient
-from scp import SCPClient
 
 from bexchange.naming.namer import metadata_namer, property_metadata_namer, metadata_namer_manager
 from bexchange.client import rest
-from bexchange.net.sftpclient import sftpclient
 from bexchange.net.exceptions import *
 from bexchange import util
-from baltradcrypto import crypto
-from baltradcrypto.crypto.keyczarcrypto import keyczar_signer
+
+# paramiko, scp and baltradcrypto are imported by the senders that use them so that they are only loaded when configured
 
 logger = logging.getLogger("bexchange.net.senders")
 
@@ -189,6 +185,7 @@ class dex_sender(sender):
         
         self._nodename = cr["nodename"]
         
+        from baltradcrypto.crypto.keyczarcrypto import keyczar_signer
         self._signer = keyczar_signer.read(self._privatekey)
 
     def _generate_headers(self, uri):
@@ -255,12 +252,12 @@ class dex_sender(sender):
     
         try:
             status, reason, data, response = self._post(scheme, host, query, fp.read(), headers)
-            logger.info("dex_sender: host:%s, status %s, reason: %s, ID:'%s'" % (host, str(status), reason, util.create_fileid_from_meta(meta)))
+            logger.info("dex_sender: host:%s, status %s, reason: %s, ID:'%s'", host, str(status), reason, util.fileid(meta))
             if status == 307 or status == 308:
                 newlocation = response.getheader("Location")
                 logger.warn("Redirecting message to: %s, check configuration!"%newlocation)
                 status, reason, data, response = self._post(scheme, newlocation, query, fp.read(), headers)
-                logger.info("dex_sender (redirected): host:%s, status %s, reason: %s, ID:'%s'" % (newlocation, str(status), reason, util.create_fileid_from_meta(meta)))
+                logger.info("dex_sender (redirected): host:%s, status %s, reason: %s, ID:'%s'", newlocation, str(status), reason, util.fileid(meta))
                 if status != 200:
                     raise SenderException(reason)    
             elif status != 200:
@@ -312,6 +309,7 @@ class rest_sender(sender):
         
         if "version" in arguments:
             self._version = arguments["version"]
+        from baltradcrypto import crypto
         self._signer = crypto.load_key(self._privatekey)
         if not isinstance(self._signer, crypto.private_key):
             raise Exception("Can't use key: %s for signing"%self._privatekey)
@@ -326,12 +324,12 @@ class rest_sender(sender):
         try:
             with open(path, "rb") as data:
                 entry = server.store(data)
-                logger.info("rest_sender: address:%s published ID:'%s'" % (self._address, util.create_fileid_from_meta(meta)))
+                logger.info("rest_sender: address:%s published ID:'%s'", self._address, util.fileid(meta))
         except DuplicateException:
-            logger.warn("rest_sender: address:%s failed to publish ID:'%s' CONFLICT!" % (self._address, util.create_fileid_from_meta(meta)))
+            logger.warn("rest_sender: address:%s failed to publish ID:'%s' CONFLICT!", self._address, util.fileid(meta))
             raise
         except:
-            logger.warn("rest_sender: address:%s failed to publish ID:'%s'" % (self._address, util.create_fileid_from_meta(meta)))
+            logger.warn("rest_sender: address:%s failed to publish ID:'%s'", self._address, util.fileid(meta))
             raise
 
 class baseuri_sender(sender):
@@ -460,6 +458,7 @@ class sftp_sender(baseuri_sender):
         :returns: a sftpclient instance with hostname, port, username and password set
         """
         if not self._client:
+            from bexchange.net.sftpclient import sftpclient
             self._client = sftpclient(self.hostname(), port=self.port(), username=self.username(), password=self.password())
         return self._client
 
@@ -504,12 +503,12 @@ class sftp_sender(baseuri_sender):
                 tfname = fname
                 for m, r in zip(*[iter(self._tmppattern)]*2):
                     tfname = re.sub(m, r, tfname)
-                logger.info("sftp_sender: address:%s, temporary basename:%s uploaded ID:'%s'" % (self.hostname(), tfname, util.create_fileid_from_meta(meta)))
+                logger.info("sftp_sender: address:%s, temporary basename:%s uploaded ID:'%s'", self.hostname(), tfname, util.fileid(meta))
                 c.put(path, tfname, confirm=self._confirm_upload)
-                logger.info("sftp_sender: Renaming %s to %s uploaded ID:'%s'" % (tfname, fname, util.create_fileid_from_meta(meta)))
+                logger.info("sftp_sender: Renaming %s to %s uploaded ID:'%s'", tfname, fname, util.fileid(meta))
                 c.rename(tfname, fname)
             else:
-                logger.info("sftp_sender: address:%s, basename:%s uploaded ID:'%s'" % (self.hostname(), fname, util.create_fileid_from_meta(meta)))
+                logger.info("sftp_sender: address:%s, basename:%s uploaded ID:'%s'", self.hostname(), fname, util.fileid(meta))
                 c.put(path, fname, confirm=self._confirm_upload)
             self._nr_connection_transfers += 1
             transferts = time.perf_counter()
@@ -526,7 +525,7 @@ class sftp_sender(baseuri_sender):
                 self._nr_connection_transfers = 0
             disconnectts = time.perf_counter()
 
-        logger.info("sftp_sender: host=%s: timing connection=%.6f, dircreation=%.6f, transfer=%.6f, disconnect = %.6f total = %.6f fname = %s ID:'%s'" % (self.hostname(), (connectionts - startts), (dirts - connectionts), (transferts - dirts), (disconnectts - transferts), (disconnectts - startts), fname, util.create_fileid_from_meta(meta)))
+        logger.info("sftp_sender: host=%s: timing connection=%.6f, dircreation=%.6f, transfer=%.6f, disconnect = %.6f total = %.6f fname = %s ID:'%s'", self.hostname(), (connectionts - startts), (dirts - connectionts), (transferts - dirts), (disconnectts - transferts), (disconnectts - startts), fname, util.fileid(meta))
 
 class scp_sender(baseuri_sender):
     """Publishes files over scp
@@ -548,6 +547,8 @@ class scp_sender(baseuri_sender):
         :param file: path to file that should be sent
         :param meta: the meta object for all metadata of file
         """
+        from paramiko import SSHClient
+        from scp import SCPClient
         ssh = None
         scp = None
         try:
@@ -561,7 +562,7 @@ class scp_sender(baseuri_sender):
                 ssh.exec_command("test -d %s || mkdir -p %s"%(dirname, dirname))
             fname = os.path.basename(publishedname)
             scp.put(path, publishedname)
-            logger.info("scp_sender: address:%s, basename:%s uploaded ID:'%s'" % (self.hostname(), fname, util.create_fileid_from_meta(meta)))
+            logger.info("scp_sender: address:%s, basename:%s uploaded ID:'%s'", self.hostname(), fname, util.fileid(meta))
         finally:
             if scp:
                 try:
@@ -609,9 +610,9 @@ class ftp_sender(baseuri_sender):
                     raise e
         try:
             ftp.storbinary("STOR %s"%fname, open(path, "rb"))
-            logger.info("ftp_sender: address:%s, basename=%s uploaded ID:'%s'" % (self.hostname(), fname, util.create_fileid_from_meta(meta)))
+            logger.info("ftp_sender: address:%s, basename=%s uploaded ID:'%s'", self.hostname(), fname, util.fileid(meta))
         except:
-            logger.info("ftp_sender: address:%s, basename=%s failed to upload ID:'%s'" % (self.hostname(), fname, util.create_fileid_from_meta(meta)))
+            logger.info("ftp_sender: address:%s, basename=%s failed to upload ID:'%s'", self.hostname(), fname, util.fileid(meta))
             raise
         finally:
             ftp.quit()
@@ -720,9 +721,9 @@ class copy_sender(sender):
             if not os.path.exists(dirname) and self.create_missing_directories():
                 os.makedirs(dirname)
             shutil.copyfile(path, publishedname)
-            logger.info("copy_sender: copied %s to %s, ID:'%s'" % (filename, dirname, util.create_fileid_from_meta(meta)))
+            logger.info("copy_sender: copied %s to %s, ID:'%s'", filename, dirname, util.fileid(meta))
         except:
-            logger.info("copy_sender: failed to copy %s to %s, ID:'%s'" % (filename, dirname, util.create_fileid_from_meta(meta)))
+            logger.info("copy_sender: failed to copy %s to %s, ID:'%s'", filename, dirname, util.fileid(meta))
             raise
 
 
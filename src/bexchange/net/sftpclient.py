@@ -22,6 +22,7 @@
 ## @author Anders Henja, SMHI
 ## @date 2022-11-01
 import os
+import shutil
 import paramiko
 import logging
 import stat
@@ -192,6 +193,13 @@ class sftpclient(object):
         :return a list of names
         """
         return self._sftp.listdir(dirname)    
+
+    def listdir_attr(self, dirname):
+        """Lists files and directories in the directory together with their attributes
+        :param dirname: The directory to list
+        :return a list of SFTPAttributes with filename, st_size, st_mtime and st_mode
+        """
+        return self._sftp.listdir_attr(dirname)
     
     def put(self, filename, targetname, confirm=True):
         """ Uploads the file (filename) to the server named targetname.
@@ -207,7 +215,7 @@ class sftpclient(object):
         """
         self._sftp.get(filename, targetname)
         
-    def getfo(self, remotepath, fl):
+    def getfo(self, remotepath, fl, size=None):
         """
         Copies the file (remotepath) from the server and writes to an open file.
         Typically used like:
@@ -215,9 +223,25 @@ class sftpclient(object):
 
         :param remotepath: Source filename to download
         :param fl: The destination file object
+        :param size: The size of the remote file if already known. Then the file is read ahead without an extra stat.
         """
-        self._sftp.getfo(remotepath, fl)
+        if size is None:
+            self._sftp.getfo(remotepath, fl)
+        else:
+            with self._sftp.open(remotepath, "rb") as fr:
+                fr.prefetch(size)
+                shutil.copyfileobj(fr, fl, 32768)
     
+    def open_channel(self):
+        """Opens another sftp session over the same ssh connection so that several files can be transferred
+        in parallel. The returned client only owns the sftp session, disconnect will not close the ssh connection.
+        :return a connected sftpclient
+        """
+        c = sftpclient(self._host, self._port, self._username, self._password, self._timeout, self._banner_timeout)
+        c._sftp = self._client.open_sftp()
+        c._sftp.get_channel().settimeout(self._timeout)
+        return c
+
     def rename(self, filename, targetname):
         """
         Renames the file
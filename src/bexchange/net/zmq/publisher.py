@@ -28,6 +28,7 @@ from threading import Thread, Event
 from bexchange.net import connections, publishers
 from bexchange.naming.namer import metadata_namer, metadata_namer_manager
 from bexchange import util
+from bexchange.matching import metaindex
 
 logger = logging.getLogger("bexchange.net.zmq.publisher")
 
@@ -106,6 +107,13 @@ class publisher(publishers.standard_publisher):
         super(publisher, self).initialize()
         self.setup_connection()
 
+    def take_over(self, previous):
+        """The socket is bound by previous so the publisher has to be restarted
+        :param previous: the publisher to take over from
+        :return: False
+        """
+        return False
+
     def get_attribute_value(self, name, meta):
         """
         :param name: Name of attribute
@@ -113,7 +121,7 @@ class publisher(publishers.standard_publisher):
         :return: the value for the name or None if not found
         """
         try:
-            return meta.node(name).value
+            return metaindex.node(meta, name).value
         except LookupError:
             return None
 
@@ -153,7 +161,7 @@ class publisher(publishers.standard_publisher):
         
         buffer_to_publish = bytearray(payload_hmac + b_payload)
 
-        logger.info("zmq: publishing file '%s', ID:'%s'" % (filename.strip(), util.create_fileid_from_meta(meta)))
+        logger.info("zmq: publishing file '%s', ID:'%s'", filename.strip(), util.fileid(meta))
 
         self._socket.send(buffer_to_publish)
 
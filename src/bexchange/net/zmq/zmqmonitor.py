@@ -113,9 +113,10 @@ class SqlZmqMonitorDBManager(object):
     """The DB manager providing handling of zmq monitor related information
     :param uri: The uri to database where sources are stored
     :param poolsize: the size of the db connection pool. In the case of sqlite, this will not be used
+    :param sqlite_profile: the bexchange.db.util.sqlite_profile to use if the uri points to a sqlite file
     """
-    def __init__(self, uri="sqlite:///tmp/baltrad-zmq-monitor.db", poolsize=10):
-        self._engine = dbutil.create_engine_from_url(uri, poolsize)
+    def __init__(self, uri="sqlite:///tmp/baltrad-zmq-monitor.db", poolsize=10, sqlite_profile=None):
+        self._engine = dbutil.create_engine_from_url(uri, poolsize, sqlite_profile)
         if self._engine.driver == "pysqlite":
             event.listen(self._engine, "connect", force_sqlite_foreign_keys)
         self.init_tables()
@@ -173,7 +174,7 @@ class SqlZmqMonitorDBManager(object):
         session = None
 
 class zmqmonitor(object):
-    def __init__(self, address, hmackey, dbfile="sqlite:////tmp/baltrad-zmq-monitor.db", tmpfolder=None, quantities=False):
+    def __init__(self, address, hmackey, dbfile="sqlite:////tmp/baltrad-zmq-monitor.db", tmpfolder=None, quantities=False, sqlite_profile=None):
         """Constructor
         Monitors a zmq publisher and stores information about all received files in a sqlite database that can be queried
         for statistics and information.
@@ -185,7 +186,7 @@ class zmqmonitor(object):
         self._tmpfolder = tmpfolder
         self._dbfile = dbfile
         self._quantities = quantities
-        self._dbmanager = SqlZmqMonitorDBManager(dbfile)
+        self._dbmanager = SqlZmqMonitorDBManager(dbfile, sqlite_profile=sqlite_profile)
         self._dbmanager.init_tables()
 
     def read_bdb_sources(self, odim_source_file):
@@ -3,24 +3,37 @@ import logging
 
 from baltrad.bdbcommon import oh5, expr
 from bexchange import util
+from bexchange.matching import filecontext
 
 _pyhl = None
 h5py = None
-try:
-    import _pyhl as _pyhl
-except:
-    pass
-
-try:
-    import h5py as h5py
-except:
-    pass
+_hdf5_loaded = False
 
 logger = logging.getLogger("bexchange.odimutil")
 
+def load_hdf5_modules():
+    """Imports _pyhl and h5py the first time they are needed so that importing this module doesn't load the HDF5 libraries.
+    """
+    global _pyhl, h5py, _hdf5_loaded
+    if _hdf5_loaded:
+        return
+    try:
+        import _pyhl as pyhl_module
+        _pyhl = pyhl_module
+    except:
+        pass
+
+    try:
+        import h5py as h5py_module
+        h5py = h5py_module
+    except:
+        pass
+    _hdf5_loaded = True
+
 class metadata_helper(object):
     @classmethod
     def is_hdf5_file(self, filename):
+        load_hdf5_modules()
         if _pyhl:
             return _pyhl.is_file_hdf5(filename) != 0
         elif h5py:
@@ -28,19 +41,27 @@ class metadata_helper(object):
         return False
 
     @classmethod
-    def metadata_from_file(self, source_manager, hasher, path):
+    def metadata_from_file(self, source_manager, hasher, path, reader=None):
         """creates metadata from the file
+        :param source_manager: the source manager used to identify the source
+        :param hasher: the metadata hasher
         :param path: full path to the file
+        :param reader: the metadata_reader to use, if None oh5.Metadata.from_file will be used
         :returns the metadata
         """
-        if not self.is_hdf5_file(path):
-            raise IOError("Not a HDF5 file: %s"%path)
+        if reader is None:
+            if not self.is_hdf5_file(path):
+                raise IOError("Not a HDF5 file: %s"%path)
+            meta = oh5.Metadata.from_file(path)
+            file_size = os.stat(path)[stat.ST_SIZE]
+        else:
+            meta, file_size, metadata_hash = reader.read_hashed(path, hasher)
 
-        meta = oh5.Metadata.from_file(path)
         if not meta.what_source:
             raise LookupError("No source in metadata")
         
-        metadata_hash = hasher.hash(meta)
+        if reader is None:
+            metadata_hash = hasher.hash(meta)
         source = source_manager.get_source(meta, True)
         
         meta.source_parent = None
@@ -49,12 +70,239 @@ class metadata_helper(object):
         meta.bdb_source = source.to_string()
         meta.bdb_source_name = source.name
         meta.bdb_metadata_hash = metadata_hash
-        meta.bdb_file_size = os.stat(path)[stat.ST_SIZE]
+        meta.bdb_file_size = file_size
         
-        logger.debug("Got a source identifier: %s, ID:'%s'"%(str(meta.bdb_source), util.create_fileid_from_meta(meta)))
+        context = filecontext.get_context(meta)
+        logger.debug("Got a source identifier: %s, ID:'%s'", meta.bdb_source, context)
 
         stored_timestamp = datetime.datetime.utcnow()
         meta.bdb_stored_date = stored_timestamp.date()
         meta.bdb_stored_time = stored_timestamp.time()
 
-        return meta  
\ No newline at end of file
+        return meta
+
+##
+# Attributes that always are read since they are needed for identifying the file
+REQUIRED_ATTRIBUTES = ["/what/source", "/what/object", "/what/date", "/what/time", "/dataset1/where/elangle", "/where/elangle"]
+
+def convert_attribute_value(value):
+    """Converts an attribute value read from file into a python value. Arrays are converted into lists in the
+    same way as the bdb reader does.
+    :param value: the value as read from the file
+    :return: the value
+    """
+    if hasattr(value, "dtype") and hasattr(value, "shape"):
+        if value.shape == ():
+            value = value.item()
+        else:
+            return [convert_attribute_value(v) for v in value.tolist()]
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+class metadata_reader(object):
+    """Reads the metadata from a file by opening it once and only reading the attributes. If a list of
+    attribute names is specified, only those attributes are added to the metadata. The names are matched against the end
+    of the attribute path in the same way as the filters do, i.e. what/quantity will read all quantities.
+    All attribute values are still read in the same pass so that the metadata hash can be calculated on
+    every attribute in the file, otherwise files that only differ in attributes that aren't used would
+    be treated as duplicates.
+    """
+    def __init__(self, attributes=None):
+        """Constructor
+        :param attributes: a list of attribute names that should be read. None means all attributes.
+        """
+        self.set_attributes(attributes)
+
+    def set_attributes(self, attributes):
+        """Sets the attributes that should be read.
+        :param attributes: a list of attribute names. None means all attributes.
+        """
+        if attributes is None:
+            self._attributes = None
+        else:
+            self._attributes = frozenset(list(attributes) + REQUIRED_ATTRIBUTES)
+
+    def get_attributes(self):
+        """
+        :return: the attribute names that will be read or None if all attributes are read
+        """
+        if self._attributes is None:
+            return None
+        return sorted(self._attributes)
+
+    def is_wanted(self, path):
+        """
+        :param path: the attribute path
+        :return: True if the attribute should be read
+        """
+        if self._attributes is None:
+            return True
+        split_path = path.split("/")
+        for i in range(len(split_path)):
+            if "/".join(split_path[i:]) in self._attributes:
+                return True
+        return False
+
+    def create_metadata(self, nodes, all_attributes=False):
+        """Creates the metadata from the nodes. Attributes that not are wanted are not added.
+        :param nodes: a list of (path, type, value) where type is one of "group", "attribute" or "dataset"
+        :param all_attributes: if all attributes should be added even if the reader is restricted
+        :return: the metadata
+        """
+        meta = oh5.Metadata()
+        for path, ntype, value in sorted(nodes, key=lambda x: x[0]):
+            if path == "/":
+                continue
+            parent, name = path.rsplit("/", 1)
+            if not parent:
+                parent = "/"
+            if ntype == "attribute":
+                if not all_attributes and not self.is_wanted(path):
+                    continue
+                node = oh5.Attribute(name, convert_attribute_value(value))
+            elif ntype == "dataset":
+                node = oh5.Dataset(name)
+            else:
+                node = oh5.Group(name)
+            meta.add_node(parent, node)
+        return meta
+
+    def read_nodes(self, path):
+        """Reads all nodes and attribute values from the file. Must be implemented by subclasses.
+        :param path: the file
+        :return: a list of (path, type, value)
+        """
+        raise NotImplementedError("read_nodes")
+
+    def read(self, path):
+        """Reads the metadata from the file
+        :param path: the file
+        :return: a tuple (metadata, file size)
+        :raises IOError: if file not is a HDF5 file
+        """
+        nodes = self.read_nodes(path)
+        return self.create_metadata(nodes), os.stat(path)[stat.ST_SIZE]
+
+    def read_hashed(self, path, hasher):
+        """Reads the metadata from the file and calculates the metadata hash. The hash is always calculated
+        on metadata containing all attributes so that it is the same whatever reader and restriction is used.
+        :param path: the file
+        :param hasher: the metadata hasher
+        :return: a tuple (metadata, file size, metadata hash)
+        :raises IOError: if file not is a HDF5 file
+        """
+        nodes = self.read_nodes(path)
+        meta = self.create_metadata(nodes)
+        if self._attributes is None:
+            metadata_hash = hasher.hash(meta)
+        else:
+            metadata_hash = hasher.hash(self.create_metadata(nodes, True))
+        return meta, os.stat(path)[stat.ST_SIZE], metadata_hash
+
+class pyhl_metadata_reader(metadata_reader):
+    """Reads the metadata using _pyhl
+    """
+    def read_nodes(self, path):
+        load_hdf5_modules()
+        try:
+            nodelist = _pyhl.read_nodelist(path)
+        except Exception:
+            raise IOError("Not a HDF5 file: %s"%path)
+
+        names = nodelist.getNodeNames()
+        attributes = []
+        for name, ntype in names.items():
+            if ntype == _pyhl.ATTRIBUTE_ID:
+                nodelist.selectNode(name)
+                attributes.append(name)
+        nodelist.fetch()
+
+        nodes = []
+        for name, ntype in names.items():
+            if ntype == _pyhl.GROUP_ID:
+                nodes.append((name, "group", None))
+            elif ntype == _pyhl.DATASET_ID:
+                nodes.append((name, "dataset", None))
+        for name in attributes:
+            nodes.append((name, "attribute", nodelist.getNode(name).data()))
+        return nodes
+
+class h5py_metadata_reader(metadata_reader):
+    """Reads the metadata using h5py
+    """
+    def read_nodes(self, path):
+        load_hdf5_modules()
+        try:
+            f = h5py.File(path, "r")
+        except OSError:
+            raise IOError("Not a HDF5 file: %s"%path)
+
+        nodes = []
+        def add_attributes(prefix, obj):
+            for k, v in obj.attrs.items():
+                nodes.append(("%s/%s"%(prefix, k), "attribute", v))
+
+        def visitor(name, obj):
+            name = "/%s"%name
+            if isinstance(obj, h5py.Dataset):
+                nodes.append((name, "dataset", None))
+            else:
+                nodes.append((name, "group", None))
+            add_attributes(name, obj)
+
+        with f:
+            add_attributes("", f)
+            f.visititems(visitor)
+        return nodes
+
+def create_metadata_reader(name, attributes=None):
+    """Creates a metadata reader.
+    :param name: bdb, pyhl, h5py or auto. auto will use pyhl if available, otherwise h5py.
+    :param attributes: the attribute names to read, None for all
+    :return: the reader or None when name is bdb meaning that oh5.Metadata.from_file should be used
+    """
+    load_hdf5_modules()
+    if name == "auto":
+        name = "pyhl" if _pyhl else "h5py"
+    if name == "bdb":
+        return None
+    elif name == "pyhl":
+        if not _pyhl:
+            raise RuntimeError("_pyhl is not available")
+        return pyhl_metadata_reader(attributes)
+    elif name == "h5py":
+        if not h5py:
+            raise RuntimeError("h5py is not available")
+        return h5py_metadata_reader(attributes)
+    raise RuntimeError("Unknown metadata reader: %s"%name)
+
+if __name__=="__main__":
+    import sys, time
+    if len(sys.argv) < 2:
+        print("Usage: %s <file.h5> [<nr of iterations>]"%sys.argv[0])
+        sys.exit(1)
+    path = sys.argv[1]
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    def bdb_read(path):
+        if not metadata_helper.is_hdf5_file(path):
+            raise IOError("Not a HDF5 file: %s"%path)
+        return oh5.Metadata.from_file(path), os.stat(path)[stat.ST_SIZE]
+
+    readers = [("bdb", bdb_read)]
+    load_hdf5_modules()
+    if _pyhl:
+        readers.append(("pyhl", pyhl_metadata_reader().read))
+        readers.append(("pyhl (restricted)", pyhl_metadata_reader([]).read))
+    if h5py:
+        readers.append(("h5py", h5py_metadata_reader().read))
+        readers.append(("h5py (restricted)", h5py_metadata_reader([]).read))
+
+    hasher = oh5.MetadataHasher()
+    for name, read in readers:
+        starttime = time.time()
+        for i in range(iterations):
+            meta, size = read(path)
+        elapsed = (time.time() - starttime) * 1000 / iterations
+        print("%-20s %8.2f ms/file, hash: %s"%(name, elapsed, hasher.hash(meta)))
@@ -0,0 +1,173 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Queue of files that are handled by a pool of worker threads. Used by the runners
+## so that file events aren't handled in the file watcher thread.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import logging
+import time
+from collections import deque
+from threading import Thread, Condition
+
+logger = logging.getLogger("bexchange.runner.filequeue")
+
+class file_queue(object):
+    """Files are added either as live files (e.g. from file events) or as backlog files (e.g. files found at startup).
+    Live files are always handled first. Backlog files are only handled when there are no live files and at most
+    backlog_rate files per second. A file that already is queued or handled is ignored so that several events for
+    the same file only results in one call to the handler. If the live queue is full, the file is put in the backlog.
+    """
+    def __init__(self, handler, workers=1, queue_size=1000, backlog_rate=10.0, name="file-queue"):
+        """Constructor
+        :param handler: function called with the filename in one of the worker threads
+        :param workers: number of worker threads
+        :param queue_size: max number of live files waiting to be handled
+        :param backlog_rate: max number of backlog files handled per second. 0 means no limit
+        :param name: name used for the threads
+        """
+        self._handler = handler
+        self._workers = workers
+        self._queue_size = queue_size
+        self._backlog_rate = backlog_rate
+        self._name = name
+        self._condition = Condition()
+        self._live = deque()
+        self._backlog = deque()
+        self._pending = set()
+        self._next_backlog = 0.0
+        self._threads = []
+        self._running = False
+        self._handled = 0
+        self._coalesced = 0
+        self._overflowed = 0
+        self._failed = 0
+
+    def add(self, filename):
+        """Adds a live file
+        :param filename: the file
+        :return: False if the file already is queued or being handled
+        """
+        with self._condition:
+            if filename in self._pending:
+                self._coalesced = self._coalesced + 1
+                return False
+            self._pending.add(filename)
+            if len(self._live) >= self._queue_size:
+                self._overflowed = self._overflowed + 1
+                logger.warning("%s: queue is full, adding %s to backlog", self._name, filename)
+                self._backlog.append(filename)
+            else:
+                self._live.append(filename)
+            self._condition.notify()
+            return True
+
+    def add_backlog(self, filenames):
+        """Adds files to the backlog
+        :param filenames: list of files
+        """
+        with self._condition:
+            for filename in filenames:
+                if filename not in self._pending:
+                    self._pending.add(filename)
+                    self._backlog.append(filename)
+            self._condition.notify_all()
+
+    def next(self):
+        """Waits for the next file to handle. Live files are returned first and then backlog files at the configured rate.
+        :return: the filename or None if the queue has been stopped
+        """
+        with self._condition:
+            while self._running:
+                if self._live:
+                    return self._live.popleft()
+                if self._backlog:
+                    now = time.monotonic()
+                    if self._backlog_rate <= 0 or now >= self._next_backlog:
+                        if self._backlog_rate > 0:
+                            self._next_backlog = max(self._next_backlog, now) + 1.0 / self._backlog_rate
+                        return self._backlog.popleft()
+                    self._condition.wait(self._next_backlog - now)
+                else:
+                    self._condition.wait()
+            return None
+
+    def done(self, filename, failed=False):
+        """Marks the file as handled
+        :param filename: the file
+        :param failed: if the handler failed
+        """
+        with self._condition:
+            self._pending.discard(filename)
+            self._handled = self._handled + 1
+            if failed:
+                self._failed = self._failed + 1
+
+    def run(self):
+        """The loop run by the worker threads
+        """
+        while True:
+            filename = self.next()
+            if filename is None:
+                break
+            failed = False
+            try:
+                self._handler(filename)
+            except Exception:
+                failed = True
+                logger.exception("%s: failed to handle %s", self._name, filename)
+            finally:
+                self.done(filename, failed)
+
+    def start(self):
+        """Starts the worker threads as daemon threads
+        """
+        with self._condition:
+            self._running = True
+        for i in range(self._workers):
+            t = Thread(target=self.run, name="%s-%d"%(self._name, i), daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def stop(self):
+        """Stops the worker threads. Files that are being handled will be finished.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with number of queued and handled files
+        """
+        with self._condition:
+            return {
+                "workers": self._workers,
+                "live": len(self._live),
+                "backlog": len(self._backlog),
+                "pending": len(self._pending),
+                "handled": self._handled,
+                "coalesced": self._coalesced,
+                "overflowed": self._overflowed,
+                "failed": self._failed
+            }
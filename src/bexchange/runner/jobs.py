@@ -0,0 +1,260 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Executor running triggered jobs, like fetches, in a pool of worker threads instead of
+## in the thread handling the request.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import datetime
+import logging
+import uuid
+from collections import OrderedDict, deque
+from threading import Thread, Condition
+
+logger = logging.getLogger("bexchange.runner.jobs")
+
+class JobQueueFullException(Exception):
+    """thrown to indicate that the job executor has too many queued jobs and that the job can't be accepted
+    """
+    def __init__(self, message, retry_after=5):
+        super(JobQueueFullException, self).__init__(message)
+        self.retry_after = retry_after
+
+class job(object):
+    """A job submitted to the job executor
+    """
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+    def __init__(self, name, group, key, fn, kwargs):
+        """Constructor
+        :param name: name describing the job
+        :param group: the concurrency group, e.g. the fetcher id
+        :param key: jobs with same key are coalesced while queued
+        :param fn: the function to call
+        :param kwargs: the keyword arguments to fn
+        """
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.group = group
+        self.key = key
+        self.fn = fn
+        self.kwargs = kwargs
+        self.state = job.QUEUED
+        self.created = datetime.datetime.utcnow()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.coalesced = 0
+
+    def json_repr(self):
+        """
+        :return: the job as a dictionary that can be serialized to json
+        """
+        def dtstr(dt):
+            return dt.strftime("%Y-%m-%dT%H:%M:%SZ") if dt else None
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "created": dtstr(self.created),
+            "started": dtstr(self.started),
+            "finished": dtstr(self.finished),
+            "error": self.error,
+            "coalesced": self.coalesced
+        }
+
+class job_executor(object):
+    """Runs jobs in a number of worker threads. The number of queued jobs is bounded and each group can be limited
+    to a number of concurrently running jobs. If a job with the same key already is queued, the new job isn't added
+    and the queued job is returned instead. All queued and running jobs and the most recent finished jobs are kept
+    so that the status can be queried.
+    """
+    def __init__(self, workers=4, queue_size=100, history=1000, retry_after=5):
+        """Constructor
+        :param workers: number of worker threads
+        :param queue_size: max number of queued jobs
+        :param history: max number of finished jobs kept for status queries
+        :param retry_after: seconds a client should wait before retrying when queue is full
+        """
+        self._workers = workers
+        self._queue_size = queue_size
+        self._history = history
+        self._retry_after = retry_after
+        self._condition = Condition()
+        self._queue = deque()
+        self._queued_keys = {}
+        self._running_groups = {}
+        self._limits = {}
+        self._jobs = OrderedDict()
+        self._threads = []
+        self._running = False
+        self._submitted = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._failed = 0
+
+    def set_concurrency(self, group, limit):
+        """Sets the max number of concurrently running jobs in a group
+        :param group: the group
+        :param limit: the max number of running jobs
+        """
+        with self._condition:
+            self._limits[group] = limit
+
+    def submit(self, name, group, key, fn, **kwargs):
+        """Submits a job
+        :param name: name describing the job
+        :param group: the concurrency group
+        :param key: jobs with same key are coalesced while queued
+        :param fn: the function to call
+        :param kwargs: the keyword arguments to fn
+        :return: the job, or the already queued job with the same key
+        :raise: JobQueueFullException if the queue is full
+        """
+        with self._condition:
+            if key in self._queued_keys:
+                queued = self._queued_keys[key]
+                queued.coalesced = queued.coalesced + 1
+                self._coalesced = self._coalesced + 1
+                return queued
+            if len(self._queue) >= self._queue_size:
+                self._rejected = self._rejected + 1
+                raise JobQueueFullException("Job queue is full", self._retry_after)
+            j = job(name, group, key, fn, kwargs)
+            self._queue.append(j)
+            self._queued_keys[key] = j
+            self._jobs[j.id] = j
+            self._evict()
+            self._submitted = self._submitted + 1
+            self._condition.notify_all()
+            return j
+
+    def _evict(self):
+        """Removes the oldest finished jobs when more than history jobs are kept. Queued and running jobs
+        are never removed so that their status always can be queried. Must be called with the condition held.
+        """
+        excess = len(self._jobs) - self._history
+        if excess <= 0:
+            return
+        finished = []
+        for jobid, j in self._jobs.items():
+            if j.state in (job.DONE, job.FAILED):
+                finished.append(jobid)
+                if len(finished) >= excess:
+                    break
+        for jobid in finished:
+            del self._jobs[jobid]
+
+    def get_job(self, jobid):
+        """
+        :param jobid: the job id
+        :return: the job or None if not known
+        """
+        with self._condition:
+            return self._jobs.get(jobid)
+
+    def next(self):
+        """Waits for the first queued job whose group isn't running the max number of jobs
+        :return: the job or None if the executor has been stopped
+        """
+        with self._condition:
+            while self._running:
+                for j in self._queue:
+                    if self._running_groups.get(j.group, 0) < self._limits.get(j.group, 1):
+                        self._queue.remove(j)
+                        del self._queued_keys[j.key]
+                        self._running_groups[j.group] = self._running_groups.get(j.group, 0) + 1
+                        j.state = job.RUNNING
+                        j.started = datetime.datetime.utcnow()
+                        return j
+                self._condition.wait()
+            return None
+
+    def done(self, j, error=None):
+        """Marks the job as finished
+        :param j: the job
+        :param error: the error message if the job failed
+        """
+        with self._condition:
+            self._running_groups[j.group] = self._running_groups[j.group] - 1
+            j.finished = datetime.datetime.utcnow()
+            j.state = job.DONE
+            if error is not None:
+                j.state = job.FAILED
+                j.error = error
+                self._failed = self._failed + 1
+            j.fn = None
+            j.kwargs = None
+            self._evict()
+            self._condition.notify_all()
+
+    def run(self):
+        """The loop run by the worker threads
+        """
+        while True:
+            j = self.next()
+            if j is None:
+                break
+            error = None
+            try:
+                j.fn(**j.kwargs)
+            except Exception as e:
+                logger.exception("Job %s (%s) failed"%(j.name, j.id))
+                error = str(e)
+            self.done(j, error)
+
+    def start(self):
+        """Starts the worker threads as daemon threads
+        """
+        with self._condition:
+            self._running = True
+        for i in range(self._workers):
+            t = Thread(target=self.run, name="job-executor-%d"%i, daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def stop(self):
+        """Stops the worker threads. Running jobs will be finished.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with information about the executor
+        """
+        with self._condition:
+            return {
+                "workers": self._workers,
+                "queue_size": self._queue_size,
+                "queued": len(self._queue),
+                "running": sum(self._running_groups.values()),
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "rejected": self._rejected,
+                "failed": self._failed
+            }
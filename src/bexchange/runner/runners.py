@@ -22,11 +22,13 @@
 ## @author Anders Henja, SMHI
 ## @date 2022-10-28
 import importlib
+import json
 import logging
 import os, re
 from os import listdir
 from os.path import isfile, join
 import time
+import uuid
 
 from threading import Thread, Event
 
@@ -34,6 +36,7 @@ from bexchange.naming import namer
 from bexchange.util import message_aware
 from bexchange.net.fetchers import fetcher_manager
 from bexchange.file_watcher import FileWatcher, FileWatcherEventHandler
+from bexchange.runner.filequeue import file_queue
 
 logger = logging.getLogger("bexchange.runner.runners")
 
@@ -92,7 +95,7 @@ class inotify_runner_event_handler(FileWatcherEventHandler):
         if not event.is_directory:
             logger.debug("on_closed: %s"%event.src_path)
             if not self._runner.is_ignored(event.src_path):  # avoid temporary file
-                self._runner.handle_file(event.src_path)
+                self._runner.file_event(event.src_path)
 
     def on_created(self, event):
         """Will be called by the watchdog observer when file move event occurs.
@@ -101,11 +104,11 @@ class inotify_runner_event_handler(FileWatcherEventHandler):
         if not event.is_directory:
             logger.debug("on_created: %s"%event.src_path)
             if not self._runner.is_ignored(event.src_path):  # avoid temporary file
-                self._runner.handle_file(event.src_path)
+                self._runner.file_event(event.src_path)
 
 class inotify_runner(runner):
-    """The inotify runner is used to monitor folders and trigger "store" events. It is run in a separate thread instead of 
-    beeing created as a daemon-thread since all initiation is performed in the main thread before server is started.
+    """The inotify runner is used to monitor folders and trigger "store" events. The file events are put on a queue
+    that is handled by a number of worker threads so that a slow file doesn't stall the file watcher.
     """
     def __init__(self, backend, active, **args):
         """Constructor
@@ -116,6 +119,10 @@ class inotify_runner(runner):
           ignore-pattern - If files matching the provided pattern should be ignored or not
           pattern        - The pattern to check for files to ignore
           name           - The name this inotify runner should be using
+          process-pending-files - If files already in the folders at startup should be handled
+          workers        - Number of worker threads handling the files, default 1
+          queue-size     - Max number of files waiting to be handled before they are put in the backlog, default 1000
+          pending-files-rate - Max number of pending files per second handled at startup, 0 means no limit, default 10
         """
         super(inotify_runner, self).__init__(backend, active)
         self._name = "inotify-runner"
@@ -132,6 +139,12 @@ class inotify_runner(runner):
         if "process-pending-files" in args:
             self._process_pending_files=args["process-pending-files"]
 
+        self._queue = file_queue(self.handle_file,
+                                 workers=int(args.get("workers", 1)),
+                                 queue_size=int(args.get("queue-size", 1000)),
+                                 backlog_rate=float(args.get("pending-files-rate", 10)),
+                                 name=self._name)
+
         self._watcher = FileWatcher(self._folders, inotify_runner_event_handler(self), recursive=False)
 
     def is_ignored(self, filename):
@@ -145,10 +158,20 @@ class inotify_runner(runner):
         bname = os.path.basename(filename)
         return re.match(self._pattern, bname) != None
     
+    def file_event(self, filename):
+        """Called by the file watcher when a file has been created or closed. The file is put on the queue unless
+        it already is queued.
+        :param filename: The filename
+        """
+        self._queue.add(filename)
+
     def handle_file(self, filename):
         """Handles the file (by sending it to the backend using the name given to this runner
         :param filename: The filename to handle
         """
+        if not os.path.exists(filename):
+            logger.debug("%s: %s already handled"%(self._name, filename))
+            return
         try:
             self._backend.store_file(filename, self._name)
         finally:
@@ -158,10 +181,18 @@ class inotify_runner(runner):
                 pass
 
     def pending_run(self, pending_filenames):
+        """Adds the pending files to the backlog of the queue. They will be handled when there are no new files.
+        :param pending_filenames: The files found at startup
+        """
         if pending_filenames:
-            for filename in pending_filenames:
-                self.handle_file(filename)
-                time.sleep(0.1) # Just to not starve real time data handling
+            logger.info("%s: adding %d pending files"%(self._name, len(pending_filenames)))
+            self._queue.add_backlog(pending_filenames)
+
+    def get_statistics(self):
+        """
+        :return: the statistics of the file queue
+        """
+        return self._queue.get_statistics()
 
     def get_pending_files(self, folder):
         """Lists all files in specified folder
@@ -181,10 +212,10 @@ class inotify_runner(runner):
         for folder in self._folders:
             pending_files.extend(self.get_pending_files(folder))
 
+        self._queue.start()
+
         if len(pending_files) > 0 and self._process_pending_files:
-            self._pending_thread = Thread(target=self.pending_run, args=(pending_files,))
-            self._pending_thread.daemon = True
-            self._pending_thread.start()
+            self.pending_run(pending_files)
 
         #self._thread = Thread(target=self.run)
         #self._thread.daemon = True
@@ -194,6 +225,7 @@ class inotify_runner(runner):
     def stop(self):
         logger.info("Stopping watcher")
         self._watcher.stop()
+        self._queue.stop()
 
 # class inotify_runner_event_handler(pyinotify.ProcessEvent):
 #     def __init__(self, inotify_runner):
@@ -316,9 +348,10 @@ class inotify_runner(runner):
 
 class triggered_fetch_runner(runner, message_aware):
     """A triggered runner. This runner implements 'message_aware' so that a json-message
-    can be handled. This runner is actually triggered from the WSGI-process and as such
-    is using the WSGI-servers thread pool. @todo: Implement this as a producer/consumer
-    thread to avoid any possibility to starve the WSGI-thread pool. 
+    can be handled. If the backend has a job executor, the fetch is submitted as a job and
+    the WSGI-thread returns immediately. Triggers arriving while a fetch already is queued
+    are coalesced into the queued job. Without a job executor the fetch is performed in
+    the WSGI-thread.
     """
     def __init__(self, backend, active, **args):
         """Constructor
@@ -336,6 +369,13 @@ class triggered_fetch_runner(runner, message_aware):
         self._fetcher = fetcher_manager.from_conf(backend, args["fetcher"])
         self._invoker_names = args["invoker_names"]
         self._trigger_names = args["trigger_names"]
+        if "name" in args:
+            self._name = args["name"]
+        else: # Each runner needs an unique name since it is used as concurrency group and coalescing key
+            self._name = "%s-%s"%(self._fetcher.id(), str(uuid.uuid4()))
+        self._concurrency = args.get("concurrency", 1)
+        if not isinstance(self._concurrency, int) or self._concurrency < 1:
+            raise AttributeError("concurrency should be a positive integer")
  
     def start(self):
         """Not used
@@ -351,6 +391,10 @@ class triggered_fetch_runner(runner, message_aware):
         """Handles the message if the json message contains a trigger that matches trigger names and
         that the nodename is allowed within the invoker_names by invoking the fetch method in fetcher
         using "arguments" in the json-message.
+        :param json_message: the message
+        :param nodename: the node that sent the message
+        :return: the submitted job, None if the message wasn't handled or if the fetch was performed directly
+        :raise: JobQueueFullException if the job executor is full
         """
         if nodename in self._invoker_names and \
            (len(self._trigger_names)==0 or json_message["trigger"] in self._trigger_names):
@@ -358,7 +402,14 @@ class triggered_fetch_runner(runner, message_aware):
             if "arguments" in json_message:
                 if isinstance(json_message["arguments"], dict):
                     kwargs = json_message["arguments"]
-            self._fetcher.fetch(**kwargs)
+            executor = self.backend().get_job_executor()
+            if executor is None:
+                self._fetcher.fetch(**kwargs)
+                return None
+            executor.set_concurrency(self._name, self._concurrency)
+            key = "%s:%s"%(self._name, json.dumps(kwargs, sort_keys=True))
+            return executor.submit(self._name, self._name, key, self._fetcher.fetch, **kwargs)
+        return None
 
 class statistics_cleanup_runner(runner):
     """Cleans the statistics database
@@ -367,12 +418,14 @@ class statistics_cleanup_runner(runner):
         """Constructor
         :param backend: The backend
         :param active: If this runner is active or not
-        :param args: Dictionary containing "name", "interval" and "age"
+        :param args: Dictionary containing "name", "interval", "age", "batch_size" and "pause"
         """
         super(statistics_cleanup_runner, self).__init__(backend, active)
         self._name = "statistics_cleanup_runner"
         self._interval = 60 # minutes
         self._age = 48      # hours
+        self._batch_size = 1000
+        self._pause = 0.1   # seconds
         self._manager = self.backend().get_statistics_manager()
         self._event = Event()
         self._running = False
@@ -390,11 +443,45 @@ class statistics_cleanup_runner(runner):
             if not isinstance(self._age, int):
                 raise AttributeError("age should be an integer")
 
+        if "batch_size" in args:
+            self._batch_size = args["batch_size"]
+            if not isinstance(self._batch_size, int):
+                raise AttributeError("batch_size should be an integer")
+
+        if "pause" in args:
+            self._pause = args["pause"]
+            if not isinstance(self._pause, int) and not isinstance(self._pause, float):
+                raise AttributeError("pause should be a number")
+
+    def cleanup(self):
+        """Removes the old statentries in batches of batch_size entries with a pause between each batch so that
+        other writers aren't blocked during the cleanup.
+        :return: number of removed entries
+        """
+        starttime = time.time()
+        removed = 0
+        batches = 0
+        while self._running:
+            if self._batch_size > 0:
+                n = self._manager.cleanup_statentry(self._age, self._batch_size)
+            else:
+                n = self._manager.cleanup_statentry(self._age)
+            removed = removed + n
+            batches = batches + 1
+            if self._batch_size <= 0 or n < self._batch_size:
+                break
+            self._event.wait(self._pause)
+        logger.info("%s: removed %d statentries older than %d hours in %d batches, %d ms"%(self._name, removed, self._age, batches, int((time.time() - starttime)*1000)))
+        return removed
+
     def run(self):
         """The runner for the thread. Will trigger a wait for
         """
         while self._running:
-            self._manager.cleanup_statentry(self._age)
+            try:
+                self.cleanup()
+            except Exception:
+                logger.exception("Failed to cleanup statistics")
             self._event.wait(self._interval * 60)
 
     def start(self):
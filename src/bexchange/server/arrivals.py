@@ -0,0 +1,135 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## In-memory index of the most recent file arrivals used for answering supervision
+## queries without querying the statistics database.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import datetime
+import threading
+from collections import deque
+
+class arrival_ring(object):
+    """The most recent arrivals for one source, object type and origin in arrival order.
+    """
+    __slots__ = ("arrivals", "horizon")
+
+    def __init__(self, size, horizon):
+        """Constructor
+        :param size: max number of arrivals to keep
+        :param horizon: time before which arrivals might be missing
+        """
+        self.arrivals = deque(maxlen=size)
+        self.horizon = horizon
+
+    def add(self, nominal, entrytime, delay):
+        """Adds an arrival. If the ring is full the oldest arrival is dropped and the horizon is moved.
+        :param nominal: nominal datetime of the file
+        :param entrytime: when the file arrived
+        :param delay: seconds between nominal datetime and entrytime
+        """
+        if len(self.arrivals) == self.arrivals.maxlen:
+            self.horizon = self.arrivals[0][1]
+        self.arrivals.append((nominal, entrytime, delay))
+
+class arrival_index(object):
+    """Keeps a small ring of the most recent arrivals for each (source, object type, origin). All times are naive UTC.
+    A query can be answered from memory if enough matching arrivals are found or if all arrivals that could match
+    are known, i.e. the query window starts after the index was created and after the oldest dropped arrival.
+    Files are assumed to arrive after their nominal time.
+    """
+    def __init__(self, size=16):
+        """Constructor
+        :param size: max number of arrivals to keep for each source, object type and origin
+        """
+        self._size = size
+        self._lock = threading.Lock()
+        self._rings = {}
+        self._created = datetime.datetime.utcnow()
+        self._added = 0
+        self._answered = 0
+        self._fallbacks = 0
+
+    def add(self, source, object_type, origin, nominal, entrytime=None):
+        """Registers an arrival
+        :param source: the source name
+        :param object_type: the object type
+        :param origin: the node that sent the file
+        :param nominal: the nominal datetime of the file
+        :param entrytime: when the file arrived, defaults to now
+        """
+        if entrytime is None:
+            entrytime = datetime.datetime.utcnow()
+        delay = (entrytime - nominal).seconds
+        key = (source, object_type, origin)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = arrival_ring(self._size, self._created)
+            ring.add(nominal, entrytime, delay)
+            self._added = self._added + 1
+
+    def count(self, sources, origins, object_type, mindatetime, minentrytime=None, maxdelay=None, needed=1):
+        """Counts the arrivals with nominal datetime >= mindatetime, entrytime >= minentrytime and delay <= maxdelay.
+        :param sources: list of source names, empty means all
+        :param origins: list of origins, empty means all
+        :param object_type: the object type, None means all
+        :param mindatetime: the earliest nominal datetime
+        :param minentrytime: the earliest entrytime, None means no limit
+        :param maxdelay: max delay in seconds, None means no limit
+        :param needed: counting stops when this number of arrivals have been found
+        :return: the number of arrivals found or None if the answer can't be determined from memory
+        """
+        threshold = mindatetime
+        if minentrytime is not None and minentrytime > threshold:
+            threshold = minentrytime
+        found = 0
+        horizon = self._created
+        with self._lock:
+            for (source, otype, origin), ring in self._rings.items():
+                if (sources and source not in sources) or (origins and origin not in origins) or (object_type and otype != object_type):
+                    continue
+                if ring.horizon > horizon:
+                    horizon = ring.horizon
+                for nominal, entrytime, delay in reversed(ring.arrivals):
+                    if nominal >= mindatetime and (minentrytime is None or entrytime >= minentrytime) and (maxdelay is None or delay <= maxdelay):
+                        found = found + 1
+                        if found >= needed:
+                            break
+                if found >= needed:
+                    break
+            if found >= needed or threshold > horizon:
+                self._answered = self._answered + 1
+                return found
+            self._fallbacks = self._fallbacks + 1
+            return None
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with number of keys, arrivals and how many queries that were answered from memory
+        """
+        with self._lock:
+            return {
+                "size": self._size,
+                "keys": len(self._rings),
+                "added": self._added,
+                "answered": self._answered,
+                "fallbacks": self._fallbacks
+            }
@@ -24,23 +24,38 @@
 
 from bexchange import backend
 from bexchange.server import sqlbackend
-from bexchange.matching import filters, metadata_matcher
+from bexchange.server.sourceresolver import MemorySourceManager
+from bexchange.matching import filters, metadata_matcher, filecontext
+from bexchange.matching.routing import routing_index
 from bexchange.storage import storages
+from bexchange.naming import namer
 from bexchange.processor import processors
 from bexchange.server.subscription import subscription_manager
 from bexchange.net import publishers
 from bexchange.runner import runners
 from bexchange import auth, util
-from bexchange.odimutil import metadata_helper
+from bexchange.odimutil import metadata_helper, create_metadata_reader
 from bexchange.statistics.statistics import statistics_manager
+from bexchange.statistics.recorder import statistics_recorder
 from bexchange.db import sqldatabase
+from bexchange.db import util as dbutil
+from bexchange.server.ingest import ingest_queue
+from bexchange.server.handledfiles import HandledFiles
+from bexchange.server.spool import spool_manager
+from bexchange.decorators.decorator import decorator_pool
+from bexchange.decorators.cache import decoration_cache
+from bexchange.server.arrivals import arrival_index
+from bexchange.runner.jobs import job_executor
+from bexchange.net.fetchstate import fetch_state
 
 import glob
+import hashlib
 import json
 import time, datetime
 import threading
 import os,stat,sys
 import uuid
+import tempfile
 from threading import Thread
 import re
 
@@ -62,30 +77,6 @@ from bexchange.file_watcher import FileWatcherEventHandler, FileWatcher
 
 logger = logging.getLogger("bexchange.server.backend")
 
-class HandledFiles(object):
-    """Keeps track of recently handled files. Probably should be either a sqlite db or
-    a dictionary variant with an aged limit.
-    """
-    def __init__(self, limit=500):
-        self.limit = limit
-        self._handled = []
-        self.lock = threading.Lock()
-        
-    def handled(self, bdbhash):
-        return bdbhash in self._handled
-
-    def add(self, bdbhash):
-        """ Adds the hash to internal list. Will return True if hash added otherwise
-        False.
-        """
-        with self.lock:
-            if bdbhash in self._handled:
-                return False
-            self._handled.insert(0, bdbhash)
-            if len(self._handled) > self.limit:
-                self._handled.pop()
-        return True
-
 class monitor_conf_dir_file_watcher(FileWatcherEventHandler):
     """Helper class to monitor a list of folders containing configuration files. Only will process
     files ending with .json. Both added and removed events will be forwarded.
@@ -148,14 +139,20 @@ class monitor_conf_dir_file_watcher(FileWatcherEventHandler):
         """
         self._filewatcher.start()
 
+    def stop(self):
+        """Stops the configuration file monitor
+        """
+        self._filewatcher.stop()
+
 class config_handler(object):
     """Helper class that is registered for all configuration files so that it is possible
     to handle runtime changes.
     """
-    def __init__(self, removed, modified, o):
+    def __init__(self, removed, modified, o, checksum=None):
         self._removed = removed
         self._modified = modified
         self._object = o
+        self.checksum = checksum
     
     def removed(self, fname):
         self._removed(fname, self._object)
@@ -170,7 +167,7 @@ class SimpleBackend(backend.Backend):
     :param engine_or_url: an SqlAlchemy engine or a database url
     :param storage: a `~.storage.FileStorage` instance to use.
     """
-    def __init__(self, confdirs, nodename, authmgr, db_uri, source_db_uri, odim_source_file, tmpfolder=None):
+    def __init__(self, confdirs, nodename, authmgr, db_uri, source_db_uri, odim_source_file, tmpfolder=None, sqlite_profile=None, start=True):
         """Constructor
         :param confdirs: a list of directories where the configuration (.json) files can be found
         :param nodename: name of this node
@@ -179,6 +176,9 @@ class SimpleBackend(backend.Backend):
         :param source_db_uri: The uri to the source db
         :param odim_source_file: the file containing odim sources for identification of incomming files
         :param tmpfolder: The temporary folder to use if specified
+        :param sqlite_profile: The bexchange.db.util.sqlite_profile used for the databases if they are sqlite files
+        :param start: If the configuration should be read and the runners started. If False, start() must be called
+          when the backend has been configured.
         """
         self.confdirs = confdirs
         self.nodename = nodename
@@ -191,11 +191,13 @@ class SimpleBackend(backend.Backend):
         
         self.subscriptions = []
         self.publications = []
+        self._subscription_index = None
+        self._publication_index = None
         self.storage_manager = storages.storage_manager()
         self.processor_manager = processors.processor_manager()
         self.odim_source_file = odim_source_file
-        self.sqldatabase = sqldatabase.SqlAlchemyDatabase(db_uri)
-        self.source_manager = sqlbackend.SqlAlchemySourceManager(source_db_uri)
+        self.sqldatabase = sqldatabase.SqlAlchemyDatabase(db_uri, sqlite_profile=sqlite_profile)
+        self.source_manager = sqlbackend.SqlAlchemySourceManager(source_db_uri, sqlite_profile=sqlite_profile)
         self.source_manager.add_sources(self.read_bdb_sources(self.odim_source_file))
         self.filter_manager = filters.filter_manager()
         self.runner_manager = runners.runner_manager()
@@ -208,10 +210,40 @@ class SimpleBackend(backend.Backend):
 
         self.max_content_length = None
 
+        self.ingest_queue = None
+
+        self.metadata_reader = None
+        self._metadata_attributes = None
+
+        self.spool = None
+
+        self.decorator_pool = None
+        self.decoration_cache = None
+
+        self.arrival_index = None
+
+        self.job_executor = None
+
+        self.fetch_state = None
+
         self._starttime = datetime.datetime.now()
 
         self._current_configuration_files = {}
 
+        self.conf_monitor = None
+        self.conf_debounce = 0.5
+        self._conf_timers = {}
+        self._conf_timer_lock = threading.Lock()
+        self._conf_reload_lock = threading.Lock()
+
+        if start:
+            self.start()
+
+    def start(self):
+        """Reads the configuration, starts the runners and the configuration file monitoring. Everything
+        that affects the handling of files, like the handled files, must be configured before this is called
+        since the runners might start to handle files immediately.
+        """
         self.initialize_configuration(self.confdirs)
 
         logger.info("Starting configuration file monitoring")
@@ -222,18 +254,158 @@ class SimpleBackend(backend.Backend):
         logger.info("System initialized")
 
     def conf_file_written(self, filename):
+        """Called by the configuration monitor when a file has been written. The file is loaded when there
+        hasn't been any more writes to it during conf_debounce seconds so that a file that is written in
+        several steps only is loaded once and never half written.
+        :param filename: the configuration file
+        """
         logger.info("File written: %s"%filename)
-        if filename in self._current_configuration_files:
-            self._current_configuration_files[filename].modified(filename)
-        else:
-            self.add_configuration_file(filename, True)
+        if self.conf_debounce <= 0:
+            self.conf_file_settled(filename)
+            return
+        with self._conf_timer_lock:
+            timer = self._conf_timers.pop(filename, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self.conf_debounce, self.conf_file_settled, args=(filename,))
+            timer.daemon = True
+            self._conf_timers[filename] = timer
+            timer.start()
+
+    def conf_file_settled(self, filename):
+        """Loads the written configuration file unless the content is unchanged
+        :param filename: the configuration file
+        """
+        with self._conf_timer_lock:
+            if self._conf_timers.get(filename) is threading.current_thread():
+                del self._conf_timers[filename]
+        with self._conf_reload_lock:
+            if not os.path.exists(filename):
+                return
+            if filename in self._current_configuration_files:
+                handler = self._current_configuration_files[filename]
+                if handler.checksum is not None and handler.checksum == self.configuration_checksum(filename):
+                    logger.info("File %s has not been changed, ignoring"%filename)
+                    return
+                handler.modified(filename)
+            else:
+                self.add_configuration_file(filename, True)
+            self.update_routing_index()
 
     def conf_file_removed(self, filename):
         logger.info("Filed removed: %s"%filename)
-        if filename in self._current_configuration_files:
-            self._current_configuration_files[filename].removed(filename)
-        else:
-            logger.warn(f"File {filename} not registered in monitored directory but still triggering event.. !?")
+        with self._conf_timer_lock:
+            timer = self._conf_timers.pop(filename, None)
+            if timer is not None:
+                timer.cancel()
+        with self._conf_reload_lock:
+            if filename in self._current_configuration_files:
+                self._current_configuration_files[filename].removed(filename)
+                self.update_routing_index()
+            else:
+                logger.warn(f"File {filename} not registered in monitored directory but still triggering event.. !?")
+
+    def update_routing_index(self):
+        """Creates new routing indexes for the subscriptions and publications and replaces the current ones.
+        """
+        self._subscription_index = self.create_subscription_index()
+        self._publication_index = self.create_publication_index()
+        self.update_metadata_attributes()
+
+    def update_metadata_attributes(self):
+        """If the metadata reader is restricted to a set of attributes, the attributes referenced by the
+        subscription and publication filters and by the templates used by the storages and senders are
+        added to the configured attributes.
+        """
+        if self.metadata_reader is None or self._metadata_attributes is None:
+            return
+        attributes = set(self._metadata_attributes)
+        attributes.update(namer.referenced_attribute_names())
+        for item in self.subscriptions + self.publications:
+            ifilter = item.filter()
+            if isinstance(ifilter, filters.node_filter):
+                for name in ifilter.attribute_names():
+                    if name.startswith("_"):
+                        continue
+                    if ":" in name:
+                        name = name[:name.rfind(":")]
+                    attributes.add(name)
+        self.metadata_reader.set_attributes(attributes)
+
+    def create_subscription_index(self, subscriptions=None):
+        """
+        :param subscriptions: the subscriptions to index. If None, the current subscriptions are used.
+        :returns a routing index for the subscriptions
+        """
+        if subscriptions is None:
+            subscriptions = self.subscriptions
+        return routing_index(subscriptions, lambda s: s.filter(), self.filter_match, lambda meta, s: s.filter_matching(meta))
+
+    def create_publication_index(self, publications=None):
+        """
+        :param publications: the publications to index. If None, the current publications are used.
+        :returns a routing index for the publications
+        """
+        if publications is None:
+            publications = self.publications
+        return routing_index(publications, lambda p: p.filter(), self.filter_match, lambda meta, p: self.filter_match(meta, p.filter()))
+
+    def set_subscriptions(self, subscriptions):
+        """Replaces the subscriptions and the subscription index. The lists are never modified after they have been
+        set so threads routing files always see a consistent list and index. The index is created before the list is
+        replaced so that a stale index never is used together with the new list.
+        :param subscriptions: the new list of subscriptions
+        """
+        index = self.create_subscription_index(subscriptions)
+        self.subscriptions = subscriptions
+        self._subscription_index = index
+
+    def set_publications(self, publications):
+        """Replaces the publications and the publication index, see set_subscriptions.
+        :param publications: the new list of publications
+        """
+        index = self.create_publication_index(publications)
+        self.publications = publications
+        self._publication_index = index
+
+    def get_subscription_index(self):
+        """
+        :returns the routing index for the subscriptions. If the subscriptions has been replaced, a new index will be created.
+        """
+        index = self._subscription_index
+        if index is None or not index.is_current(self.subscriptions):
+            index = self.create_subscription_index()
+            self._subscription_index = index
+        return index
+
+    def get_publication_index(self):
+        """
+        :returns the routing index for the publications. If the publications has been replaced, a new index will be created.
+        """
+        index = self._publication_index
+        if index is None or not index.is_current(self.publications):
+            index = self.create_publication_index()
+            self._publication_index = index
+        return index
+
+    def get_routing_statistics(self):
+        """
+        :returns information about the routing indexes, like bucket sizes
+        """
+        return {
+            "subscriptions": self.get_subscription_index().get_statistics(),
+            "publications": self.get_publication_index().get_statistics()
+        }
+
+    def filter_match(self, meta, ifilter):
+        """Matches the metadata against a filter
+        :param meta: the metadata
+        :param ifilter: the filter
+        :returns True if metadata matches the filter
+        """
+        if isinstance(ifilter, filters.node_filter):
+            return ifilter.matches(meta)
+        return self.create_matcher().match(meta, ifilter.to_xpr())
 
     def get_storage_manager(self):
         """
@@ -267,6 +439,8 @@ class SimpleBackend(backend.Backend):
             logger.info("Processing directory: %s" % d)
             self.process_conf_dir(d.strip())
 
+        self.update_routing_index()
+
         logger.info("Starting runners")
         self.runner_manager.start()
 
@@ -288,54 +462,76 @@ class SimpleBackend(backend.Backend):
         for f in files:
             self.add_configuration_file(f)
 
+    def configuration_checksum(self, f):
+        """
+        :param f: the configuration file
+        :return: the checksum of the file content or None if the file can't be read
+        """
+        try:
+            with open(f, "rb") as fp:
+                return hashlib.sha1(fp.read()).hexdigest()
+        except OSError:
+            return None
+
+    def read_configuration_file(self, f):
+        """Reads a configuration file
+        :param f: The filename containing the configuration in json format
+        :return: a tuple (data, checksum) where checksum is the checksum of the file content
+        """
+        with open(f, "rb") as fp:
+            content = fp.read()
+        return json.loads(content), hashlib.sha1(content).hexdigest()
+
     def add_configuration_file(self, f, runtime=False):
         """Adds the configuration from a configuration file to the system.
         :param f: The filename containing the configuration in json format
         :param runtime: If the configuration is added at startup (False) or during operational run (True)
         """
         logger.info("Processing configuration file: %s"%f)
-        with open(f,"r") as fp:
-            data = json.load(fp)
-            if "publication" in data:
-                p = publisher_manager.from_conf(data["publication"], self)
-                if p:
-                    logger.info("Adding publication from configuration file: %s"%(f))
-                    self.publications.append(p)
-                    self._current_configuration_files[f] = config_handler(self.publication_removed, self.publication_modified, p)
-
-            elif "subscription" in data:
-                subs = subscription_manager.from_conf(data["subscription"], self)
-                if subs:
-                    logger.info("Adding subscription from configuration file: %s"%(f))
-                    self.subscriptions.append(subs)
-                    self._current_configuration_files[f] = config_handler(self.subscription_removed, self.subscription_modified, subs)
-
-            elif "storage" in data:
-                s = self.storage_manager.from_conf(data["storage"], self)
-                logger.info("Adding storage from configuration file %s"%(f))
-                self.storage_manager.add_storage(s)
-
-                self._current_configuration_files[f] = config_handler(self.storage_removed, self.storage_modified, s)
-
-            elif "runner" in data:
-                runner = self.runner_manager.from_conf(data["runner"], self)
-                if runner:
-                    logger.info("Adding runner from configuration file %s"%(f))
-                    self.runner_manager.add_runner(runner)
-                    self._current_configuration_files[f] = config_handler(self.runner_removed, self.runner_modified, runner)
-                    if runtime:
-                        runner.start()
-                        logger.info(f"Runner started")
-
-            elif "processor" in data:
-                p = processors.processor_manager.from_conf(data["processor"], self)
-                if p:
-                    logger.debug("Adding processor from configuration file %s"%(f))
-                    self.processor_manager.add_processor(p)
-                    self._current_configuration_files[f] = config_handler(self.processor_removed, self.processor_modified, p)
+        data, checksum = self.read_configuration_file(f)
+        if "publication" in data:
+            p = publisher_manager.from_conf(data["publication"], self)
+            if p:
+                logger.info("Adding publication from configuration file: %s"%(f))
+                self.set_publications(self.publications + [p])
+                self._current_configuration_files[f] = config_handler(self.publication_removed, self.publication_modified, p)
+
+        elif "subscription" in data:
+            subs = subscription_manager.from_conf(data["subscription"], self)
+            if subs:
+                logger.info("Adding subscription from configuration file: %s"%(f))
+                self.set_subscriptions(self.subscriptions + [subs])
+                self._current_configuration_files[f] = config_handler(self.subscription_removed, self.subscription_modified, subs)
+
+        elif "storage" in data:
+            s = self.storage_manager.from_conf(data["storage"], self)
+            logger.info("Adding storage from configuration file %s"%(f))
+            self.storage_manager.add_storage(s)
+
+            self._current_configuration_files[f] = config_handler(self.storage_removed, self.storage_modified, s)
+
+        elif "runner" in data:
+            runner = self.runner_manager.from_conf(data["runner"], self)
+            if runner:
+                logger.info("Adding runner from configuration file %s"%(f))
+                self.runner_manager.add_runner(runner)
+                self._current_configuration_files[f] = config_handler(self.runner_removed, self.runner_modified, runner)
+                if runtime:
+                    runner.start()
+                    logger.info(f"Runner started")
+
+        elif "processor" in data:
+            p = processors.processor_manager.from_conf(data["processor"], self)
+            if p:
+                logger.debug("Adding processor from configuration file %s"%(f))
+                self.processor_manager.add_processor(p)
+                self._current_configuration_files[f] = config_handler(self.processor_removed, self.processor_modified, p)
 
-            else:
-                logger.info("Could not identify content of configuration file %s"%f)
+        else:
+            logger.info("Could not identify content of configuration file %s"%f)
+
+        if f in self._current_configuration_files:
+            self._current_configuration_files[f].checksum = checksum
 
     def processor_modified(self, fname, o):
         """Called when a processor configuration file is modified.,
@@ -396,19 +592,11 @@ class SimpleBackend(backend.Backend):
         if fname in self._current_configuration_files:
             del self._current_configuration_files[fname]
 
-        self.subscriptions.remove(o)
+        if o in self.subscriptions:
+            self.set_subscriptions([s for s in self.subscriptions if s is not o])
 
         logger.info("Subscription removed: %s"%fname)
 
-    def publication_modified(self, fname, o):
-        """Called when a publication configuration file is modified.,
-        :param fname: the filename affected
-        :param o: the actual publication
-        """
-        self.publication_removed(fname, o)
-        self.add_configuration_file(fname, True)
-
-
     def publication_removed(self, fname, o):
         """Called when removing a publication during runtime operation
         :param fname: the filename affected
@@ -422,17 +610,42 @@ class SimpleBackend(backend.Backend):
                 o.stop()
             except:
                 logger.exception("Failed to stop publication")
-            self.publications.remove(o)
+            self.set_publications([p for p in self.publications if p is not o])
 
         logger.info("Publication removed: %s"%fname)
 
     def publication_modified(self, fname, o):
-        """Called when a publication configuration file is modified.,
+        """Called when a publication configuration file is modified. If possible, the new publication takes over
+        the queue, threads and connections from the current publication so that no queued files are lost. Otherwise
+        the current publication is stopped and the new publication is started.
         :param fname: the filename affected
         :param o: the actual publication
         """
-        self.publication_removed(fname, o)
-        self.add_configuration_file(fname, True)
+        data, checksum = self.read_configuration_file(fname)
+        if "publication" not in data or o not in self.publications:
+            self.publication_removed(fname, o)
+            self.add_configuration_file(fname, True)
+            return
+
+        p = publisher_manager.from_conf(data["publication"], self, start=False)
+        if p is None:
+            self.publication_removed(fname, o)
+            return
+
+        if p.take_over(o):
+            publications = list(self.publications)
+            publications[publications.index(o)] = p
+            self.set_publications(publications)
+            Thread(target=o.release, args=(p,), daemon=True).start()
+            logger.info("Publication replaced without restart: %s"%fname)
+        else:
+            self.publication_removed(fname, o)
+            p.initialize()
+            p.start()
+            logger.info("Adding publication from configuration file: %s"%(fname))
+            self.set_publications(self.publications + [p])
+
+        self._current_configuration_files[fname] = config_handler(self.publication_removed, self.publication_modified, p, checksum)
 
     def runner_removed(self, fname, o):
         """Called when removing a runner during runtime operation
@@ -467,10 +680,14 @@ class SimpleBackend(backend.Backend):
         
         configdirs = fconf.get_list("config.dirs", default="/etc/baltrad/exchange/config", sep=",")
 
+        conf_debounce = fconf.get_int("config.debounce", 500)
+
         source_db_uri = fconf.get("source_db_uri", default="sqlite:///var/cache/baltrad/exchange/source.db")
 
         db_uri = fconf.get("db_uri", default="sqlite:///var/cache/baltrad/exchange/baltrad-exchange.db")
 
+        profile = dbutil.sqlite_profile.from_conf(fconf.filter("sqlite.profile."))
+
         stat_incomming = fconf.get("statistics.incomming", False)
         stat_duplicates = fconf.get("statistics.duplicates", False)
         stat_add_entries = fconf.get("statistics.add_individual_entry", False)
@@ -492,18 +709,245 @@ class SimpleBackend(backend.Backend):
             db_uri,
             source_db_uri,
             odim_source_file,
-            tmpfolder = tmpfolder
+            tmpfolder = tmpfolder,
+            sqlite_profile = profile,
+            start = False
           )
 
         backend.max_content_length = conf.get_int("baltrad.exchange.max_content_length", 33554432)
 
+        backend.conf_debounce = conf_debounce / 1000.0
+
         backend.statistics_incomming = stat_incomming
         backend.statistics_duplicates = stat_duplicates
         backend.statistics_add_entries = stat_add_entries
         backend.statistics_file_handling = stat_file_handling
 
+        if fconf.get_boolean("statistics.batch.enabled", False):
+            backend.enable_statistics_recorder(fconf.get_int("statistics.batch.flush_interval", 1),
+                                               fconf.get_int("statistics.batch.max_entries", 10000))
+
+        handled_files_ttl = fconf.get_int("handled_files.ttl", 0)
+        if handled_files_ttl <= 0:
+            handled_files_ttl = None
+        backend.handled_files = HandledFiles(fconf.get_int("handled_files.limit", 500),
+                                             handled_files_ttl,
+                                             fconf.get("handled_files.snapshot", None))
+
+        fetch_state_file = fconf.get("fetchers.state", None)
+        if fetch_state_file:
+            backend.enable_fetch_state(fetch_state_file)
+
+        if fconf.get_boolean("sources.in_memory", False):
+            backend.enable_memory_sources(fconf.get_int("sources.cache_size", 1000))
+
+        metadata_attributes = None
+        if fconf.get_boolean("metadata.restrict_attributes", False):
+            metadata_attributes = [a for a in fconf.get_list("metadata.attributes", default="", sep=",") if a]
+        backend.enable_metadata_reader(fconf.get("metadata.reader", "bdb"), metadata_attributes)
+
+        if fconf.get_boolean("spool.enabled", False):
+            spool_folder = fconf.get("spool.folder", None)
+            if not spool_folder:
+                spool_folder = os.path.join(tmpfolder if tmpfolder else tempfile.gettempdir(), "bexchange-spool")
+            backend.enable_spool(spool_folder, fconf.get_boolean("spool.use_links", True))
+
+        decorator_processes = fconf.get_int("decorators.processes", 0)
+        if decorator_processes > 0:
+            backend.enable_decorator_pool(decorator_processes)
+
+        if fconf.get_boolean("decorators.cache.enabled", False):
+            cache_folder = fconf.get("decorators.cache.folder", None)
+            if not cache_folder:
+                cache_folder = os.path.join(tmpfolder if tmpfolder else tempfile.gettempdir(), "bexchange-decorations")
+            cache_ttl = fconf.get_int("decorators.cache.ttl", 60)
+            if cache_ttl <= 0:
+                cache_ttl = None
+            backend.enable_decoration_cache(cache_folder, fconf.get_int("decorators.cache.limit", 100), cache_ttl)
+
+        if fconf.get_boolean("arrivals.enabled", False):
+            backend.enable_arrival_index(fconf.get_int("arrivals.size", 16))
+
+        if fconf.get_boolean("jobs.enabled", False):
+            backend.enable_job_executor(fconf.get_int("jobs.workers", 4),
+                                        fconf.get_int("jobs.queue_size", 100),
+                                        fconf.get_int("jobs.history", 1000),
+                                        fconf.get_int("jobs.retry_after", 5))
+
+        if fconf.get_boolean("ingest.async", False):
+            backend.enable_async_ingest(fconf.get_int("ingest.threads", 4),
+                                        fconf.get_int("ingest.queue_size", 100),
+                                        fconf.get_int("ingest.retry_after", 5))
+
+        backend.start()
+
         return backend
 
+    def enable_async_ingest(self, nrthreads=4, queue_size=100, retry_after=5):
+        """Enables asynchronous ingest of files posted to the server. The posted files
+        will be placed on a bounded queue that is consumed by a pool of worker threads.
+        :param nrthreads: number of worker threads
+        :param queue_size: max number of files waiting to be handled
+        :param retry_after: seconds a client should wait before retrying when queue is full
+        """
+        if self.ingest_queue is not None:
+            self.ingest_queue.stop()
+        self.ingest_queue = ingest_queue(self.handle_file, nrthreads, queue_size, retry_after)
+        self.ingest_queue.start()
+
+    def shutdown(self):
+        """Stops the configuration monitoring and the background workers. Files accepted by the ingest queue
+        are handled before the ingest queue is stopped, pending statistics are written and the snapshots are closed.
+        """
+        logger.info("Shutting down backend")
+        if self.conf_monitor is not None:
+            try:
+                self.conf_monitor.stop()
+            except Exception:
+                logger.exception("Failed to stop configuration monitor")
+            self.conf_monitor = None
+        if self.ingest_queue is not None:
+            self.ingest_queue.stop()
+            self.ingest_queue = None
+        if self.job_executor is not None:
+            self.job_executor.stop()
+            self.job_executor = None
+        recorder = self.statistics_manager.recorder()
+        if recorder is not None:
+            recorder.stop()
+        if self.fetch_state is not None:
+            self.fetch_state.close()
+            self.fetch_state = None
+        if self.handled_files is not None:
+            self.handled_files.close()
+        if self.decorator_pool is not None:
+            self.decorator_pool.shutdown()
+            self.decorator_pool = None
+
+    def enable_statistics_recorder(self, interval=1, max_entries=10000):
+        """Writes the statistics in batches from a background thread instead of one transaction per increment.
+        :param interval: seconds between each flush
+        :param max_entries: max number of individual statistic entries waiting to be written
+        """
+        recorder = self.statistics_manager.recorder()
+        if recorder is not None:
+            recorder.stop()
+        recorder = statistics_recorder(self.sqldatabase, interval, max_entries)
+        self.statistics_manager.set_recorder(recorder)
+        recorder.start()
+
+    def enable_spool(self, folder, use_links=True):
+        """Stores the files that are published once in a spool and lets the publishers share the
+        spooled file instead of creating a copy for each publisher and sender.
+        :param folder: the spool folder
+        :param use_links: if the files should be hardlinked into the spool when possible
+        """
+        self.spool = spool_manager(folder, use_links)
+
+    def get_spool(self):
+        """
+        :return: the spool manager if spooling is enabled, otherwise None
+        """
+        return self.spool
+
+    def enable_decorator_pool(self, nrprocesses):
+        """Runs the publisher decorators in a pool of processes so that CPU-heavy decorators can use several cores.
+        :param nrprocesses: number of processes in the pool
+        """
+        if self.decorator_pool is not None:
+            self.decorator_pool.shutdown(wait=False)
+        self.decorator_pool = decorator_pool(nrprocesses, sys.path)
+
+    def get_decorator_pool(self):
+        """
+        :return: the process pool used for running decorators or None if decorators are run in the publisher threads
+        """
+        return self.decorator_pool
+
+    def enable_decoration_cache(self, folder, limit=100, ttl=60):
+        """Caches the decorated files so that publishers with identical decorator chains only decorates each file once.
+        :param folder: the folder where the decorated files are kept
+        :param limit: max number of decorated files to keep
+        :param ttl: max age in seconds of a decorated file, None means no age limit
+        """
+        self.decoration_cache = decoration_cache(folder, limit, ttl)
+
+    def get_decoration_cache(self):
+        """
+        :return: the decoration cache or None if decorated files aren't cached
+        """
+        return self.decoration_cache
+
+    def enable_arrival_index(self, size=16):
+        """Keeps the most recent arrivals for each source, object type and origin in memory so that supervision
+        queries can be answered without querying the statistics database.
+        :param size: number of arrivals to keep for each source, object type and origin
+        """
+        self.arrival_index = arrival_index(size)
+
+    def get_arrival_index(self):
+        """
+        :return: the arrival index or None if not enabled
+        """
+        return self.arrival_index
+
+    def enable_job_executor(self, workers=4, queue_size=100, history=1000, retry_after=5):
+        """Runs triggered jobs, like fetches triggered by posted messages, in a pool of worker threads
+        so that the request returns immediately with a job id.
+        :param workers: number of worker threads
+        :param queue_size: max number of jobs waiting to be run
+        :param history: number of jobs kept so that their status can be queried
+        :param retry_after: seconds a client should wait before retrying when queue is full
+        """
+        if self.job_executor is not None:
+            self.job_executor.stop()
+        self.job_executor = job_executor(workers, queue_size, history, retry_after)
+        self.job_executor.start()
+
+    def get_job_executor(self):
+        """
+        :return: the job executor or None if triggered jobs are run in the request thread
+        """
+        return self.job_executor
+
+    def enable_fetch_state(self, filename):
+        """Keeps track of the files fetched by the fetchers so that only new or modified remote files are fetched.
+        :param filename: name of the sqlite file where the fetched files are stored
+        """
+        if self.fetch_state is not None:
+            self.fetch_state.close()
+        self.fetch_state = fetch_state(filename)
+
+    def get_fetch_state(self):
+        """
+        :return: the fetch state or None if the fetchers fetches all matching files on each trigger
+        """
+        return self.fetch_state
+
+    def enable_metadata_reader(self, name, attributes=None):
+        """Sets the reader used when extracting metadata from files.
+        :param name: bdb, pyhl, h5py or auto. See odimutil.create_metadata_reader
+        :param attributes: if not None, only these attributes and the ones referenced by the filters will be read
+        """
+        self.metadata_reader = create_metadata_reader(name, attributes)
+        self._metadata_attributes = attributes
+        self.update_metadata_attributes()
+
+    def enable_memory_sources(self, cache_size=1000):
+        """Identifies sources in memory instead of querying the source database for each file. The sources
+        are loaded from the current source manager which will be used for persisting sources.
+        :param cache_size: max number of resolved what/source strings to cache
+        """
+        if isinstance(self.source_manager, MemorySourceManager):
+            return
+        self.source_manager = MemorySourceManager(self.source_manager, cache_size)
+
+    def get_ingest_queue(self):
+        """
+        :return: the ingest queue if asynchronous ingest is enabled, otherwise None
+        """
+        return self.ingest_queue
+
     def create_fileid_from_meta(self, meta):
         return util.create_fileid_from_meta(meta)
 
@@ -517,60 +961,126 @@ class SimpleBackend(backend.Backend):
 
         meta = self.metadata_from_file(path)
 
-        if self.max_content_length is not None and meta.bdb_file_size > self.max_content_length:
-            # We won't do anything about the file and will not indicate that anything has gone wrong. We just return the metadata without any more action
-            logger.info("Received a file that is too large (%d) from %s, ID:'%s'" % (meta.bdb_file_size, nid, util.create_fileid_from_meta(meta)))
+        if self.is_too_large(meta, nid):
             return meta
 
+        self.handle_file(path, nid, meta, startTime)
+
+        return meta
+
+    def enqueue_file(self, path, nid):
+        """asynchronous variant of store_file. Extracts the metadata and verifies that the file hasn't
+        been handled recently before placing it on the ingest queue. If the file is placed on the queue,
+        the queue takes ownership of the file and will remove it when it has been handled.
+        :param path: the full path to the file to be handled
+        :param nid: the name/id of the node that the file comes from
+        :returns True if the file has been placed on the queue, otherwise False
+        :raises IngestQueueFullException: if the ingest queue is full
+        :raises DuplicateException: if the file has been handled recently and no subscription allows duplicates
+        """
+        startTime = time.time()
+
+        meta = self.metadata_from_file(path)
+
+        if self.is_too_large(meta, nid):
+            return False
+
+        if self.handled_files.handled(meta.bdb_metadata_hash) and not self.allow_duplicates():
+            logger.info("enqueue_file: File recently handled: %s, %s" % (nid, self.create_fileid_from_meta(meta)))
+            if self.statistics_duplicates:
+                self.get_statistics_manager().increment("server-duplicates", nid, meta, self.statistics_add_entries)
+            from bexchange.net.exceptions import DuplicateException
+            raise DuplicateException("Received duplicate ID:'%s'" % (self.create_fileid_from_meta(meta)))
+
+        self.ingest_queue.put(path, nid, meta, startTime)
+
+        return True
+
+    def is_too_large(self, meta, nid):
+        """ We won't do anything about a file that is too large and will not indicate that anything has gone wrong.
+        :param meta: the metadata of the file
+        :param nid: the name/id of the node that the file comes from
+        :returns True if the file is larger than max content length
+        """
+        if self.max_content_length is not None and meta.bdb_file_size > self.max_content_length:
+            logger.info("Received a file that is too large (%d) from %s, ID:'%s'", meta.bdb_file_size, nid, util.fileid(meta))
+            return True
+        return False
+
+    def allow_duplicates(self):
+        """
+        :returns True if any subscription allows duplicates
+        """
+        for subscription in self.subscriptions:
+            if subscription.allow_duplicates():
+                return True
+        return False
+
+    def handle_file(self, path, nid, meta, startTime=None):
+        """passes the file on to the subscriptions that are matching the metadata.
+        :param path: the full path to the file to be handled
+        :param nid: the name/id of the node that the file comes from
+        :param meta: the metadata of the file
+        :param startTime: when the handling of the file started, used for statistics
+        """
         metadataTime = time.time()
+        if startTime is None:
+            startTime = metadataTime
 
         logger.info("store_file: Received file from %s: ID:'%s'" % (nid, self.create_fileid_from_meta(meta)))
         
         if self.statistics_incomming:
             self.get_statistics_manager().increment("server-incomming", nid, meta, self.statistics_add_entries, optime=int((metadataTime - startTime)*1000), optime_info="metadata")
 
+        if self.arrival_index is not None:
+            self.arrival_index.add(meta.bdb_source_name, meta.what_object, nid, filecontext.get_context(meta).nominal_datetime())
+
         already_handled = not self.handled_files.add(meta.bdb_metadata_hash)
         if already_handled:
-            logger.info("store_file: File recently handled: %s, %s" % (nid, util.create_fileid_from_meta(meta)))
+            logger.info("store_file: File recently handled: %s, %s", nid, util.fileid(meta))
             if self.statistics_duplicates:
                 self.get_statistics_manager().increment("server-duplicates", nid, meta, self.statistics_add_entries)
 
-            do_raiseduplicateexception=True
-            for subscription in self.subscriptions:
-                if subscription.allow_duplicates():
-                    do_raiseduplicateexception=False
-
-            if do_raiseduplicateexception:
+            if not self.allow_duplicates():
                 from bexchange.net.exceptions import DuplicateException
                 raise DuplicateException("Received duplicate ID:'%s'" % (util.create_fileid_from_meta(meta)))
 
-        for subscription in self.subscriptions: # Should only be passive subscriptions here. Active subscriptions should be handled in separate threads.
+        # Collect the union of storages and the ids of the matching subscriptions so that each storage,
+        # publication and processor only gets the file once even if several subscriptions are matching.
+        sids = []
+        storage_names = []
+        for subscription in self.get_subscription_index().match(meta): # Should only be passive subscriptions here. Active subscriptions should be handled in separate threads.
             if already_handled and not subscription.allow_duplicates():
                 continue
             
             if len(subscription.allowed_ids()) > 0 and nid not in subscription.allowed_ids():
                 continue
-            
-            if subscription.filter_matching(meta):
-                logger.debug("store_file: filter matching for subscription with id: %s, ID:'%s'"%(subscription.id(), self.create_fileid_from_meta(meta)))
-                for storage in subscription.storages():
-                    try:
-                        self.storage_manager.store(storage, path, meta)
-                    except:
-                        logger.exception(f"Failed to store file using {storage}")
-
-                for statplugin in subscription.get_statistics_plugins():
-                    statplugin.increment(nid, meta)
-
-                try:
-                    self.publish(subscription.id(), path, meta)
-                except:
-                    logger.exception("Failure during publishing")
-
-                try:
-                    self.processor_manager.process(path, meta)
-                except:
-                    logger.exception("Failure during processing")
+
+            logger.debug("store_file: filter matching for subscription with id: %s, ID:'%s'", subscription.id(), util.fileid(meta))
+            sids.append(subscription.id())
+            for storage in subscription.storages():
+                if storage not in storage_names:
+                    storage_names.append(storage)
+
+            for statplugin in subscription.get_statistics_plugins():
+                statplugin.increment(nid, meta)
+
+        for storage in storage_names:
+            try:
+                self.storage_manager.store(storage, path, meta)
+            except:
+                logger.exception(f"Failed to store file using {storage}")
+
+        if sids:
+            try:
+                self.publish(sids, path, meta)
+            except:
+                logger.exception("Failure during publishing")
+
+            try:
+                self.processor_manager.process(path, meta)
+            except:
+                logger.exception("Failure during processing")
         
         finishedTime = time.time()
 
@@ -579,37 +1089,55 @@ class SimpleBackend(backend.Backend):
         if self.statistics_file_handling:
             self.get_statistics_manager().increment("server-filehandling", nid, meta, True, False, optime=int((finishedTime - startTime)*1000), optime_info="total")
 
-        return meta
-
     def post_message(self, json_message, nodename):
         """ensures that a posted message arrives to interested parties
         :param json_message: The json message
         :type path: string
         :param nodename: The origin that sent the message
+        :return: list of jobs that were submitted to the job executor
         """
+        jobs = []
         for r in self.runner_manager.get_runners():
             if isinstance(r, message_aware):
-                r.handle_message(json_message, nodename)
+                j = r.handle_message(json_message, nodename)
+                if j is not None:
+                    jobs.append(j)
+        return jobs
 
     def create_matcher(self):
         return metadata_matcher.metadata_matcher()
 
-    def publish(self, sid, path, meta):
-        """publishes the file on each interested publisher
-        :param sid: The subscription id if any
+    def publish(self, sids, path, meta):
+        """publishes the file once on each interested publisher
+        :param sids: The subscription id or a list of subscription ids that the file matched
         :param path: full path to the file to be published
         :param meta: meta of file to be published
         """
-        for publication in self.publications:
-            matcher = self.create_matcher()
-            origin = publication.origin()
-            if len(origin) == 0 or (len(publication.origin()) > 0 and sid in publication.origin()):
-                if publication.active() and matcher.match(meta, publication.filter().to_xpr()):
-                    logger.debug("publish: publishing file using: %s %s"%(publication.name(), publication))
-                    try:
-                        publication.publish(path, meta)
-                    except:
-                        logger.exception(f"Failed to publish using publisher {publication.name()}")
+        publications = self.get_publication_index().match(meta)
+        if not publications:
+            return
+
+        if not isinstance(sids, (list, tuple, set)):
+            sids = [sids]
+
+        handle = None
+        if self.spool is not None:
+            handle = self.spool.acquire(path, "%s-%d"%(meta.bdb_metadata_hash, meta.bdb_file_size))
+            path = handle.name
+
+        try:
+            for publication in publications:
+                origin = publication.origin()
+                if len(origin) == 0 or any(sid in origin for sid in sids):
+                    if publication.active():
+                        logger.debug("publish: publishing file using: %s %s"%(publication.name(), publication))
+                        try:
+                            publication.publish(path, meta)
+                        except:
+                            logger.exception(f"Failed to publish using publisher {publication.name()}")
+        finally:
+            if handle is not None:
+                handle.close()
     
     def metadata_from_file(self, path):
         """creates metadata from the file
@@ -630,7 +1158,7 @@ class SimpleBackend(backend.Backend):
         :param path: full path to the file
         :returns the metadata
         """
-        return metadata_helper.metadata_from_file(self.source_manager, self._hasher, path)
+        return metadata_helper.metadata_from_file(self.source_manager, self._hasher, path, self.metadata_reader)
             
     def get_server_uptime(self):
         """
@@ -0,0 +1,141 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Keeps track of recently handled files so that duplicates can be detected.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("bexchange.server.handledfiles")
+
+class HandledFiles(object):
+    """Keeps track of recently handled files. The hashes are kept in insertion order in a dictionary
+    so that both lookup and eviction are O(1). Entries are evicted when there are more than limit entries
+    or when they are older than ttl seconds. If a snapshot file is specified, the entries are also written
+    to a sqlite database so that they survive a restart of the server.
+    """
+    def __init__(self, limit=500, ttl=None, snapshot=None):
+        """Constructor
+        :param limit: max number of hashes to keep track of
+        :param ttl: max age in seconds of a hash, None means that entries never expires
+        :param snapshot: name of sqlite file where the entries should be persisted, None means no persistence
+        """
+        self.limit = limit
+        self.ttl = ttl
+        self._handled = OrderedDict()
+        self.lock = threading.Lock()
+        self._conn = None
+        self._nr_since_prune = 0
+        if snapshot:
+            self._open_snapshot(snapshot)
+
+    def _open_snapshot(self, snapshot):
+        """Opens the snapshot database and loads the entries that hasn't expired yet.
+        :param snapshot: name of the sqlite file
+        """
+        dirname = os.path.dirname(snapshot)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        self._conn = sqlite3.connect(snapshot, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS handled_files (hash TEXT PRIMARY KEY, entrytime REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS handled_files_entrytime_idx ON handled_files(entrytime)")
+
+        with self.lock:
+            self._prune_snapshot(time.time())
+            rows = self._conn.execute("SELECT hash, entrytime FROM handled_files ORDER BY entrytime DESC LIMIT ?", (self.limit,)).fetchall()
+            for bdbhash, entrytime in reversed(rows):
+                self._handled[bdbhash] = entrytime
+        logger.info("Loaded %d handled files from %s"%(len(self._handled), snapshot))
+
+    def _prune_snapshot(self, now):
+        """Removes expired and superfluous entries from the snapshot
+        :param now: the current time
+        """
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM handled_files WHERE entrytime < ?", (now - self.ttl,))
+        self._conn.execute("DELETE FROM handled_files WHERE hash NOT IN (SELECT hash FROM handled_files ORDER BY entrytime DESC LIMIT ?)", (self.limit,))
+        self._nr_since_prune = 0
+
+    def _expire(self, now):
+        """Removes all entries that are older than ttl. Since entries are in insertion order it is enough
+        to look at the oldest entries.
+        :param now: the current time
+        """
+        if self.ttl is None:
+            return
+        oldest = now - self.ttl
+        while self._handled:
+            bdbhash, entrytime = next(iter(self._handled.items()))
+            if entrytime >= oldest:
+                break
+            self._handled.popitem(last=False)
+
+    def handled(self, bdbhash):
+        """
+        :param bdbhash: the metadata hash
+        :return: True if the hash has been handled recently
+        """
+        with self.lock:
+            self._expire(time.time())
+            return bdbhash in self._handled
+
+    def add(self, bdbhash):
+        """ Adds the hash to internal list. Will return True if hash added otherwise
+        False.
+        """
+        with self.lock:
+            now = time.time()
+            self._expire(now)
+            if bdbhash in self._handled:
+                return False
+            self._handled[bdbhash] = now
+            while len(self._handled) > self.limit:
+                self._handled.popitem(last=False)
+            if self._conn:
+                try:
+                    self._conn.execute("INSERT OR REPLACE INTO handled_files (hash, entrytime) VALUES (?, ?)", (bdbhash, now))
+                    self._nr_since_prune = self._nr_since_prune + 1
+                    if self._nr_since_prune >= self.limit:
+                        self._prune_snapshot(now)
+                except Exception:
+                    logger.exception("Failed to write handled file to snapshot")
+        return True
+
+    def size(self):
+        """
+        :return: number of hashes currently kept track of
+        """
+        with self.lock:
+            return len(self._handled)
+
+    def close(self):
+        """Closes the snapshot if there is one
+        """
+        with self.lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,207 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Asynchronous ingest of incomming files. Instead of letting the WSGI-thread handle
+## the complete file handling, the file is placed on a bounded queue that is consumed
+## by a pool of worker threads.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import os
+import threading
+import time
+import logging
+from queue import Full
+
+from bexchange.util import jobQueue, jobQueueShutdown
+
+logger = logging.getLogger("bexchange.server.ingest")
+
+class IngestQueueFullException(Exception):
+    """thrown to indicate that the ingest queue is full and that the file can't be accepted
+    """
+    def __init__(self, message, retry_after=5):
+        super(IngestQueueFullException, self).__init__(message)
+        self.retry_after = retry_after
+
+class ingest_queue(object):
+    """Bounded queue with a pool of worker threads that will take care of the spooled files. The
+    queue takes ownership of the files that are added to it and they will be removed after they have
+    been handled.
+    """
+    def __init__(self, handler, nrthreads=4, queue_size=100, retry_after=5):
+        """Constructor
+        :param handler: function called as handler(path, nid, meta, starttime) by the worker threads
+        :param nrthreads: number of worker threads
+        :param queue_size: max number of files waiting in the queue
+        :param retry_after: number of seconds a client should wait before retrying when queue is full
+        """
+        self._handler = handler
+        self._nrthreads = nrthreads
+        self._queue_size = queue_size
+        self._retry_after = retry_after
+        self._queue = jobQueue(queue_size)
+        self._threads = []
+        self._running = False
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._accepted = 0
+        self._rejected = 0
+        self._handled = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._last_wait = 0.0
+        self._max_wait = 0.0
+
+    def put(self, path, nid, meta, starttime=None):
+        """Adds a file to the ingest queue.
+        :param path: the spooled file. Will be removed by the queue when handled.
+        :param nid: the node id that sent the file
+        :param meta: the metadata of the file
+        :param starttime: when the handling of this file started, defaults to now
+        :raises IngestQueueFullException: if the queue is full or not running
+        """
+        if starttime is None:
+            starttime = time.time()
+        with self._lock:
+            if not self._running:
+                self._rejected = self._rejected + 1
+                raise IngestQueueFullException("Ingest queue is not running", self._retry_after)
+            try:
+                self._queue.put((path, nid, meta, starttime, time.time()))
+            except Full:
+                self._rejected = self._rejected + 1
+                raise IngestQueueFullException("Ingest queue is full", self._retry_after)
+            self._depth = self._depth + 1
+            self._accepted = self._accepted + 1
+
+    def consumer(self):
+        """The consumer called by the worker threads.
+        """
+        while self._running:
+            try:
+                path, nid, meta, starttime, queuetime = self._queue.get()
+            except jobQueueShutdown:
+                break
+
+            waittime = time.time() - queuetime
+            with self._lock:
+                self._depth = self._depth - 1
+                self._last_wait = waittime
+                self._total_wait = self._total_wait + waittime
+                if waittime > self._max_wait:
+                    self._max_wait = waittime
+
+            failed = False
+            try:
+                self._handler(path, nid, meta, starttime)
+            except Exception:
+                failed = True
+                logger.exception("Failed to handle ingested file from %s"%nid)
+            finally:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                self._queue.task_done()
+
+            with self._lock:
+                self._handled = self._handled + 1
+                if failed:
+                    self._failed = self._failed + 1
+
+    def start(self):
+        """Starts the worker threads as daemon threads
+        """
+        self._running = True
+        for i in range(self._nrthreads):
+            t = threading.Thread(target=self.consumer, daemon=True, name="ingest-%d"%i)
+            t.start()
+            self._threads.append(t)
+        logger.info("Started ingest queue with %d threads and queue size %d"%(self._nrthreads, self._queue_size))
+
+    def stop(self, handle_remaining=True):
+        """Stops the worker threads. The files still on the queue already have been accepted so they are
+        either handled in the calling thread or removed with a warning.
+        :param handle_remaining: if the files left on the queue should be handled
+        """
+        with self._lock:
+            self._running = False
+        self._queue.shutdown()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+        remaining = self._queue.drain()
+        if remaining:
+            logger.info("Ingest queue stopped with %d files left on the queue"%len(remaining))
+        for path, nid, meta, starttime, queuetime in remaining:
+            failed = not handle_remaining
+            if handle_remaining:
+                try:
+                    self._handler(path, nid, meta, starttime)
+                except Exception:
+                    failed = True
+                    logger.exception("Failed to handle ingested file from %s"%nid)
+            else:
+                logger.warning("Dropping accepted file from %s since ingest queue is stopped"%nid)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            with self._lock:
+                self._depth = self._depth - 1
+                self._handled = self._handled + 1
+                if failed:
+                    self._failed = self._failed + 1
+
+    def retry_after(self):
+        """
+        :return: number of seconds a client should wait before retrying when queue is full
+        """
+        return self._retry_after
+
+    def depth(self):
+        """
+        :return: number of files currently waiting in the queue
+        """
+        with self._lock:
+            return self._depth
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with information about the queue. Wait times are in milliseconds.
+        """
+        with self._lock:
+            dequeued = self._accepted - self._depth
+            average_wait = 0
+            if dequeued > 0:
+                average_wait = int(self._total_wait * 1000 / dequeued)
+            return {
+                "threads": self._nrthreads,
+                "queue_size": self._queue_size,
+                "depth": self._depth,
+                "accepted": self._accepted,
+                "rejected": self._rejected,
+                "handled": self._handled,
+                "failed": self._failed,
+                "last_wait": int(self._last_wait * 1000),
+                "average_wait": average_wait,
+                "max_wait": int(self._max_wait * 1000)
+            }
@@ -0,0 +1,197 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## In-memory source resolution. The sources are loaded once from the source database
+## and then all lookups are performed in memory.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import logging
+import threading
+from collections import OrderedDict
+
+from baltrad.bdbcommon import oh5
+
+logger = logging.getLogger("bexchange.server.sourceresolver")
+
+##
+# Keys that makes the ORG identifier superfluous when identifying a source
+ORG_OVERRIDING_KEYS = ["WMO", "NOD", "RAD", "PLC", "WIGOS"]
+
+class MemorySourceManager(object):
+    """Source manager that keeps all sources in memory. The sources are indexed on (key, value) so that
+    identifying a source is a couple of dictionary lookups instead of a number of database queries. Source
+    identification is performed in the same way as in sqlbackend.get_source_id. Resolved what/source
+    strings are kept in a LRU cache. The sources are persisted by the backing source manager which is
+    also used when sources are added.
+    """
+    def __init__(self, manager, cache_size=1000):
+        """Constructor
+        :param manager: the backing source manager, usually a SqlAlchemySourceManager
+        :param cache_size: max number of resolved what/source strings to keep
+        """
+        self._manager = manager
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._load(manager.get_sources())
+
+    def _load(self, srclist):
+        """Creates the index from the list of sources
+        :param srclist: a list of bdbcommon.oh5.Sources
+        """
+        entries = []
+        index = {}
+        parents = {}
+        for source_id, source in enumerate(srclist):
+            entries.append((source.name, source.parent, list(source.items())))
+            for k, v in source.items():
+                index.setdefault((k, v), []).append(source_id)
+            if source.parent is None:
+                parents[source.name] = source_id
+        parent_ids = [parents.get(parent) if parent is not None else None for _, parent, _ in entries]
+
+        with self._lock:
+            self._entries = entries
+            self._index = index
+            self._parents = parents
+            self._parent_ids = parent_ids
+            self._cache.clear()
+        logger.info("Loaded %d sources into memory"%len(entries))
+
+    def add_sources(self, srclist):
+        """Adds the sources to the backing source manager and reloads the sources
+        :param srclist: a list of bdbcommon.oh5.Sources
+        """
+        self._manager.add_sources(srclist)
+        self._load(self._manager.get_sources())
+
+    def get_source_id(self, source):
+        """Identifies the source. The source with most matching key-values will be returned. If
+        several sources are matching equally good, no source is returned. ORG will be ignored if
+        source contains any of WMO, NOD, RAD, PLC or WIGOS.
+        :param source: the source as found in the metadata
+        :return: the internal id of the source or None if it couldn't be identified
+        """
+        keys = source.keys()
+        ignoreORG = "ORG" in keys and any(k in keys for k in ORG_OVERRIDING_KEYS)
+        matches = {}
+        for key, value in source.items():
+            if ignoreORG and key == "ORG":
+                continue
+            for source_id in self._index.get((key, value), []):
+                matches[source_id] = matches.get(source_id, 0) + 1
+
+        if not matches:
+            return None
+
+        max_no_of_matches = max(matches.values())
+        best = [source_id for source_id, n in matches.items() if n == max_no_of_matches]
+        if len(best) > 1:
+            logger.debug(f"Could not determine source due to multiple equally matching sources found for {source}.")
+            return None
+        return best[0]
+
+    def _create_source(self, source_id, extra=[]):
+        """Creates a bdbcommon source from the internal entry
+        :param source_id: the internal id
+        :param extra: additional key-values that should be added to the source
+        :return: the source
+        """
+        name, parent, items = self._entries[source_id]
+        source = oh5.Source()
+        source.name = name
+        source.parent = parent
+        for k, v in items:
+            source[k] = v
+        for k, v in extra:
+            source[k] = v
+        return source
+
+    def _resolve(self, meta):
+        """Resolves the what/source string using the cache.
+        :param meta: the metadata
+        :return: a tuple (source_id, extra key-values) where source_id is None if source couldn't be identified
+        """
+        key = meta.what_source
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._hits = self._hits + 1
+                return self._cache[key]
+            self._misses = self._misses + 1
+
+        msources = meta.source()
+        source_id = self.get_source_id(msources)
+        extra = []
+        if source_id is not None:
+            known = set(k for k, _ in self._entries[source_id][2])
+            extra = [(k, msources[k]) for k in msources.keys() if k not in known]
+        result = (source_id, extra)
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def get_source(self, meta, add_parent_object=False):
+        """
+        :param meta: The metadata containing source
+        :param add_parent_object: This is adding a parent to the source. This will modify the bdb Source object by adding the member parent_object.
+        :return: A complete source from the metadata source identifier
+        """
+        if meta.what_source == None:
+            raise LookupError("no source in metadata")
+
+        source_id, extra = self._resolve(meta)
+        if source_id is None:
+            raise LookupError("failed to look up source for " +
+                              meta.source().to_string())
+
+        source = self._create_source(source_id, extra)
+        source.parent_object = None
+        if add_parent_object and self._parent_ids[source_id] is not None:
+            source.parent_object = self._create_source(self._parent_ids[source_id])
+        return source
+
+    def get_parent_source(self, parent):
+        """
+        :param parent: The id of the parent.
+        :return: The parent source matching the string in parent.
+        """
+        source_id = self._parents.get(parent)
+        if source_id is None:
+            raise LookupError(f"Could not identify any parent source with id {parent}")
+        return self._create_source(source_id)
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with information about the number of sources and the cache
+        """
+        with self._lock:
+            return {
+                "sources": len(self._entries),
+                "cache_size": self._cache_size,
+                "cached": len(self._cache),
+                "hits": self._hits,
+                "misses": self._misses
+            }
@@ -0,0 +1,198 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Spool where incomming files are stored once and shared between publishers,
+## connections and senders by using reference counted handles.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger("bexchange.server.spool")
+
+class spool_entry(object):
+    """A file in the spool
+    """
+    def __init__(self, key, path, size):
+        """Constructor
+        :param key: the key identifying the entry
+        :param path: the path to the spooled file
+        :param size: the size of the file
+        """
+        self.key = key
+        self.path = path
+        self.size = size
+        self.refcount = 0
+        self.created = time.time()
+
+class spool_handle(object):
+    """A reference to a spooled file. Can be used where a tempfile.NamedTemporaryFile is used, i.e. it has
+    a name and the reference is released when the handle is closed. The file is removed from the spool when
+    the last handle is closed. The spooled file is shared and must not be modified.
+    """
+    def __init__(self, spool, entry):
+        """Constructor
+        :param spool: the spool manager
+        :param entry: the spool entry
+        """
+        self._spool = spool
+        self._entry = entry
+        self.name = entry.path
+        self.closed = False
+
+    def flush(self):
+        """Nothing to flush since the spooled file never is written through the handle.
+        """
+        pass
+
+    def close(self):
+        """Releases the reference to the spooled file.
+        """
+        if not self.closed:
+            self.closed = True
+            self._spool.release(self._entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            logger.warning("Spool handle for %s was never closed"%self.name)
+            self.closed = True
+            self._spool.release(self._entry, True)
+
+class spool_manager(object):
+    """Keeps one copy of each file that is passed on to the publishers. The incomming files are identified by a key,
+    typically the metadata hash, so that the file only is added once even if it is published by several publishers.
+    If possible, the file is hardlinked into the spool, otherwise it is copied.
+    """
+    def __init__(self, folder, use_links=True):
+        """Constructor
+        :param folder: the spool folder. Will be created if it doesn't exist and any left over files will be removed.
+        :param use_links: if hardlinks should be tried before copying the file
+        """
+        self._folder = folder
+        self._use_links = use_links
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._paths = {}
+        self._linked = 0
+        self._copied = 0
+        self._shared = 0
+        self._leaked = 0
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        for f in os.listdir(folder):
+            try:
+                os.unlink(os.path.join(folder, f))
+            except OSError:
+                pass
+
+    def folder(self):
+        """
+        :return: the spool folder
+        """
+        return self._folder
+
+    def _add_file(self, path, dest):
+        """Links or copies the file into the spool.
+        :param path: the file to add
+        :param dest: the destination in the spool
+        """
+        if self._use_links:
+            try:
+                os.link(path, dest)
+                self._linked = self._linked + 1
+                return
+            except OSError:
+                pass
+        shutil.copyfile(path, dest)
+        self._copied = self._copied + 1
+
+    def acquire(self, path, key=None):
+        """Returns a handle to the spooled file. If path already is a spooled file or if key is found in the
+        spool, the existing entry is shared. Otherwise the file is added to the spool.
+        :param path: the file
+        :param key: the key identifying the file, if None the file is identified by the path
+        :return: a spool_handle that must be closed when no longer used
+        """
+        with self._lock:
+            entry = self._paths.get(path)
+            if entry is None and key is not None:
+                entry = self._entries.get(key)
+            if entry is None:
+                if key is None:
+                    key = uuid.uuid4().hex
+                dest = os.path.join(self._folder, "%s.h5"%uuid.uuid4().hex)
+                self._add_file(path, dest)
+                entry = spool_entry(key, dest, os.stat(dest).st_size)
+                self._entries[key] = entry
+                self._paths[dest] = entry
+            else:
+                self._shared = self._shared + 1
+            entry.refcount = entry.refcount + 1
+            return spool_handle(self, entry)
+
+    def release(self, entry, leaked=False):
+        """Releases one reference to the entry. When no references remains the file is removed.
+        :param entry: the spool entry
+        :param leaked: if the reference was released by the garbage collector instead of being closed
+        """
+        with self._lock:
+            if leaked:
+                self._leaked = self._leaked + 1
+            entry.refcount = entry.refcount - 1
+            if entry.refcount > 0:
+                return
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+            self._paths.pop(entry.path, None)
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            logger.exception("Failed to remove spooled file %s"%entry.path)
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with information about the spool, like number of files, size and references
+        """
+        with self._lock:
+            now = time.time()
+            oldest = 0
+            if self._entries:
+                oldest = int(now - min(e.created for e in self._entries.values()))
+            return {
+                "folder": self._folder,
+                "files": len(self._entries),
+                "size": sum(e.size for e in self._entries.values()),
+                "references": sum(e.refcount for e in self._entries.values()),
+                "linked": self._linked,
+                "copied": self._copied,
+                "shared": self._shared,
+                "leaked": self._leaked,
+                "oldest": oldest
+            }
@@ -82,9 +82,10 @@ class SqlAlchemySourceManager(object):
     """The DB manager providing source handling
     :param uri: The uri to database where sources are stored
     :param poolsize: the size of the db connection pool. In the case of sqlite, this will not be used
+    :param sqlite_profile: the bexchange.db.util.sqlite_profile to use if the uri points to a sqlite file
     """
-    def __init__(self, uri="sqlite:///tmp/baltrad-exchange-source.db", poolsize=10):
-        self._engine = dbutil.create_engine_from_url(uri, poolsize)
+    def __init__(self, uri="sqlite:///tmp/baltrad-exchange-source.db", poolsize=10, sqlite_profile=None):
+        self._engine = dbutil.create_engine_from_url(uri, poolsize, sqlite_profile)
         if self._engine.driver == "pysqlite":
             event.listen(self._engine, "connect", force_sqlite_foreign_keys)
         self.init_tables()
@@ -156,6 +157,22 @@ class SqlAlchemySourceManager(object):
         
         return source
     
+    def get_sources(self):
+        """
+        :return: all sources in the source database as a list of bdbcommon.oh5.Sources
+        """
+        with self.get_connection() as conn:
+            result = {}
+            for row in conn.execute(select(sources.c.id, sources.c.name, sources.c.parent).order_by(sources.c.id)):
+                source = oh5.Source()
+                source.name = row.name
+                source.parent = row.parent
+                result[row.id] = source
+            for row in conn.execute(select(source_kvs)):
+                if row.source_id in result:
+                    result[row.source_id][row.key] = row.value
+            return list(result.values())
+
     def get_parent_source(self, parent):
         """
         :param parent: The id of the parent.
@@ -44,6 +44,8 @@ class subscription(object):
         self._storages = storages
         self._active = active
         self._filter = ifilter
+        if isinstance(ifilter, filters.node_filter):
+            ifilter.compiled()
         self._allow_duplicates = allow_duplicates
         self._allowed_ids = allowed_ids
         self._statistics_plugins = []
@@ -96,6 +98,8 @@ class subscription(object):
         :return True if filter is None or if metadata matches the filter.
         """
         if self._filter:
+            if isinstance(self._filter, filters.node_filter):
+                return self._filter.matches(meta)
             matcher = metadata_matcher.metadata_matcher()
             return matcher.match(meta, self._filter.to_xpr())
         return True
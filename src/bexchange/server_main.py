@@ -226,4 +226,5 @@ def run():
             pass
         finally:
             server.stop()
+            application.app.get_backend().shutdown()
             logger.info("Server stopped")
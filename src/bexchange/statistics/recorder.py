@@ -0,0 +1,186 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Write-behind recorder that aggregates statistics in memory and writes them to
+## the database in batches from a background thread.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import atexit
+import threading
+import time
+import logging
+
+logger = logging.getLogger("bexchange.statistics.recorder")
+
+class statistics_recorder(object):
+    """Aggregates the counter increments and buffers the statentries so that they can be written to the database
+    in one transaction each flush interval instead of one transaction for each file. The counters are written as
+    a single upsert and the statentries are inserted with executemany. If the entry buffer is full, new entries are
+    dropped until the next flush. Pending statistics are flushed when the recorder is stopped or the process exits.
+    """
+    def __init__(self, db, interval=1.0, max_entries=10000):
+        """Constructor
+        :param db: the database, see bexchange.db.sqldatabase.SqlAlchemyDatabase
+        :param interval: seconds between each flush
+        :param max_entries: max number of statentries waiting to be written
+        """
+        self._db = db
+        self._interval = interval
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._counters = {}
+        self._entries = []
+        self._thread = None
+        self._running = False
+        self._flushes = 0
+        self._failures = 0
+        self._counters_written = 0
+        self._entries_written = 0
+        self._dropped = 0
+        self._total_flush_time = 0.0
+        self._last_flush_time = 0.0
+        self._max_flush_time = 0.0
+
+    def increment(self, spid, origin, source, count=1):
+        """Increments the counter for spid, origin and source
+        :param spid: the statistics id
+        :param origin: the origin
+        :param source: the source name
+        :param count: the increment
+        """
+        key = (spid, origin, source)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + count
+
+    def add(self, entry):
+        """Adds a statentry to the buffer
+        :param entry: the statentry
+        :return: True if the entry was added, False if it was dropped since the buffer is full
+        """
+        with self._lock:
+            if len(self._entries) >= self._max_entries:
+                self._dropped = self._dropped + 1
+                self._wakeup.set()
+                return False
+            self._entries.append(entry)
+            if len(self._entries) >= self._max_entries:
+                self._wakeup.set()
+            return True
+
+    def flush(self):
+        """Writes the pending counters and statentries to the database. Counters that couldn't be written are
+        kept until next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                counters, self._counters = self._counters, {}
+                entries, self._entries = self._entries, []
+            if not counters and not entries:
+                return
+
+            starttime = time.time()
+            failed = False
+            if counters:
+                try:
+                    self._db.increment_statistics_batch(counters)
+                except Exception:
+                    failed = True
+                    logger.exception("Failed to write %d statistics counters"%len(counters))
+                    with self._lock:
+                        for key, count in counters.items():
+                            self._counters[key] = self._counters.get(key, 0) + count
+                    counters = {}
+            if entries:
+                try:
+                    self._db.add_statentries(entries)
+                except Exception:
+                    failed = True
+                    logger.exception("Failed to write %d statentries"%len(entries))
+                    entries = []
+            flushtime = time.time() - starttime
+
+            with self._lock:
+                self._flushes = self._flushes + 1
+                if failed:
+                    self._failures = self._failures + 1
+                self._counters_written = self._counters_written + len(counters)
+                self._entries_written = self._entries_written + len(entries)
+                self._last_flush_time = flushtime
+                self._total_flush_time = self._total_flush_time + flushtime
+                if flushtime > self._max_flush_time:
+                    self._max_flush_time = flushtime
+
+    def run(self):
+        """The loop run by the background thread.
+        """
+        while self._running:
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush statistics")
+
+    def start(self):
+        """Starts the background thread as a daemon thread
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self.run, daemon=True, name="statistics-recorder")
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info("Started statistics recorder with flush interval %.1f s"%self._interval)
+
+    def stop(self):
+        """Stops the background thread and flushes the pending statistics.
+        """
+        if self._running:
+            self._running = False
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.stop)
+        self.flush()
+
+    def get_statistics(self):
+        """
+        :return: a dictionary with information about the recorder. Flush times are in milliseconds.
+        """
+        with self._lock:
+            average_flush = 0
+            if self._flushes > 0:
+                average_flush = int(self._total_flush_time * 1000 / self._flushes)
+            return {
+                "interval": self._interval,
+                "max_entries": self._max_entries,
+                "pending_counters": len(self._counters),
+                "pending_entries": len(self._entries),
+                "flushes": self._flushes,
+                "failures": self._failures,
+                "counters_written": self._counters_written,
+                "entries_written": self._entries_written,
+                "dropped": self._dropped,
+                "last_flush": int(self._last_flush_time * 1000),
+                "average_flush": average_flush,
+                "max_flush": int(self._max_flush_time * 1000)
+            }
@@ -27,6 +27,7 @@ import datetime
 import json, re
 from bexchange.db.sqldatabase import statistics, statentry
 from bexchange import util
+from bexchange.matching import filecontext
 
 RE_DTFILTER_PATTERN=re.compile(r"^\s*(datetime|entrytime|optime|delay)\s*([<>!=]+)\s*([0-9:\-T\.]+)\s*$")
 
@@ -67,6 +68,19 @@ class statistics_manager:
         """Constructor
         """
         self._sqldatabase = db
+        self._recorder = None
+
+    def set_recorder(self, recorder):
+        """Sets the recorder used for writing the statistics in batches instead of one transaction per increment.
+        :param recorder: the statistics_recorder or None if the statistics should be written directly
+        """
+        self._recorder = recorder
+
+    def recorder(self):
+        """
+        :return: the statistics_recorder or None if the statistics are written directly
+        """
+        return self._recorder
 
     def sqldatabase(self):
         """
@@ -80,6 +94,9 @@ class statistics_manager:
         """
         result = []
 
+        if self._recorder is not None:
+            self._recorder.flush()
+
         ids = self._sqldatabase.list_statistic_ids()
         for i in ids:
             result.append({"spid":i, "totals":True})
@@ -157,11 +174,22 @@ class statistics_manager:
         if "method" in querydata:
             qmethod = querydata["method"]
 
+        after_id = None
+        if "after_id" in querydata and querydata["after_id"] is not None:
+            after_id = int(querydata["after_id"])
+
+        limit = None
+        if "limit" in querydata and querydata["limit"] is not None:
+            limit = int(querydata["limit"])
+
+        if self._recorder is not None:
+            self._recorder.flush()
+
         if totals:
             entries = self._sqldatabase.find_statistics(spid, origins, sources)
         else:
             if qmethod is None or qmethod != "average":
-                entries = self._sqldatabase.find_statentries(spid, origins, sources, hashid=hashid, filters=filters, object_type=object_type)
+                entries = self._sqldatabase.find_statentries(spid, origins, sources, hashid=hashid, filters=filters, object_type=object_type, after_id=after_id, limit=limit)
             else:
                 entries = self._sqldatabase.get_average_statentries(spid, origins, sources)
         
@@ -173,10 +201,15 @@ class statistics_manager:
         jslist = [e.json_repr() for e in entries]
         return json.dumps(jslist)
 
-    def cleanup_statentry(self, age):
+    def cleanup_statentry(self, age, limit=None):
+        """Removes the statentries older than age hours
+        :param age: the age in hours
+        :param limit: max number of entries to remove, None means no limit
+        :return: number of removed entries
+        """
         now = datetime.datetime.now()
         maxage = now - datetime.timedelta(hours=age)
-        self._sqldatabase.cleanup_statentries(maxage)
+        return self._sqldatabase.cleanup_statentries(maxage, limit)
 
     def increment(self, spid, origin, meta, save_post=False, increment_counter=True, optime=0, optime_info=None):
         """ Increments a counter that is defined by:
@@ -187,27 +220,32 @@ class statistics_manager:
         try:
             source = meta.bdb_source_name
             if increment_counter:
-                self._sqldatabase.increment_statistics(spid, origin, source)
+                if self._recorder is not None:
+                    self._recorder.increment(spid, origin, source)
+                else:
+                    self._sqldatabase.increment_statistics(spid, origin, source)
         except:
-            logger.exception("An error occured when incrementing statistics for spid:%s, origin:%s, ID:%s"%(spid, origin, util.create_fileid_from_meta(meta)))
+            logger.exception("An error occured when incrementing statistics for spid:%s, origin:%s, ID:%s", spid, origin, util.fileid(meta))
 
         if save_post:
-            file_datetime = datetime.datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0, tzinfo=datetime.timezone.utc)
+            context = filecontext.get_context(meta)
+            file_datetime = context.nominal_datetime_utc()
             file_object = meta.what_object
             file_elangle = None
             if file_object == "SCAN":
-                mn = meta.find_node("/dataset1/where/elangle")
-                if not mn:
-                    mn = meta.find_node("/where/elangle")
-                if mn:
-                    file_elangle = mn.value
+                file_elangle = context.scan_elangle()
 
             entrytime = datetime.datetime.now(datetime.timezone.utc)
             delay = (entrytime - file_datetime).seconds
             try:
-                self._sqldatabase.add(statentry(spid, origin, source, meta.bdb_metadata_hash, datetime.datetime.now(datetime.timezone.utc), optime, optime_info, delay, file_datetime, file_object, file_elangle))
+                entry = statentry(spid, origin, source, meta.bdb_metadata_hash, datetime.datetime.now(datetime.timezone.utc), optime, optime_info, delay, file_datetime, file_object, file_elangle)
+                if self._recorder is not None:
+                    if not self._recorder.add(entry):
+                        logger.debug("Statistics buffer is full, dropping statentry for spid:%s, origin:%s, ID:%s", spid, origin, util.fileid(meta))
+                else:
+                    self._sqldatabase.add(entry)
             except:
-                logger.exception("An error occured when adding statentry for spid:%s, origin:%s, ID:%s"%(spid, origin, util.create_fileid_from_meta(meta)))
+                logger.exception("An error occured when adding statentry for spid:%s, origin:%s, ID:%s", spid, origin, util.fileid(meta))
 
 
     @classmethod
@@ -33,6 +33,7 @@ import importlib
 from pathlib import Path
 
 from bexchange.naming import namer
+from bexchange.matching import metaindex
 logger = logging.getLogger("bexchange.server.backend")
 
 class StorageError(Exception):
@@ -176,7 +177,7 @@ class file_storage(storage):
         :return: the value for the name or None if not found
         """
         try:
-            return meta.node(name).value
+            return metaindex.node(meta, name).value
         except LookupError:
             return None
 
@@ -243,7 +244,7 @@ class simple_rotating_file_storage(storage):
         :return: the value for the name or None if not found
         """
         try:
-            return meta.node(name).value
+            return metaindex.node(meta, name).value
         except LookupError:
             return None
 
@@ -22,9 +22,9 @@
 ## @author Anders Henja, SMHI
 ## @date 2021-08-18
 from abc import ABC, abstractmethod
-from queue import Queue #, Full, Empty
+from queue import Queue, Empty #, Full
 from threading import Condition #Thread, 
-import datetime
+from bexchange.matching import filecontext
 
 class abstractclassmethod(classmethod):
     """A decorator indicating abstract classmethods.
@@ -52,24 +52,26 @@ class message_aware(ABC):
     def handle_message(self, json_message, nodename):
         """Implement to handle the json message
         :param json_message: The json message
+        :param nodename: The node that sent the message
+        :return: the job if the message was submitted to the job executor, otherwise None
         """
         raise NotImplementedError("Not implemented handle_message")
 
 
 def create_fileid_from_meta(meta):
-    source = meta.bdb_source_name
-    file_datetime = datetime.datetime(meta.what_date.year, meta.what_date.month, meta.what_date.day, meta.what_time.hour, meta.what_time.minute, meta.what_time.second, 0)
-    file_object = meta.what_object
-    file_elangle = None
-    if file_object == "SCAN":
-        mn = meta.find_node("/dataset1/where/elangle")
-        if not mn:
-            mn = meta.find_node("/where/elangle")
-        if mn:
-            file_elangle = mn.value
-        return "nod:%s, object:%s, time:%s, elangle:%s, hash:%s"%(source, file_object, file_datetime.strftime("%Y-%m-%dT%H:%M:%SZ"), file_elangle, meta.bdb_metadata_hash)
-    else:
-        return "nod:%s, object:%s, time:%s, hash:%s"%(source, file_object, file_datetime.strftime("%Y-%m-%dT%H:%M:%SZ"), meta.bdb_metadata_hash)
+    """Creates the string used to identify the file in the logs. The string is only created once for each file.
+    :param meta: the metadata
+    :return: the file id
+    """
+    return filecontext.get_context(meta).fileid()
+
+def fileid(meta):
+    """Returns an object that is formatted as the file id, see create_fileid_from_meta. Intended to be passed as
+    argument to the loggers so that the file id only is created if the message is logged.
+    :param meta: the metadata
+    :return: the file context of the metadata
+    """
+    return filecontext.get_context(meta)
 
 class jobQueueShutdown(Exception):
     """thrown to indicate that an entry already exists
@@ -121,6 +123,20 @@ class jobQueue:
         """
         self._queue.task_done()
 
+    def drain(self):
+        """Removes all items that are left in the queue. Typically called after the queue has been shutdown.
+        :return: the items that were left in the queue
+        """
+        items = []
+        with self._condition:
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except Empty:
+                    break
+                self._queue.task_done()
+        return items
+
     def shutdown(self):
         """Shuts down the queue.
         """
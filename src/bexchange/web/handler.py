@@ -21,6 +21,7 @@
 ## @file
 ## @author Anders Henja, SMHI
 ## @date 2021-08-18
+import os
 import shutil
 from tempfile import NamedTemporaryFile
 import sys
@@ -31,12 +32,15 @@ from http import client as httplibclient
 import urllib.parse as urlparse
 
 from bexchange.net.exceptions import DuplicateException
+from bexchange.server.ingest import IngestQueueFullException
+from bexchange.runner.jobs import JobQueueFullException
 
 from .util import (
     HttpConflict,
     HttpNotAcceptable,
     HttpForbidden,
     HttpNotFound,
+    HttpServiceUnavailable,
     JsonResponse,
     NoContentResponse,
     Response,
@@ -53,7 +57,8 @@ def post_file(ctx):
     :param ctx: the request context
     :type ctx: :class:`~.util.RequestContext`
     :return: :class:`~.util.JsonResponse` with status
-             *200 OK*
+             *200 OK* or *202 Accepted* if asynchronous ingest is enabled
+    :raise: :class:`~.util.HttpServiceUnavailable` when the ingest queue is full
 
     See :ref:`doc-rest-cmd-store-file` for details
     """
@@ -62,6 +67,9 @@ def post_file(ctx):
         logger.info("post_file: anonymous calls are not allowed")
         return Response("", status=httplibclient.UNAUTHORIZED)
 
+    if ctx.backend.get_ingest_queue() is not None:
+        return enqueue_file(ctx)
+
     with NamedTemporaryFile(dir=ctx.backend.get_tmp_folder()) as tmp:
         shutil.copyfileobj(ctx.request.stream, tmp)
         tmp.flush()
@@ -74,6 +82,37 @@ def post_file(ctx):
 
     return Response("", status=httplibclient.OK)
 
+def enqueue_file(ctx):
+    """Spools the file and places it on the backends ingest queue. The ingest queue takes
+    ownership of the spooled file if it is accepted.
+
+    :param ctx: the request context
+    :type ctx: :class:`~.util.RequestContext`
+    :return: :class:`~.util.Response` with status *202 Accepted*
+    """
+    tmp = NamedTemporaryFile(dir=ctx.backend.get_tmp_folder(), delete=False)
+    queued = False
+    try:
+        shutil.copyfileobj(ctx.request.stream, tmp)
+        tmp.close()
+        queued = ctx.backend.enqueue_file(tmp.name, ctx.backend.get_auth_manager().get_nodename(ctx.request))
+    except LookupError as e:
+        raise HttpNotAcceptable(str(e))
+    except DuplicateException as e:
+        raise HttpConflict("duplicate file entry: %s"%str(e))
+    except IngestQueueFullException as e:
+        logger.info("post_file: %s, asking client to retry after %d seconds"%(str(e), e.retry_after))
+        raise HttpServiceUnavailable(str(e), e.retry_after)
+    finally:
+        if not queued:
+            tmp.close()
+            try:
+                os.unlink(tmp.name)
+            except OSError:
+                pass
+
+    return Response("", status=httplibclient.ACCEPTED)
+
 def post_dex_file(ctx):
     logger.debug("bexchange.handler.post_dex_file(ctx)")
     if ctx.is_anonymous(): # We don't want unauthorized messages in here unless it has been explicitly allowed
@@ -97,10 +136,9 @@ def post_json_message(ctx):
 
     :param ctx: the request context
     :type ctx: :class:`~.util.RequestContext`
-    :return: :class:`~.util.JsonResponse` with status
-             *201 Created* and metadata in body
-    :raise: :class:`~.util.HttpConflict` when file already
-            stored
+    :return: :class:`~.util.Response` with status *202 Accepted* and the submitted jobs
+             in body if any job was submitted to the job executor, otherwise *200 OK*
+    :raise: :class:`~.util.HttpServiceUnavailable` when the job executor is full
 
     See :ref:`doc-rest-cmd-post-json-message` for details
     """
@@ -109,8 +147,35 @@ def post_json_message(ctx):
         logger.info("post_json_message: anonymous calls are not allowed")
         return Response("", status=httplibclient.UNAUTHORIZED)
     data = ctx.request.get_json_data()
-    ctx.backend.post_message(data, ctx.backend.get_auth_manager().get_nodename(ctx.request))
-    return Response("", status=httplibclient.OK)
+    try:
+        jobs = ctx.backend.post_message(data, ctx.backend.get_auth_manager().get_nodename(ctx.request))
+    except JobQueueFullException as e:
+        logger.info("post_json_message: %s, asking client to retry after %d seconds"%(str(e), e.retry_after))
+        raise HttpServiceUnavailable(str(e), e.retry_after)
+    jobs = [j.json_repr() for j in jobs] if jobs else []
+    status = httplibclient.ACCEPTED if jobs else httplibclient.OK
+    return Response(json.dumps({"jobs":jobs}), status=status)
+
+def get_job(ctx, job_id):
+    """Returns the status of a job submitted to the job executor
+
+    :param ctx: the request context
+    :type ctx: :class:`~.util.RequestContext`
+    :param job_id: the id of the job
+    :return: :class:`~.util.Response` with status *200 OK* and the job in body
+    :raise: :class:`~.util.HttpNotFound` when the job isn't known
+
+    See :ref:`doc-rest-cmd-get-job` for details
+    """
+    logger.debug("bexchange.handler.get_job(ctx, %s)"%job_id)
+    if ctx.is_anonymous():
+        logger.info("get_job: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    executor = ctx.backend.get_job_executor()
+    j = executor.get_job(job_id) if executor is not None else None
+    if j is None:
+        raise HttpNotFound("No such job: %s"%job_id)
+    return Response(json.dumps(j.json_repr()), status=httplibclient.OK)
 
 def get_statistics(ctx):
     """Returns the statistics for modules / sources
@@ -187,6 +252,160 @@ def get_server_publickey(ctx):
     publickey = ctx.backend.get_server_publickey()
     return Response(publickey, status=httplibclient.OK)
 
+def get_server_ingest(ctx):
+    """
+    :returns information about the ingest queue like depth and wait times
+
+    See :ref:`doc-rest-cmd-server_info` for details
+    """
+    logger.debug("bexchange.handler.get_server_ingest(ctx)")
+    if ctx.is_anonymous():
+        logger.info("get_server_ingest: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    result = {"enabled":False}
+    ingest_queue = ctx.backend.get_ingest_queue()
+    if ingest_queue is not None:
+        result = ingest_queue.get_statistics()
+        result["enabled"] = True
+    return Response(json.dumps(result), status=httplibclient.OK)
+
+def get_server_routing(ctx):
+    """
+    :returns information about the routing indexes for subscriptions and publications
+
+    See :ref:`doc-rest-cmd-server_info` for details
+    """
+    logger.debug("bexchange.handler.get_server_routing(ctx)")
+    if ctx.is_anonymous():
+        logger.info("get_server_routing: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    return Response(json.dumps(ctx.backend.get_routing_statistics()), status=httplibclient.OK)
+
+def get_server_spool(ctx):
+    """
+    :returns information about the spool used for sharing published files, like number of files and references
+
+    See :ref:`doc-rest-cmd-server_info` for details
+    """
+    logger.debug("bexchange.handler.get_server_spool(ctx)")
+    if ctx.is_anonymous():
+        logger.info("get_server_spool: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    result = {"enabled":False}
+    spool = ctx.backend.get_spool()
+    if spool is not None:
+        result = spool.get_statistics()
+        result["enabled"] = True
+    return Response(json.dumps(result), status=httplibclient.OK)
+
+def get_server_decorators(ctx):
+    """
+    :returns information about the decoration cache, like number of cached files, hits and misses
+
+    See :ref:`doc-rest-cmd-server_info` for details
+    """
+    logger.debug("bexchange.handler.get_server_decorators(ctx)")
+    if ctx.is_anonymous():
+        logger.info("get_server_decorators: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    result = {"enabled":False}
+    cache = ctx.backend.get_decoration_cache()
+    if cache is not None:
+        result = cache.get_statistics()
+        result["enabled"] = True
+    return Response(json.dumps(result), status=httplibclient.OK)
+
+def get_server_statistics(ctx):
+    """
+    :returns information about the statistics recorder, like pending entries and flush times
+
+    See :ref:`doc-rest-cmd-server_info` for details
+    """
+    logger.debug("bexchange.handler.get_server_statistics(ctx)")
+    if ctx.is_anonymous():
+        logger.info("get_server_statistics: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    result = {"enabled":False}
+    recorder = ctx.backend.get_statistics_manager().recorder()
+    if recorder is not None:
+        result = recorder.get_statistics()
+        result["enabled"] = True
+    return Response(json.dumps(result), status=httplibclient.OK)
+
+def get_server_arrivals(ctx):
+    """
+    :returns information about the arrival index, like number of sources and how many queries that were answered from memory
+
+    See :ref:`doc-rest-cmd-server_info` for details
+    """
+    logger.debug("bexchange.handler.get_server_arrivals(ctx)")
+    if ctx.is_anonymous():
+        logger.info("get_server_arrivals: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    result = {"enabled":False}
+    arrivals = ctx.backend.get_arrival_index()
+    if arrivals is not None:
+        result = arrivals.get_statistics()
+        result["enabled"] = True
+    return Response(json.dumps(result), status=httplibclient.OK)
+
+def get_server_jobs(ctx):
+    """
+    :returns information about the job executor, like number of queued, running and coalesced jobs
+
+    See :ref:`doc-rest-cmd-server_info` for details
+    """
+    logger.debug("bexchange.handler.get_server_jobs(ctx)")
+    if ctx.is_anonymous():
+        logger.info("get_server_jobs: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    result = {"enabled":False}
+    executor = ctx.backend.get_job_executor()
+    if executor is not None:
+        result = executor.get_statistics()
+        result["enabled"] = True
+    return Response(json.dumps(result), status=httplibclient.OK)
+
+def split_names(value):
+    """Splits a comma separated string into a list
+    :param value: a comma separated string, a list or None
+    :return: the list of names, empty if value is None or empty
+    """
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def check_arrivals(ctx, sources, origins, object_type, mindatetime, minentrytime=None, maxdelay=None, count=1):
+    """Checks if at least count files has arrived. The arrival index is used if enabled, otherwise or if the
+    index can't answer, the server-incomming entries in the statistics database are queried.
+    :param ctx: the request context
+    :param sources: list of source names, empty means all
+    :param origins: list of origins, empty means all
+    :param object_type: the object type, None means all
+    :param mindatetime: the earliest nominal datetime (UTC)
+    :param minentrytime: the earliest arrival time (UTC), None means no limit
+    :param maxdelay: max seconds between nominal datetime and arrival, None means no limit
+    :param count: number of files that should have arrived
+    :return: True if at least count files has arrived
+    """
+    arrivals = ctx.backend.get_arrival_index()
+    if arrivals is not None:
+        found = arrivals.count(sources, origins, object_type, mindatetime, minentrytime, maxdelay, count)
+        if found is not None:
+            return found >= count
+
+    dtfilter = "datetime>=%s"%mindatetime.strftime("%Y%m%d%H%M%S")
+    if minentrytime is not None:
+        dtfilter = dtfilter + "&&entrytime>=%s"%minentrytime.strftime("%Y%m%d%H%M%S")
+    if maxdelay is not None:
+        dtfilter = dtfilter + "&&delay<=%d"%maxdelay
+
+    querydata = {"spid":"server-incomming", "sources":",".join(sources), "origins":",".join(origins), "object_type":object_type, "filter":dtfilter, "limit":count}
+    stats = ctx.backend.get_statistics_manager().get_statistics_entries(ctx.backend.get_auth_manager().get_nodename(ctx.request), querydata)
+    return stats is not None and len(stats) >= count
+
 def file_arrival(ctx):
     """Returns if a file with specified source, object type has arrived within limit
 
@@ -212,30 +431,18 @@ def file_arrival(ctx):
     if "limit" in data:
         limit = int(data["limit"])
 
-    dtfilterdate = (datetime.datetime.utcnow() - datetime.timedelta(minutes=limit))
-    dtfilter = "datetime>=%s"%((datetime.datetime.utcnow() - datetime.timedelta(minutes=limit)).strftime("%Y%m%d%H%M"))
-    querydata = {"spid":"server-incomming", "sources":source, "object_type":object_type, "dtfilter":dtfilter}
-    stats = ctx.backend.get_statistics_manager().get_statistics_entries(ctx.backend.get_auth_manager().get_nodename(ctx.request), querydata)
+    mindatetime = (datetime.datetime.utcnow() - datetime.timedelta(minutes=limit)).replace(second=0, microsecond=0)
     result={"status":"ERROR"}
-    if stats and len(stats) > 0:
+    if check_arrivals(ctx, split_names(source), [], object_type, mindatetime):
         result={"status":"OK"}
     return Response(json.dumps(result), status=httplibclient.OK)
 
-def supervise(ctx):
-    """Provides functionality for supervising the node
-
+def supervise_check(ctx, data):
+    """Performs one supervision check
     :param ctx: the request context
-    :type ctx: :class:`~.util.RequestContext`
-    :return: :class:`~.util.JsonResponse` with status
-             *200 Created* and information in body
-
-    See :ref:`doc-rest-cmd-file-arrival` for details
+    :param data: dictionary with the optional members source, origins, object_type, limit, entrylimit, delay and count
+    :return: True if the criterias are met
     """
-    logger.debug("bexchange.handler.supervise(ctx)")
-    if ctx.is_anonymous():
-        logger.info("supervise: anonymous calls are not allowed")
-        return Response("", status=httplibclient.UNAUTHORIZED)
-    data = ctx.request.get_json_data()
     source = None
     origins = None
     object_type = None
@@ -261,16 +468,70 @@ def supervise(ctx):
         if count == 0:
             count = 1
 
-    dtfilterdate = (datetime.datetime.utcnow() - datetime.timedelta(seconds=limit))
-    dtfilter = "datetime>=%s"%((datetime.datetime.utcnow() - datetime.timedelta(seconds=limit)).strftime("%Y%m%d%H%M%S"))
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    mindatetime = now - datetime.timedelta(seconds=limit)
+    minentrytime = None
     if entrylimit > 0:
-        dtfilter = dtfilter + "&&entrytime>=%s"%((datetime.datetime.utcnow() - datetime.timedelta(seconds=entrylimit)).strftime("%Y%m%d%H%M%S"))
+        minentrytime = now - datetime.timedelta(seconds=entrylimit)
+    maxdelay = None
     if delay > 0:
-        dtfilter = dtfilter + "&&delay<=%d"%delay
+        maxdelay = delay
+
+    return check_arrivals(ctx, split_names(source), split_names(origins), object_type, mindatetime, minentrytime, maxdelay, count)
+
+def supervise(ctx):
+    """Provides functionality for supervising the node
+
+    :param ctx: the request context
+    :type ctx: :class:`~.util.RequestContext`
+    :return: :class:`~.util.JsonResponse` with status
+             *200 Created* and information in body
+
+    See :ref:`doc-rest-cmd-file-arrival` for details
+    """
+    logger.debug("bexchange.handler.supervise(ctx)")
+    if ctx.is_anonymous():
+        logger.info("supervise: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    data = ctx.request.get_json_data()
 
-    querydata = {"spid":"server-incomming", "sources":source, "origins":origins, "object_type":object_type, "filter":dtfilter}
-    stats = ctx.backend.get_statistics_manager().get_statistics_entries(ctx.backend.get_auth_manager().get_nodename(ctx.request), querydata)
     result={"status":"ERROR"}
-    if stats and len(stats) >= count:
+    if supervise_check(ctx, data):
         result={"status":"OK"}
-    return Response(json.dumps(result), status=httplibclient.OK)
\ No newline at end of file
+    return Response(json.dumps(result), status=httplibclient.OK)
+
+def supervise_batch(ctx):
+    """Performs several supervision checks in one request. The body should contain {"checks":[...]} where each check
+    has the same members as a supervise request.
+
+    :param ctx: the request context
+    :type ctx: :class:`~.util.RequestContext`
+    :return: :class:`~.util.JsonResponse` with status
+             *200 OK* and the status of each check in body. The overall status is OK if all checks are OK.
+             *400 Bad Request* if the checks are missing
+
+    See :ref:`doc-rest-supervise-batch` for details
+    """
+    logger.debug("bexchange.handler.supervise_batch(ctx)")
+    if ctx.is_anonymous():
+        logger.info("supervise_batch: anonymous calls are not allowed")
+        return Response("", status=httplibclient.UNAUTHORIZED)
+    data = ctx.request.get_json_data()
+    if not isinstance(data, dict) or not isinstance(data.get("checks"), list):
+        return Response(json.dumps({"status":"ERROR", "message":"checks must be a list"}), status=httplibclient.BAD_REQUEST)
+
+    status = "OK"
+    checks = []
+    for check in data["checks"]:
+        check_status = "ERROR"
+        try:
+            if supervise_check(ctx, check):
+                check_status = "OK"
+        except Exception:
+            logger.exception("supervise_batch: failed to perform check: %s"%check)
+        if check_status != "OK":
+            status = "ERROR"
+        result = dict(check)
+        result["status"] = check_status
+        checks.append(result)
+    return Response(json.dumps({"status":status, "checks":checks}), status=httplibclient.OK)
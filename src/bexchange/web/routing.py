@@ -77,6 +77,27 @@ URL_MAP = Map(
             Rule("/publickey", methods=["GET"],
                 endpoint="handler.get_server_publickey"
             ),
+            Rule("/ingest", methods=["GET"],
+                endpoint="handler.get_server_ingest"
+            ),
+            Rule("/routing", methods=["GET"],
+                endpoint="handler.get_server_routing"
+            ),
+            Rule("/spool", methods=["GET"],
+                endpoint="handler.get_server_spool"
+            ),
+            Rule("/decorators", methods=["GET"],
+                endpoint="handler.get_server_decorators"
+            ),
+            Rule("/statistics", methods=["GET"],
+                endpoint="handler.get_server_statistics"
+            ),
+            Rule("/arrivals", methods=["GET"],
+                endpoint="handler.get_server_arrivals"
+            ),
+            Rule("/jobs", methods=["GET"],
+                endpoint="handler.get_server_jobs"
+            ),
         ]),
         Submount("/filearrival", [
             Rule("/", methods=["GET"],
@@ -87,12 +108,20 @@ URL_MAP = Map(
             Rule("/", methods=["GET"],
                 endpoint="handler.supervise"
             ),
+            Rule("/batch", methods=["GET"],
+                endpoint="handler.supervise_batch"
+            ),
         ]),
         Submount("/json_message", [
             Rule("/", methods=["POST"],
                 endpoint="handler.post_json_message"
             ),
         ]),
+        Submount("/jobs", [
+            Rule("/<job_id>", methods=["GET"],
+                endpoint="handler.get_job"
+            ),
+        ]),
         Submount("/BaltradDex", [    # For backward compatibility
             Rule("/post_file.htm", methods=["POST"],
                 endpoint="handler.post_dex_file"
@@ -151,3 +151,18 @@ class HttpForbidden(HTTPException):
     def __init__(self, description=None, response=None):
         HTTPException.__init__(self, description, response)
 
+class HttpServiceUnavailable(HTTPException):
+    """503 Service Unavailable
+
+    :param retry_after: number of seconds to reply in *retry-after* header.
+    """
+    code = httplibclient.SERVICE_UNAVAILABLE
+    def __init__(self, description=None, retry_after=None):
+        HTTPException.__init__(self, description)
+        self._retry_after = retry_after
+
+    def get_headers(self, environ, scope = None):
+        headers = HTTPException.get_headers(self, environ)
+        if self._retry_after is not None:
+            headers.append(("retry-after", str(self._retry_after)))
+        return headers
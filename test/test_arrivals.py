@@ -0,0 +1,81 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.server.arrivals
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import unittest
+from datetime import datetime, timedelta
+
+from bexchange.server.arrivals import arrival_index
+
+class TestArrivalIndex(unittest.TestCase):
+    def setUp(self):
+        self.classUnderTest = arrival_index(3)
+        self.now = datetime.utcnow() + timedelta(seconds=1)
+
+    def tearDown(self):
+        self.classUnderTest = None
+
+    def add(self, source, object_type, origin, age, delay=10):
+        nominal = self.now + timedelta(seconds=age)
+        self.classUnderTest.add(source, object_type, origin, nominal, nominal + timedelta(seconds=delay))
+
+    def test_count(self):
+        self.add("sella", "PVOL", "node1", 60)
+        self.add("sella", "SCAN", "node1", 60)
+        self.add("sekkr", "PVOL", "node2", 60)
+
+        self.assertEqual(1, self.classUnderTest.count(["sella"], [], "PVOL", self.now))
+        self.assertEqual(2, self.classUnderTest.count(["sella"], [], None, self.now, needed=5))
+        self.assertEqual(2, self.classUnderTest.count([], [], "PVOL", self.now, needed=5))
+        self.assertEqual(1, self.classUnderTest.count([], ["node2"], None, self.now, needed=5))
+        self.assertEqual(0, self.classUnderTest.count(["sehem"], [], None, self.now))
+
+    def test_count_stops_at_needed(self):
+        for i in range(3):
+            self.add("sella", "PVOL", "node1", 60 + i)
+        self.assertEqual(2, self.classUnderTest.count(["sella"], [], None, self.now, needed=2))
+
+    def test_count_delay_and_entrytime(self):
+        self.add("sella", "PVOL", "node1", 60, delay=30)
+        self.assertEqual(0, self.classUnderTest.count(["sella"], [], None, self.now, maxdelay=20))
+        self.assertEqual(1, self.classUnderTest.count(["sella"], [], None, self.now, maxdelay=30))
+        self.assertEqual(0, self.classUnderTest.count(["sella"], [], None, self.now, minentrytime=self.now + timedelta(seconds=100)))
+        self.assertEqual(1, self.classUnderTest.count(["sella"], [], None, self.now, minentrytime=self.now + timedelta(seconds=90)))
+
+    def test_count_before_created(self):
+        self.add("sella", "PVOL", "node1", 60)
+        # Files before the index was created are unknown, unless enough files already are found
+        self.assertEqual(None, self.classUnderTest.count(["sella"], [], None, self.now - timedelta(seconds=3600), needed=2))
+        self.assertEqual(1, self.classUnderTest.count(["sella"], [], None, self.now - timedelta(seconds=3600), needed=1))
+        stats = self.classUnderTest.get_statistics()
+        self.assertEqual(1, stats["answered"])
+        self.assertEqual(1, stats["fallbacks"])
+
+    def test_count_after_eviction(self):
+        for i in range(5):
+            self.add("sella", "PVOL", "node1", 60 + i*60)
+        # Arrivals 60 and 120 have been dropped
+        self.assertEqual(None, self.classUnderTest.count(["sella"], [], None, self.now + timedelta(seconds=60), needed=5))
+        self.assertEqual(3, self.classUnderTest.count(["sella"], [], None, self.now + timedelta(seconds=180), needed=5))
+        self.assertEqual(1, self.classUnderTest.get_statistics()["keys"])
@@ -70,7 +70,7 @@ class TestBackend:
 
         self.classUnderTest.metadata_from_file.assert_called_once_with("abc")
         mock_storage.store.assert_called_once_with("abc", meta)
-        self.classUnderTest.publish.assert_called_once_with("id-1", "abc", meta)
+        self.classUnderTest.publish.assert_called_once_with(["id-1"], "abc", meta)
         self.classUnderTest.processor_manager.process.assert_called_once_with("abc", meta)
 
     def test_store_file_failed_storage(self):
@@ -98,7 +98,7 @@ class TestBackend:
 
         self.classUnderTest.metadata_from_file.assert_called_once_with("abc")
         mock_storage.store.assert_called_once_with("abc", meta)
-        self.classUnderTest.publish.assert_called_once_with("id-1", "abc", meta)
+        self.classUnderTest.publish.assert_called_once_with(["id-1"], "abc", meta)
         self.classUnderTest.processor_manager.process.assert_called_once_with("abc", meta)
 
     def test_store_file_failed_storage_with_two_storages(self):
@@ -131,7 +131,7 @@ class TestBackend:
         self.classUnderTest.metadata_from_file.assert_called_once_with("abc")
         mock_storage.store.assert_called_with("abc", meta)
         mock_storage_2.store.assert_called_with("abc", meta)
-        self.classUnderTest.publish.assert_called_once_with("id-1", "abc", meta)
+        self.classUnderTest.publish.assert_called_once_with(["id-1"], "abc", meta)
         self.classUnderTest.processor_manager.process.assert_called_once_with("abc", meta)
 
     def test_store_file_failed_publish(self):
@@ -159,9 +159,78 @@ class TestBackend:
 
         self.classUnderTest.metadata_from_file.assert_called_once_with("abc")
         mock_storage.store.assert_called_with("abc", meta)
-        self.classUnderTest.publish.assert_called_once_with("id-1", "abc", meta)
+        self.classUnderTest.publish.assert_called_once_with(["id-1"], "abc", meta)
         self.classUnderTest.processor_manager.process.assert_called_once_with("abc", meta)
 
+    def test_store_file_several_subscriptions(self):
+        meta = Metadata()
+        self.classUnderTest.metadata_from_file = MagicMock(return_value=meta)
+        self.classUnderTest.create_fileid_from_meta = MagicMock(return_value="file_identifier")
+        self.classUnderTest.publish = MagicMock(return_value="file_identifier")
+        self.classUnderTest.storage_manager = storages.storage_manager()
+        self.classUnderTest.processor_manager = MagicMock()
+
+        mock_storage = MagicMock()
+        mock_storage.name.return_value = "nisse"
+        self.classUnderTest.storage_manager.add_storage(mock_storage)
+
+        mock_storage_2 = MagicMock()
+        mock_storage_2.name.return_value = "pelle"
+        self.classUnderTest.storage_manager.add_storage(mock_storage_2)
+
+        mock_subscription = MagicMock()
+        mock_subscription.filter_matching.return_value = True
+        mock_subscription.storages.return_value = ["nisse"]
+        mock_subscription.id.return_value = "id-1"
+        mock_subscription.allowed_ids.return_value = []
+        mock_statplugin = MagicMock()
+        mock_subscription.get_statistics_plugins.return_value = [mock_statplugin]
+
+        mock_subscription_2 = MagicMock()
+        mock_subscription_2.filter_matching.return_value = True
+        mock_subscription_2.storages.return_value = ["nisse", "pelle"]
+        mock_subscription_2.id.return_value = "id-2"
+        mock_subscription_2.allowed_ids.return_value = []
+        mock_statplugin_2 = MagicMock()
+        mock_subscription_2.get_statistics_plugins.return_value = [mock_statplugin_2]
+
+        self.classUnderTest.subscriptions = [mock_subscription, mock_subscription_2]
+
+        # Execute test
+        self.classUnderTest.store_file("abc", "anid")
+
+        mock_storage.store.assert_called_once_with("abc", meta)
+        mock_storage_2.store.assert_called_once_with("abc", meta)
+        self.classUnderTest.publish.assert_called_once_with(["id-1", "id-2"], "abc", meta)
+        self.classUnderTest.processor_manager.process.assert_called_once_with("abc", meta)
+        mock_statplugin.increment.assert_called_once_with("anid", meta)
+        mock_statplugin_2.increment.assert_called_once_with("anid", meta)
+
+    def test_publish_origin(self):
+        meta = Metadata()
+        matcher_mock = MagicMock()
+        self.classUnderTest.create_matcher = MagicMock(return_value=matcher_mock)
+
+        mock_publication_1 = MagicMock()
+        mock_publication_1.origin.return_value = ["id-2"]
+        mock_publication_1.active.return_value = True
+        mock_publication_2 = MagicMock()
+        mock_publication_2.origin.return_value = ["id-3"]
+        mock_publication_2.active.return_value = True
+        mock_publication_3 = MagicMock()
+        mock_publication_3.origin.return_value = []
+        mock_publication_3.active.return_value = True
+        self.classUnderTest.publications = [mock_publication_1, mock_publication_2, mock_publication_3]
+        matcher_mock.match.return_value = True
+
+        # Execute test
+        self.classUnderTest.publish(["id-1", "id-2"], "abc", meta)
+
+        # Verify
+        mock_publication_1.publish.assert_called_once_with("abc", meta)
+        mock_publication_2.publish.assert_not_called()
+        mock_publication_3.publish.assert_called_once_with("abc", meta)
+
     def test_publish(self):
         meta = Metadata()
         matcher_mock = MagicMock()
@@ -231,3 +300,96 @@ class TestBackend:
         # Verify
         mock_publication_1.publish.assert_called_once_with("abc", meta)
         mock_publication_2.publish.assert_called_once_with("abc", meta)
+
+    def test_enqueue_file(self):
+        meta = Metadata()
+        self.classUnderTest.metadata_from_file = MagicMock(return_value=meta)
+        self.classUnderTest.handled_files = MagicMock()
+        self.classUnderTest.handled_files.handled.return_value = False
+        self.classUnderTest.ingest_queue = MagicMock()
+
+        # Execute test
+        result = self.classUnderTest.enqueue_file("abc", "anid")
+
+        # Verify
+        assert result == True
+        self.classUnderTest.metadata_from_file.assert_called_once_with("abc")
+        self.classUnderTest.ingest_queue.put.assert_called_once()
+        args = self.classUnderTest.ingest_queue.put.call_args[0]
+        assert args[0:3] == ("abc", "anid", meta)
+
+    def test_enqueue_file_duplicate(self):
+        meta = Metadata()
+        self.classUnderTest.metadata_from_file = MagicMock(return_value=meta)
+        self.classUnderTest.create_fileid_from_meta = MagicMock(return_value="file_identifier")
+        self.classUnderTest.handled_files = MagicMock()
+        self.classUnderTest.handled_files.handled.return_value = True
+        self.classUnderTest.ingest_queue = MagicMock()
+
+        mock_subscription = MagicMock()
+        mock_subscription.allow_duplicates.return_value = False
+        self.classUnderTest.subscriptions = [mock_subscription]
+
+        # Execute test
+        from bexchange.net.exceptions import DuplicateException
+        with pytest.raises(DuplicateException):
+            self.classUnderTest.enqueue_file("abc", "anid")
+
+        # Verify
+        self.classUnderTest.ingest_queue.put.assert_not_called()
+
+    def test_enqueue_file_duplicate_allowed(self):
+        meta = Metadata()
+        self.classUnderTest.metadata_from_file = MagicMock(return_value=meta)
+        self.classUnderTest.handled_files = MagicMock()
+        self.classUnderTest.handled_files.handled.return_value = True
+        self.classUnderTest.ingest_queue = MagicMock()
+
+        mock_subscription = MagicMock()
+        mock_subscription.allow_duplicates.return_value = True
+        self.classUnderTest.subscriptions = [mock_subscription]
+
+        # Execute test
+        result = self.classUnderTest.enqueue_file("abc", "anid")
+
+        # Verify
+        assert result == True
+        self.classUnderTest.ingest_queue.put.assert_called_once()
+
+    def test_subscription_removed(self):
+        s1 = MagicMock()
+        s1.filter.return_value = None
+        s2 = MagicMock()
+        s2.filter.return_value = None
+        self.classUnderTest.set_subscriptions([s1, s2])
+        subscriptions = self.classUnderTest.subscriptions
+        index = self.classUnderTest.get_subscription_index()
+
+        # Execute test
+        self.classUnderTest.subscription_removed("s1.json", s1)
+
+        # Verify
+        assert subscriptions == [s1, s2]
+        assert self.classUnderTest.subscriptions == [s2]
+        assert self.classUnderTest.get_subscription_index() is not index
+        assert self.classUnderTest.get_subscription_index().match(Metadata()) == [s2]
+
+    def test_shutdown_closes_handled_files(self):
+        self.classUnderTest.handled_files = MagicMock()
+
+        # Execute test
+        self.classUnderTest.shutdown()
+
+        # Verify
+        self.classUnderTest.handled_files.close.assert_called_once()
+
+    def test_shutdown_decorator_pool(self):
+        pool = MagicMock()
+        self.classUnderTest.decorator_pool = pool
+
+        # Execute test
+        self.classUnderTest.shutdown()
+
+        # Verify
+        pool.shutdown.assert_called_once()
+        assert self.classUnderTest.get_decorator_pool() is None
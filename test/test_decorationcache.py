@@ -0,0 +1,127 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.decorators.cache
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import os
+import pytest
+from tempfile import TemporaryDirectory, NamedTemporaryFile
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from bexchange.decorators.cache import decoration_cache
+
+class TestDecorationCache:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.tmpdir = TemporaryDirectory()
+        self.classUnderTest = decoration_cache(os.path.join(self.tmpdir.name, "cache"), limit=2, ttl=60)
+        self.files = []
+        yield
+        for f in self.files:
+            f.close()
+        self.tmpdir.cleanup()
+
+    def create_file(self, content=b"content"):
+        f = NamedTemporaryFile(dir=self.tmpdir.name)
+        f.write(content)
+        f.flush()
+        self.files.append(f)
+        return f
+
+    def create_decorator(self, configuration):
+        d = MagicMock()
+        d.configuration.return_value = configuration
+        return d
+
+    def test_key(self):
+        meta = SimpleNamespace(bdb_metadata_hash="abc")
+        d1 = self.create_decorator(("a.b", True, False, {"x":1, "y":2}))
+        d2 = self.create_decorator(("a.b", True, False, {"y":2, "x":1}))
+        assert self.classUnderTest.key(meta, [d1]) == self.classUnderTest.key(meta, [d2])
+        assert self.classUnderTest.key(meta, [d1]) != self.classUnderTest.key(SimpleNamespace(bdb_metadata_hash="def"), [d1])
+        assert self.classUnderTest.key(meta, [self.create_decorator(None)]) is None
+
+    def test_key_not_cacheable(self):
+        meta = SimpleNamespace(bdb_metadata_hash="abc")
+        d1 = self.create_decorator(("a.b", True, False, {}))
+        d2 = self.create_decorator(("bexchange.decorators.decorator.max_age_filter", True, False, {}))
+        d2.cacheable.return_value = False
+        assert self.classUnderTest.key(meta, [d1]) is not None
+        assert self.classUnderTest.key(meta, [d1, d2]) is None
+
+    def test_max_age_filter_not_cacheable(self):
+        from bexchange.decorators.decorator import max_age_filter
+        assert not max_age_filter(MagicMock(), True, False, 10, 20).cacheable()
+
+    def test_decorate_metadata_not_shared(self):
+        newmeta = SimpleNamespace(what_object="PVOL")
+        decorate = MagicMock(return_value=(self.create_file(b"decorated"), newmeta))
+        f1, meta1 = self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+        meta1.what_object = "SCAN"
+        f2, meta2 = self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+        f3, meta3 = self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+        f2.close()
+        f3.close()
+        assert "PVOL" == meta2.what_object
+        assert meta2 is not meta3
+
+    def test_decorate(self):
+        decorated = self.create_file(b"decorated")
+        decorate = MagicMock(return_value=(decorated, "newmeta"))
+
+        f1, meta1 = self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+        f2, meta2 = self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+
+        assert 1 == decorate.call_count
+        assert "newmeta" == meta1
+        assert "newmeta" == meta2
+        assert f1.name != f2.name
+        with open(f2.name, "rb") as fp:
+            assert b"decorated" == fp.read()
+        f2.close()
+        assert not os.path.exists(f2.name)
+        stats = self.classUnderTest.get_statistics()
+        assert 1 == stats["hits"]
+        assert 1 == stats["misses"]
+        assert 1 == stats["files"]
+
+    def test_decorate_discarded(self):
+        decorate = MagicMock(return_value=(None, "meta"))
+        self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+        f, meta = self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+        assert f is None
+        assert 1 == decorate.call_count
+
+    def test_decorate_failure_not_cached(self):
+        decorate = MagicMock(side_effect=Exception("failed"))
+        with pytest.raises(Exception):
+            self.classUnderTest.decorate("key", self.create_file(), "meta", decorate)
+        assert 0 == self.classUnderTest.get_statistics()["files"]
+
+    def test_limit(self):
+        for k in ["a", "b", "c"]:
+            self.classUnderTest.decorate(k, self.create_file(), "meta", lambda f, m: (self.create_file(), m))
+        stats = self.classUnderTest.get_statistics()
+        assert 2 == stats["files"]
+        assert 1 == stats["evicted"]
+        assert 2 == len(os.listdir(os.path.join(self.tmpdir.name, "cache")))
@@ -23,9 +23,14 @@
 ## @date 2021-08-18
 from __future__ import absolute_import
 
+import os
+import shutil
+import threading
+import time
 import unittest
+from tempfile import NamedTemporaryFile
 from unittest.mock import MagicMock
-from bexchange.decorators.decorator import decorator_manager, decorator
+from bexchange.decorators.decorator import decorator_manager, decorator, decorate_in_process, decorator_pool, remove_late_result
 
 class test_filter(decorator):
     def __init__(self, backend, discard_on_none, can_return_invalid_file_content, arg1, arg2):
@@ -36,6 +41,25 @@ class test_filter(decorator):
     def decorate(self, inf):
         return inf
 
+class copy_filter(decorator):
+    def __init__(self, backend, discard_on_none, can_return_invalid_file_content, mode):
+        super(copy_filter, self).__init__(backend, discard_on_none, can_return_invalid_file_content)
+        self.mode = mode
+
+    def decorate(self, inf, meta):
+        if self.mode == "none":
+            return None
+        elif self.mode == "same":
+            return inf
+        elif self.mode.startswith("sleep"):
+            time.sleep(float(self.mode[5:]))
+        newf = NamedTemporaryFile(dir=self.backend().get_tmp_folder())
+        with open(inf.name, "rb") as fp:
+            shutil.copyfileobj(fp, newf)
+        newf.write(b"-decorated")
+        newf.flush()
+        return newf
+
 class test_decorator_manager(unittest.TestCase):
     def test_create_instance(self):
         backend = MagicMock()
@@ -52,3 +76,112 @@ class test_decorator_manager(unittest.TestCase):
             self.fail("Expected TypeError")
         except TypeError:
             pass
+
+    def test_create_instance_configuration(self):
+        backend = MagicMock()
+        clz = decorator_manager.create(backend, "test_decorator.copy_filter", True, False, {"mode":"same"}, 10)
+        self.assertEqual(10, clz.timeout())
+        self.assertEqual(("test_decorator.copy_filter", True, False, {"mode":"same"}), clz.configuration())
+
+class test_decorate_in_process(unittest.TestCase):
+    def setUp(self):
+        with NamedTemporaryFile(delete=False) as fp:
+            fp.write(b"content")
+            self.path = fp.name
+        self.files = [self.path]
+
+    def tearDown(self):
+        for f in self.files:
+            if os.path.exists(f):
+                os.unlink(f)
+
+    def test_new_file(self):
+        result = decorate_in_process(None, ("test_decorator.copy_filter", False, False, {"mode":"copy"}), self.path, None)
+        self.files.append(result)
+        self.assertNotEqual(self.path, result)
+        with open(result, "rb") as fp:
+            self.assertEqual(b"content-decorated", fp.read())
+
+    def test_same_file(self):
+        result = decorate_in_process(None, ("test_decorator.copy_filter", False, False, {"mode":"same"}), self.path, None)
+        self.assertEqual(self.path, result)
+
+    def test_none(self):
+        result = decorate_in_process(None, ("test_decorator.copy_filter", False, False, {"mode":"none"}), self.path, None)
+        self.assertEqual(None, result)
+
+class test_decorator_pool(unittest.TestCase):
+    def setUp(self):
+        with NamedTemporaryFile(delete=False) as fp:
+            fp.write(b"content")
+            self.path = fp.name
+        self.files = [self.path]
+        self.classUnderTest = None
+
+    def tearDown(self):
+        if self.classUnderTest is not None:
+            self.classUnderTest.shutdown(wait=False)
+        for f in self.files:
+            if os.path.exists(f):
+                os.unlink(f)
+
+    def configuration(self, mode):
+        return ("test_decorator.copy_filter", False, False, {"mode":mode})
+
+    def test_decorate(self):
+        self.classUnderTest = decorator_pool(1)
+        result = self.classUnderTest.decorate(None, self.configuration("copy"), self.path, None, 30)
+        self.files.append(result)
+        with open(result, "rb") as fp:
+            self.assertEqual(b"content-decorated", fp.read())
+
+    def test_timeout(self):
+        self.classUnderTest = decorator_pool(1)
+        with self.assertRaises(Exception):
+            self.classUnderTest.decorate(None, self.configuration("sleep60"), self.path, None, 0.5)
+        self.assertEqual(1, self.classUnderTest.get_statistics()["timeouts"])
+        self.assertEqual(1, self.classUnderTest.get_statistics()["recycled"])
+
+        # The hanging process has been replaced so the pool can still be used
+        result = self.classUnderTest.decorate(None, self.configuration("copy"), self.path, None, 30)
+        self.files.append(result)
+        self.assertNotEqual(self.path, result)
+
+    def test_timeout_resubmits_other_decorators(self):
+        self.classUnderTest = decorator_pool(2)
+        # Make sure that both processes are started before the test
+        self.classUnderTest.decorate(None, self.configuration("same"), self.path, None, 30)
+        results = []
+        def run():
+            results.append(self.classUnderTest.decorate(None, self.configuration("sleep1"), self.path, None, 30))
+        t = threading.Thread(target=run)
+        t.start()
+        time.sleep(0.2)
+        with self.assertRaises(Exception):
+            self.classUnderTest.decorate(None, self.configuration("sleep60"), self.path, None, 0.5)
+        t.join(30)
+        self.files.extend(results)
+        self.assertEqual(1, len(results))
+        self.assertNotEqual(self.path, results[0])
+
+    def test_shutdown(self):
+        self.classUnderTest = decorator_pool(1)
+        self.classUnderTest.shutdown()
+        with self.assertRaises(RuntimeError):
+            self.classUnderTest.decorate(None, self.configuration("same"), self.path, None, 30)
+        self.assertEqual(0, self.classUnderTest.get_statistics()["recycled"])
+
+    def test_remove_late_result(self):
+        with NamedTemporaryFile(delete=False) as fp:
+            late = fp.name
+        self.files.append(late)
+        future = MagicMock()
+        future.cancelled.return_value = False
+        future.exception.return_value = None
+        future.result.return_value = late
+        remove_late_result(self.path, future)
+        self.assertFalse(os.path.exists(late))
+
+        future.result.return_value = self.path
+        remove_late_result(self.path, future)
+        self.assertTrue(os.path.exists(self.path))
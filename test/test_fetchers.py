@@ -0,0 +1,95 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests the parallel downloads in bexchange.net.fetchers
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from bexchange.net.fetchers import copy_fetcher
+
+class test_fetch_parallel(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.backend = MagicMock()
+        self.backend.get_fetch_state.return_value = None
+        self.backend.get_tmp_folder.return_value = self.tmpdir
+        self.stored = []
+        self.backend.store_file.side_effect = self.store_file
+        self.lock = threading.Lock()
+        self.opened = []
+        self.closed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def store_file(self, filename, nid):
+        with open(filename) as fp:
+            self.stored.append(fp.read())
+
+    def open_channel(self):
+        channel = object()
+        with self.lock:
+            self.opened.append(channel)
+        return channel
+
+    def download(self, channel, entry, filename):
+        time.sleep(0.01)
+        if entry[0] == "bad":
+            raise IOError("read failed")
+        with open(filename, "w") as fp:
+            fp.write(entry[0])
+
+    def create_fetcher(self, parallel_downloads):
+        return copy_fetcher(self.backend, "copy", {"path":self.tmpdir, "parallel_downloads":parallel_downloads})
+
+    def test_fetch_parallel(self):
+        entries = [("f%d"%i, 1, 1.0) for i in range(20)]
+        classUnderTest = self.create_fetcher(4)
+        classUnderTest.fetch_parallel(entries, self.open_channel, self.closed.append, self.download)
+
+        # Files are stored in listing order, each worker thread has its own channel and all temporary files are removed
+        self.assertEqual([e[0] for e in entries], self.stored)
+        self.assertTrue(1 < len(self.opened) <= 4)
+        self.assertEqual(sorted(map(id, self.opened)), sorted(map(id, self.closed)))
+        self.assertEqual([], os.listdir(self.tmpdir))
+
+    def test_fetch_parallel_failed_download(self):
+        entries = [("f1", 1, 1.0), ("bad", 1, 1.0), ("f2", 1, 1.0)]
+        classUnderTest = self.create_fetcher(2)
+        with self.assertRaises(Exception):
+            classUnderTest.fetch_parallel(entries, self.open_channel, self.closed.append, self.download)
+        self.assertEqual(["f1", "f2"], self.stored)
+        self.assertEqual([], os.listdir(self.tmpdir))
+
+    def test_fetch_parallel_nothing_to_fetch(self):
+        classUnderTest = self.create_fetcher(2)
+        classUnderTest.fetch_parallel([], self.open_channel, self.closed.append, self.download)
+        self.assertEqual([], self.opened)
+
+    def test_invalid_parallel_downloads(self):
+        with self.assertRaises(AttributeError):
+            self.create_fetcher(0)
@@ -0,0 +1,109 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.matching.filecontext
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import datetime
+import pickle
+import pytest
+from bexchange import util
+from bexchange.matching import filecontext
+
+class node(object):
+    def __init__(self, path, value=None):
+        self._path = path
+        self.value = value
+
+    def path(self):
+        return self._path
+
+class metadata(object):
+    def __init__(self, what_object, paths=[]):
+        self.nodes = [node(p, v) for p, v in paths]
+        self.what_object = what_object
+        self.what_date = datetime.date(2000, 1, 2)
+        self.what_time = datetime.time(12, 15, 30)
+        self.what_source = "NOD:setst,WMO:12345"
+        self.bdb_source = "NOD:setst,WMO:12345,RAD:SE52"
+        self.bdb_source_name = "setst"
+        self.bdb_metadata_hash = "abc123"
+
+    def iternodes(self):
+        return iter(self.nodes)
+
+class Test_file_context(object):
+    def test_nominal_datetime(self):
+        meta = metadata("PVOL")
+        ctx = filecontext.get_context(meta)
+        assert datetime.datetime(2000, 1, 2, 12, 15, 30) == ctx.nominal_datetime()
+        assert datetime.datetime(2000, 1, 2, 12, 15, 30, tzinfo=datetime.timezone.utc) == ctx.nominal_datetime_utc()
+
+    def test_values_are_cached(self):
+        meta = metadata("PVOL")
+        ctx = filecontext.get_context(meta)
+        dt = ctx.nominal_datetime()
+        meta.what_time = datetime.time(13, 0)
+        assert dt is ctx.nominal_datetime()
+
+    def test_get_context_same_instance(self):
+        meta = metadata("PVOL")
+        assert filecontext.get_context(meta) is filecontext.get_context(meta)
+
+    def test_immutable(self):
+        ctx = filecontext.get_context(metadata("PVOL"))
+        with pytest.raises(AttributeError):
+            ctx.foo = 1
+        with pytest.raises(AttributeError):
+            ctx._fileid = "x"
+
+    def test_fileid(self):
+        meta = metadata("PVOL")
+        assert "nod:setst, object:PVOL, time:2000-01-02T12:15:30Z, hash:abc123" == filecontext.get_context(meta).fileid()
+        assert "nod:setst, object:PVOL, time:2000-01-02T12:15:30Z, hash:abc123" == util.create_fileid_from_meta(meta)
+        assert "ID:'nod:setst, object:PVOL, time:2000-01-02T12:15:30Z, hash:abc123'" == "ID:'%s'"%util.fileid(meta)
+
+    def test_fileid_scan(self):
+        meta = metadata("SCAN", [("/dataset1/where/elangle", 0.5)])
+        ctx = filecontext.get_context(meta)
+        assert 0.5 == ctx.scan_elangle()
+        assert "nod:setst, object:SCAN, time:2000-01-02T12:15:30Z, elangle:0.5, hash:abc123" == ctx.fileid()
+
+    def test_scan_elangle_missing(self):
+        ctx = filecontext.get_context(metadata("SCAN"))
+        assert ctx.scan_elangle() is None
+        assert "nod:setst, object:SCAN, time:2000-01-02T12:15:30Z, elangle:None, hash:abc123" == ctx.fileid()
+
+    def test_pickle(self):
+        meta = metadata("PVOL")
+        filecontext.get_context(meta).fileid()
+        result = pickle.loads(pickle.dumps(meta))
+        ctx = filecontext.get_context(result)
+        assert ctx is not filecontext.get_context(meta)
+        assert "nod:setst, object:PVOL, time:2000-01-02T12:15:30Z, hash:abc123" == ctx.fileid()
+
+    def test_source(self):
+        pytest.importorskip("baltrad.bdbcommon")
+        ctx = filecontext.get_context(metadata("PVOL"))
+        assert "SE52" == ctx.source()["RAD"]
+        assert ctx.source() is ctx.source()
+        assert "12345" == ctx.what_source()["WMO"]
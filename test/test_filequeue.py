@@ -0,0 +1,107 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.runner.filequeue
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import threading
+import time
+import unittest
+
+from bexchange.runner.filequeue import file_queue
+
+class TestFileQueue(unittest.TestCase):
+    def setUp(self):
+        self.handled = []
+        self.lock = threading.Lock()
+        self.classUnderTest = None
+
+    def tearDown(self):
+        if self.classUnderTest:
+            self.classUnderTest.stop()
+
+    def handler(self, filename):
+        with self.lock:
+            self.handled.append(filename)
+
+    def wait_for(self, count):
+        for i in range(200):
+            if self.classUnderTest.get_statistics()["handled"] >= count:
+                return
+            time.sleep(0.01)
+        self.fail("Timeout waiting for files to be handled")
+
+    def test_coalesce(self):
+        self.classUnderTest = file_queue(self.handler)
+        self.assertTrue(self.classUnderTest.add("/tmp/a.h5"))
+        self.assertFalse(self.classUnderTest.add("/tmp/a.h5"))
+        self.classUnderTest.add_backlog(["/tmp/a.h5", "/tmp/b.h5"])
+
+        self.classUnderTest.start()
+        self.wait_for(2)
+
+        self.assertEqual(["/tmp/a.h5", "/tmp/b.h5"], self.handled)
+        self.assertEqual(1, self.classUnderTest.get_statistics()["coalesced"])
+
+    def test_live_before_backlog(self):
+        self.classUnderTest = file_queue(self.handler, backlog_rate=0)
+        self.classUnderTest.add_backlog(["/tmp/b1.h5", "/tmp/b2.h5"])
+        self.classUnderTest.add("/tmp/l1.h5")
+        self.classUnderTest.add("/tmp/l2.h5")
+
+        self.classUnderTest.start()
+        self.wait_for(4)
+
+        self.assertEqual(["/tmp/l1.h5", "/tmp/l2.h5", "/tmp/b1.h5", "/tmp/b2.h5"], self.handled)
+
+    def test_backlog_rate(self):
+        self.classUnderTest = file_queue(self.handler, workers=2, backlog_rate=20)
+        self.classUnderTest.add_backlog(["/tmp/%d.h5"%i for i in range(5)])
+
+        starttime = time.monotonic()
+        self.classUnderTest.start()
+        self.wait_for(5)
+        self.assertTrue(time.monotonic() - starttime >= 0.19)
+
+    def test_overflow_to_backlog(self):
+        self.classUnderTest = file_queue(self.handler, queue_size=1, backlog_rate=0)
+        self.classUnderTest.add("/tmp/a.h5")
+        self.classUnderTest.add("/tmp/b.h5")
+        stats = self.classUnderTest.get_statistics()
+        self.assertEqual(1, stats["live"])
+        self.assertEqual(1, stats["backlog"])
+        self.assertEqual(1, stats["overflowed"])
+
+        self.classUnderTest.start()
+        self.wait_for(2)
+
+    def test_failing_handler(self):
+        def failing(filename):
+            raise Exception("Failed")
+        self.classUnderTest = file_queue(failing, workers=2)
+        self.classUnderTest.start()
+        self.classUnderTest.add("/tmp/a.h5")
+        self.wait_for(1)
+        self.assertEqual(1, self.classUnderTest.get_statistics()["failed"])
+        self.assertEqual(0, self.classUnderTest.get_statistics()["pending"])
+        # The file can be added again when it has been handled
+        self.assertTrue(self.classUnderTest.add("/tmp/a.h5"))
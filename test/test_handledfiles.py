@@ -0,0 +1,93 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.server.handledfiles
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import os
+import pytest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+from bexchange.server.handledfiles import HandledFiles
+
+class TestHandledFiles:
+    def test_add(self):
+        classUnderTest = HandledFiles(limit=3)
+        assert classUnderTest.add("a") == True
+        assert classUnderTest.add("a") == False
+        assert classUnderTest.handled("a") == True
+        assert classUnderTest.handled("b") == False
+
+    def test_add_limit(self):
+        classUnderTest = HandledFiles(limit=3)
+        for h in ["a", "b", "c", "d"]:
+            assert classUnderTest.add(h) == True
+        assert classUnderTest.size() == 3
+        assert classUnderTest.handled("a") == False
+        assert classUnderTest.handled("b") == True
+        assert classUnderTest.handled("d") == True
+
+    def test_add_ttl(self):
+        classUnderTest = HandledFiles(limit=10, ttl=60)
+        with patch("bexchange.server.handledfiles.time.time", return_value=1000.0):
+            classUnderTest.add("a")
+        with patch("bexchange.server.handledfiles.time.time", return_value=1030.0):
+            classUnderTest.add("b")
+            assert classUnderTest.handled("a") == True
+        with patch("bexchange.server.handledfiles.time.time", return_value=1061.0):
+            assert classUnderTest.handled("a") == False
+            assert classUnderTest.handled("b") == True
+            assert classUnderTest.add("a") == True
+            assert classUnderTest.size() == 2
+
+    def test_snapshot(self):
+        with TemporaryDirectory() as d:
+            snapshot = os.path.join(d, "handled.db")
+            classUnderTest = HandledFiles(limit=3, snapshot=snapshot)
+            for h in ["a", "b", "c", "d"]:
+                classUnderTest.add(h)
+            classUnderTest.close()
+
+            classUnderTest = HandledFiles(limit=3, snapshot=snapshot)
+            assert classUnderTest.size() == 3
+            assert classUnderTest.handled("a") == False
+            assert classUnderTest.add("d") == False
+            assert classUnderTest.add("e") == True
+            classUnderTest.close()
+
+    def test_snapshot_ttl(self):
+        with TemporaryDirectory() as d:
+            snapshot = os.path.join(d, "handled.db")
+            with patch("bexchange.server.handledfiles.time.time", return_value=1000.0):
+                classUnderTest = HandledFiles(limit=10, ttl=60, snapshot=snapshot)
+                classUnderTest.add("a")
+                classUnderTest.close()
+
+            with patch("bexchange.server.handledfiles.time.time", return_value=1030.0):
+                classUnderTest = HandledFiles(limit=10, ttl=60, snapshot=snapshot)
+                assert classUnderTest.handled("a") == True
+                classUnderTest.close()
+
+            with patch("bexchange.server.handledfiles.time.time", return_value=1100.0):
+                classUnderTest = HandledFiles(limit=10, ttl=60, snapshot=snapshot)
+                assert classUnderTest.size() == 0
+                classUnderTest.close()
@@ -0,0 +1,95 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Verifies that the startup import time doesn't grow and that heavy dependencies are imported lazily.
+## The budgets are in milliseconds and can be scaled with the environment variable BEXCHANGE_IMPORT_BUDGET_FACTOR.
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+# module: (budget in ms, modules that must not be imported)
+IMPORT_BUDGETS = {
+    "bexchange.net.fetchers": (500, ["paramiko", "scp"]),
+    "bexchange.net.senders": (1500, ["paramiko", "scp"]),
+    "bexchange.net.publishers": (2000, ["paramiko", "scp"]),
+    "bexchange.runner.runners": (2000, ["paramiko", "scp"]),
+    "bexchange.odimutil": (1500, []),
+    "bexchange.client_main": (1000, ["paramiko", "scp", "sqlalchemy"]),
+    "bexchange.server.backend": (4000, ["paramiko", "scp"])
+}
+
+# Dependencies that are installed separately from baltrad-exchange. A module that can't be imported since
+# one of these are missing is not measured, any other import failure is an error.
+OPTIONAL_DEPENDENCIES = ["baltrad", "baltradcrypto", "baltradutils", "watchdog", "pyinotify", "_pyhl", "h5py", "zmq", "jprops", "keyczar"]
+
+MISSING_MODULE = re.compile(r"^ModuleNotFoundError: No module named '([^']+)'", re.MULTILINE)
+
+class MissingDependency(Exception):
+    """thrown when a module can't be imported since an optional dependency is missing
+    """
+
+def measure_import(module):
+    """Imports the module in a new interpreter using python -X importtime
+    :param module: the module name
+    :return: a tuple (total import time in ms, set of imported modules)
+    :raise: MissingDependency if an optional dependency is missing
+    :raise: ImportError if the module couldn't be imported for any other reason
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([p for p in sys.path if p])
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s"%module], env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        missing = MISSING_MODULE.search(proc.stderr)
+        if missing and missing.group(1).split(".")[0] in OPTIONAL_DEPENDENCIES:
+            raise MissingDependency(missing.group(1))
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise ImportError("Failed to import %s:\n%s"%(module, "\n".join(errors[-20:])))
+    total = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):
+            total = total + int(cumulative)
+    return total / 1000.0, modules
+
+class test_importtime(unittest.TestCase):
+    def test_import_budgets(self):
+        factor = float(os.environ.get("BEXCHANGE_IMPORT_BUDGET_FACTOR", "1.0"))
+        measured = 0
+        for module, (budget, forbidden) in IMPORT_BUDGETS.items():
+            try:
+                elapsed, modules = measure_import(module)
+            except MissingDependency:
+                continue
+            measured = measured + 1
+            self.assertLessEqual(elapsed, budget * factor, "Importing %s took %.1f ms, budget is %.1f ms"%(module, elapsed, budget * factor))
+            for name in forbidden:
+                self.assertFalse(name in modules, "%s imports %s"%(module, name))
+        if measured == 0:
+            self.skipTest("No module could be imported")
@@ -0,0 +1,137 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.server.ingest
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import os
+import threading
+import pytest
+from tempfile import NamedTemporaryFile
+from unittest.mock import MagicMock
+from bexchange.server.ingest import ingest_queue, IngestQueueFullException
+
+class TestIngestQueue:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.classUnderTest = None
+        yield
+        if self.classUnderTest:
+            self.classUnderTest.stop()
+        self.classUnderTest = None
+
+    def create_spooled_file(self):
+        tmp = NamedTemporaryFile(delete=False)
+        tmp.close()
+        return tmp.name
+
+    def test_put(self):
+        handled = threading.Event()
+        handler = MagicMock(side_effect=lambda *args: handled.set())
+        self.classUnderTest = ingest_queue(handler, 1, 5)
+        self.classUnderTest.start()
+        path = self.create_spooled_file()
+
+        self.classUnderTest.put(path, "anid", "meta", 1.0)
+
+        assert handled.wait(5)
+        handler.assert_called_once_with(path, "anid", "meta", 1.0)
+        self.classUnderTest.stop()
+        assert not os.path.exists(path)
+        stats = self.classUnderTest.get_statistics()
+        assert stats["accepted"] == 1
+        assert stats["handled"] == 1
+        assert stats["depth"] == 0
+
+    def test_put_full(self):
+        release = threading.Event()
+        handler = MagicMock(side_effect=lambda *args: release.wait(5))
+        self.classUnderTest = ingest_queue(handler, 1, 1, retry_after=7)
+        self.classUnderTest.start()
+
+        paths = [self.create_spooled_file() for i in range(3)]
+        self.classUnderTest.put(paths[0], "anid", "meta")
+        while self.classUnderTest.depth() > 0: # Wait until worker is busy with first file
+            pass
+        self.classUnderTest.put(paths[1], "anid", "meta")
+
+        with pytest.raises(IngestQueueFullException) as e:
+            self.classUnderTest.put(paths[2], "anid", "meta")
+        assert e.value.retry_after == 7
+        assert self.classUnderTest.depth() == 1
+        assert self.classUnderTest.get_statistics()["rejected"] == 1
+
+        release.set()
+        os.unlink(paths[2])
+
+    def test_put_not_running(self):
+        self.classUnderTest = ingest_queue(MagicMock(), 1, 1)
+        with pytest.raises(IngestQueueFullException):
+            self.classUnderTest.put("abc", "anid", "meta")
+
+    def test_handler_failure(self):
+        handled = threading.Event()
+        def failing_handler(*args):
+            handled.set()
+            raise Exception("failure")
+        self.classUnderTest = ingest_queue(failing_handler, 1, 5)
+        self.classUnderTest.start()
+        path = self.create_spooled_file()
+
+        self.classUnderTest.put(path, "anid", "meta")
+
+        assert handled.wait(5)
+        self.classUnderTest.stop()
+        assert not os.path.exists(path)
+        assert self.classUnderTest.get_statistics()["failed"] == 1
+
+    def test_stop_handles_remaining(self):
+        release = threading.Event()
+        handler = MagicMock(side_effect=lambda *args: release.wait(5))
+        self.classUnderTest = ingest_queue(handler, 1, 5)
+        self.classUnderTest.start()
+        paths = [self.create_spooled_file() for i in range(3)]
+        self.classUnderTest.put(paths[0], "anid", "meta")
+        while self.classUnderTest.depth() > 0: # Wait until worker is busy with first file
+            pass
+        self.classUnderTest.put(paths[1], "anid", "meta")
+        self.classUnderTest.put(paths[2], "anid", "meta")
+
+        release.set()
+        self.classUnderTest.stop()
+        assert handler.call_count == 3
+        assert [p for p in paths if os.path.exists(p)] == []
+        stats = self.classUnderTest.get_statistics()
+        assert stats["handled"] == 3
+        assert stats["depth"] == 0
+
+    def test_stop_drops_remaining(self):
+        self.classUnderTest = ingest_queue(MagicMock(), 1, 5)
+        self.classUnderTest._running = True # Accept files without any workers
+        paths = [self.create_spooled_file() for i in range(2)]
+        for p in paths:
+            self.classUnderTest.put(p, "anid", "meta")
+
+        self.classUnderTest.stop(handle_remaining=False)
+        self.classUnderTest._handler.assert_not_called()
+        assert [p for p in paths if os.path.exists(p)] == []
+        assert self.classUnderTest.get_statistics()["failed"] == 2
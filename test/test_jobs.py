@@ -0,0 +1,129 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.runner.jobs
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import unittest
+import threading
+import time
+
+from bexchange.runner.jobs import job, job_executor, JobQueueFullException
+
+class test_job_executor(unittest.TestCase):
+    def setUp(self):
+        self.classUnderTest = None
+        self.release = threading.Event()
+        self.started = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.release.set()
+        if self.classUnderTest is not None:
+            self.classUnderTest.stop()
+
+    def blocking(self, value=None):
+        with self.lock:
+            self.started.append(value)
+        self.release.wait(5)
+
+    def wait_for(self, predicate):
+        for i in range(200):
+            if predicate():
+                return
+            time.sleep(0.01)
+        self.fail("Timeout waiting for condition")
+
+    def test_submit_and_run(self):
+        self.classUnderTest = job_executor(workers=2)
+        self.classUnderTest.start()
+        self.release.set()
+        j = self.classUnderTest.submit("fetcher", "fetcher", "fetcher:{}", self.blocking, value=1)
+        self.wait_for(lambda: j.state == job.DONE)
+        self.assertEqual([1], self.started)
+        self.assertTrue(self.classUnderTest.get_job(j.id) is j)
+        self.assertEqual("DONE", j.json_repr()["state"])
+
+    def test_failed_job(self):
+        def failing():
+            raise Exception("connection refused")
+        self.classUnderTest = job_executor(workers=1)
+        self.classUnderTest.start()
+        j = self.classUnderTest.submit("fetcher", "fetcher", "fetcher:{}", failing)
+        self.wait_for(lambda: j.state == job.FAILED)
+        self.assertEqual("connection refused", j.error)
+        self.assertEqual(1, self.classUnderTest.get_statistics()["failed"])
+
+    def test_coalesce_while_running(self):
+        self.classUnderTest = job_executor(workers=2)
+        self.classUnderTest.start()
+        j1 = self.classUnderTest.submit("fetcher", "fetcher", "fetcher:{}", self.blocking, value=1)
+        self.wait_for(lambda: j1.state == job.RUNNING)
+
+        # Concurrency for the fetcher is 1 so the second job is queued and the third is coalesced into it
+        j2 = self.classUnderTest.submit("fetcher", "fetcher", "fetcher:{}", self.blocking, value=2)
+        j3 = self.classUnderTest.submit("fetcher", "fetcher", "fetcher:{}", self.blocking, value=3)
+        self.assertTrue(j2 is j3)
+        self.assertEqual(1, j2.coalesced)
+        time.sleep(0.05)
+        self.assertEqual(job.QUEUED, j2.state)
+
+        self.release.set()
+        self.wait_for(lambda: j2.state == job.DONE)
+        self.assertEqual([1, 2], self.started)
+
+    def test_concurrency_per_group(self):
+        self.classUnderTest = job_executor(workers=4)
+        self.classUnderTest.set_concurrency("a", 2)
+        self.classUnderTest.start()
+        jobs = [self.classUnderTest.submit("a", "a", "a:%d"%i, self.blocking, value="a%d"%i) for i in range(3)]
+        jb = self.classUnderTest.submit("b", "b", "b", self.blocking, value="b")
+        self.wait_for(lambda: len(self.started) == 3)
+        time.sleep(0.05)
+        self.assertEqual(3, len(self.started))
+        self.assertTrue("b" in self.started)
+        self.assertEqual(job.QUEUED, jobs[2].state)
+        self.release.set()
+        self.wait_for(lambda: jobs[2].state == job.DONE and jb.state == job.DONE)
+
+    def test_queue_full(self):
+        self.classUnderTest = job_executor(workers=1, queue_size=1, retry_after=7)
+        self.classUnderTest.start()
+        j1 = self.classUnderTest.submit("a", "a", "a:1", self.blocking)
+        self.wait_for(lambda: j1.state == job.RUNNING)
+        self.classUnderTest.submit("a", "a", "a:2", self.blocking)
+        with self.assertRaises(JobQueueFullException) as cm:
+            self.classUnderTest.submit("a", "a", "a:3", self.blocking)
+        self.assertEqual(7, cm.exception.retry_after)
+        self.assertEqual(1, self.classUnderTest.get_statistics()["rejected"])
+
+    def test_history(self):
+        self.classUnderTest = job_executor(workers=1, history=2)
+        self.release.set()
+        jobs = [self.classUnderTest.submit("a", "a", "a:%d"%i, self.blocking) for i in range(3)]
+        # Queued jobs are never evicted
+        for j in jobs:
+            self.assertTrue(self.classUnderTest.get_job(j.id) is j)
+
+        self.classUnderTest.start()
+        self.wait_for(lambda: jobs[2].state == job.DONE)
+        self.assertEqual(None, self.classUnderTest.get_job(jobs[0].id))
+        self.assertTrue(self.classUnderTest.get_job(jobs[1].id) is jobs[1])
+        self.assertTrue(self.classUnderTest.get_job(jobs[2].id) is jobs[2])
@@ -451,4 +451,59 @@ class test_matcher(unittest.TestCase):
 
         ifilter = self._manager.from_value(v)
 
-        self.assertEqual(False, self._matcher.match(meta, ifilter.to_xpr()))
\ No newline at end of file
+        self.assertEqual(False, self._matcher.match(meta, ifilter.to_xpr()))
+    def create_compiled_fixture(self):
+        meta = Metadata();
+        meta.add_node("/", Group("what"))
+        meta.add_node("/what", Attribute("source", "WMO:02606,NOD:sekrn"))
+        meta.add_node("/what", Attribute("date", datetime.date(2000, 1, 2)))
+        meta.add_node("/what", Attribute("time", datetime.time(12, 5)))
+        meta.add_node("/what", Attribute("object", "pvol"))
+        meta.add_node("/", Group("dataset1"))
+        meta.add_node("/dataset1", Group("how"))
+        meta.add_node("/dataset1/how", Attribute("malfunc", "False"))
+        meta.add_node("/dataset1", Group("where"))
+        meta.add_node("/dataset1/where", Attribute("elangle", 0.5))
+        meta.add_node("/", Group("dataset2"))
+        meta.add_node("/dataset2", Group("how"))
+        meta.add_node("/dataset2/how", Attribute("malfunc", "True"))
+        meta.bdb_source_name = "sekrn"
+        return meta
+
+    def test_compiled_same_as_matcher(self):
+        meta = self.create_compiled_fixture()
+        values = [
+            {"filter_type": "attribute_filter",  "name": "how/malfunc", "operation": "in", "value_type": "string", "value": ["False"]},
+            {"filter_type": "attribute_filter",  "name": "how/malfunc", "operation": "not_in", "value_type": "string", "value": ["True"]},
+            {"filter_type": "attribute_filter",  "name": "/dataset1/how/malfunc", "operation": "=", "value_type": "string", "value": ["False"]},
+            {"filter_type": "attribute_filter",  "name": "/dataset1/where/elangle", "operation": "=", "value_type": "double", "value": [0.5]},
+            {"filter_type": "attribute_filter",  "name": "/what/object", "operation": "!=", "value_type": "string", "value": ["scan"]},
+            {"filter_type": "attribute_filter",  "name": "what/source:WMO", "operation": "in", "value_type": "string", "value": ["02606"]},
+            {"filter_type": "attribute_filter",  "name": "what/source:RAD", "operation": "in", "value_type": "string", "value": ["SE40"]},
+            {"filter_type": "attribute_filter",  "name": "_bdb/source_name", "operation": "like", "value_type": "string", "value": "se*"},
+            {"filter_type": "attribute_filter",  "name": "_bdb/source_name", "operation": "like", "value_type": "string", "value": ["fi*"]},
+            {"filter_type": "attribute_filter",  "name": "_exchange/time:minute", "operation": "in", "value_type": "string", "value": ["05", "10"]},
+            {"filter_type": "and_filter", "value": [
+                {"filter_type": "attribute_filter",  "name": "/what/object", "operation": "in", "value_type": "string", "value": ["pvol"]},
+                {"filter_type": "attribute_filter",  "name": "/what/date", "operation": "=", "value_type": "string", "value": ["20000102"]}]},
+            {"filter_type": "or_filter", "value": [
+                {"filter_type": "attribute_filter",  "name": "/what/object", "operation": "in", "value_type": "string", "value": ["scan"]},
+                {"filter_type": "attribute_filter",  "name": "/what/time", "operation": "=", "value_type": "string", "value": ["120500"]}]},
+            {"filter_type": "not_filter", "value": {"filter_type": "always_filter", "value": ""}},
+            {"filter_type": "always_filter", "value": ""}
+        ]
+        for v in values:
+            ifilter = self._manager.from_value(v)
+            self.assertEqual(self._matcher.match(meta, ifilter.to_xpr()), ifilter.matches(meta), str(v))
+
+    def test_compiled_precompiles_operands(self):
+        ifilter = self._manager.from_value({"filter_type": "attribute_filter",  "name": "_bdb/source_name", "operation": "in", "value_type": "string", "value": ["sekrn", "sella"]})
+        compiled = ifilter.compiled()
+        self.assertTrue(compiled is ifilter.compiled())
+        values = [c.cell_contents for c in compiled.__closure__ if isinstance(c.cell_contents, frozenset)]
+        self.assertEqual([frozenset(["sekrn", "sella"])], values)
+
+    def test_compiled_to_json(self):
+        ifilter = self._manager.from_value({"filter_type": "attribute_filter",  "name": "_bdb/source_name", "operation": "in", "value_type": "string", "value": ["sekrn"]})
+        ifilter.compiled()
+        self.assertEqual(-1, self._manager.to_json(ifilter).find("_compiled"))
@@ -0,0 +1,110 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.matching.metaindex
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import pytest
+from unittest.mock import MagicMock
+from bexchange.matching import metaindex
+
+class node(object):
+    def __init__(self, path, value=None):
+        self._path = path
+        self.value = value
+
+    def path(self):
+        return self._path
+
+class metadata(object):
+    def __init__(self, paths):
+        self.nodes = [node(p, v) for p, v in paths]
+        self.iternodes = MagicMock(side_effect=lambda: iter(self.nodes))
+        self.node = MagicMock(side_effect=LookupError)
+        self.find_node = MagicMock(return_value=None)
+
+PATHS = [
+    ("/", None),
+    ("/what", None),
+    ("/what/object", "PVOL"),
+    ("/dataset2", None),
+    ("/dataset2/where", None),
+    ("/dataset2/where/elangle", 1.0),
+    ("/dataset2/data1", None),
+    ("/dataset2/data1/what", None),
+    ("/dataset2/data1/what/quantity", "TH"),
+    ("/dataset1", None),
+    ("/dataset1/where", None),
+    ("/dataset1/where/elangle", 0.5),
+    ("/dataset1/data2", None),
+    ("/dataset1/data2/what", None),
+    ("/dataset1/data2/what/quantity", "VRADH"),
+    ("/dataset1/data1", None),
+    ("/dataset1/data1/what", None),
+    ("/dataset1/data1/what/quantity", "DBZH")
+]
+
+class TestMetadataIndex:
+    def test_get_index_created_once(self):
+        meta = metadata(PATHS)
+        index = metaindex.get_index(meta)
+        assert index is metaindex.get_index(meta)
+        assert meta.iternodes.call_count == 1
+
+    def test_find_node(self):
+        meta = metadata(PATHS)
+        assert metaindex.find_node(meta, "/what/object").value == "PVOL"
+        assert metaindex.find_node(meta, "/what/date") is None
+        assert meta.find_node.call_count == 0
+
+    def test_find_node_not_normalized(self):
+        meta = metadata(PATHS)
+        assert metaindex.find_node(meta, "what/object") is None
+        meta.find_node.assert_called_once_with("what/object")
+
+    def test_node(self):
+        meta = metadata(PATHS)
+        assert metaindex.node(meta, "/what/object").value == "PVOL"
+        with pytest.raises(LookupError):
+            metaindex.node(meta, "/what/date")
+
+    def test_find_nodes(self):
+        index = metaindex.metadata_index(metadata(PATHS))
+        assert [n.value for n in index.find_nodes("what/quantity")] == ["TH", "VRADH", "DBZH"]
+        assert [n.value for n in index.find_nodes("data1/what/quantity")] == ["TH", "DBZH"]
+        assert [n.value for n in index.find_nodes("/what/object")] == ["PVOL"]
+        assert [n.value for n in index.find_nodes("object")] == ["PVOL"]
+        assert index.find_nodes("/object") == []
+        assert index.find_nodes("where/nothing") == []
+
+    def test_datasets(self):
+        index = metaindex.metadata_index(metadata(PATHS))
+        assert [i for i, n in index.datasets()] == [1, 2]
+        assert [(i, n.value) for i, n in index.quantities(1)] == [(1, "DBZH"), (2, "VRADH")]
+        assert [(i, n.value) for i, n in index.quantities(2)] == [(1, "TH")]
+        assert index.quantities(3) == []
+        assert [(i, n.value) for i, n in index.elangles()] == [(1, 0.5), (2, 1.0)]
+
+    def test_scan_elangle(self):
+        assert metaindex.metadata_index(metadata(PATHS)).scan_elangle().value == 0.5
+        assert metaindex.metadata_index(metadata([("/where/elangle", 2.0)])).scan_elangle().value == 2.0
+        assert metaindex.metadata_index(metadata([("/what/object", "SCAN")])).scan_elangle() is None
@@ -22,12 +22,12 @@
 ## @author Anders Henja, SMHI
 ## @date 2021-08-18
 import unittest
-from bexchange.naming.namer import metadata_namer, opera_filename_namer, NamerError
+from bexchange.naming.namer import metadata_namer, opera_filename_namer, NamerError, referenced_attribute_names
 from baltrad.bdbcommon import oh5
 from baltrad.bdbcommon.oh5 import Source
 from baltrad.bdbcommon.oh5.node import Attribute, Group
 
-import datetime, os
+import datetime, os, time
 
 THIS_DIR=os.path.dirname(__file__)
 
@@ -224,6 +224,29 @@ class test_namer(unittest.TestCase):
 
         namer.name(meta, fail_on_missing_placeholder=True)
 
+    def test_compiled_once(self):
+        namer = metadata_namer("${/what/object}_${_baltrad/datetime:%Y%m%d}_x")
+        compiled = namer.compile()
+        self.assertEqual(3, len(compiled))
+        self.assertEqual("_x", compiled[2])
+        self.assertTrue(compiled is namer.compile())
+
+        namer.register_operation("_baltrad/opera_filename", None)
+        self.assertFalse(compiled is namer.compile())
+
+    def test_name_benchmark(self):
+        namer = metadata_namer("${_baltrad/datetime:%Y/%m/%d/%H/%M}.interval_u(15)/scan_${_baltrad/source_name}_${/what/date}T${/what/time}.interval_l(15)Z_${/what/object}.tolower().toupper(0)_${/dataset1/data1/what/quantity}_${_baltrad/source:WMO}.h5")
+        meta = self.create_metadata(2000, 1, 1, 12, 7)
+        expected = "2000/01/01/12/15/scan_setst_20000101T120700Z_Pvol_DBZH_12345.h5"
+        self.assertEqual(expected, namer.name(meta))
+
+        iterations = 2000
+        starttime = time.time()
+        for i in range(iterations):
+            namer.name(meta)
+        elapsed = (time.time() - starttime) * 1000000 / iterations
+        self.assertLess(elapsed, 1000, "metadata_namer.name took %.1f us/name"%elapsed)
+
     def create_metadata(self, year, month, day, hour, minute):
         meta = oh5.Metadata()
         meta.add_node("/", Group("what"))
@@ -411,3 +434,13 @@ class test_namer(unittest.TestCase):
         meta = self.create_metadata(2000, 1, 1, 12, 0)
         self.assertEqual("yes_123__20000101_120000", namer.name(meta))
 
+
+    def test_attribute_names(self):
+        namer = metadata_namer("${_baltrad/source_name}_${what/source:NOD}_${/dataset1/where/elangle}_${how/task}.tolower()_${_property:a}_${_baltrad/datetime:%Y%m%d}_$$")
+        self.assertEqual(set(["what/source", "/dataset1/where/elangle", "how/task"]), namer.attribute_names())
+
+        opera_namer = metadata_namer("${_baltrad/opera_filename}")
+        opera_namer.register_operation("_baltrad/opera_filename", opera_filename_namer("_baltrad/opera_filename", None, {"namer_config":{}}))
+        self.assertEqual(set(["what/quantity", "where/elangle"]), opera_namer.attribute_names())
+
+        self.assertTrue("how/task" in referenced_attribute_names())
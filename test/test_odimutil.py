@@ -0,0 +1,147 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.odimutil
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import os
+import pytest
+from tempfile import NamedTemporaryFile
+
+from baltrad.bdbcommon import oh5
+from bexchange import odimutil
+
+class TestMetadataReader:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.files = []
+        yield
+        for f in self.files:
+            if os.path.exists(f):
+                os.unlink(f)
+
+    def create_pvol(self, nrdatasets=10, quantities=["DBZH", "TH", "VRADH"], elangle=0.5):
+        h5py = pytest.importorskip("h5py")
+        numpy = pytest.importorskip("numpy")
+        with NamedTemporaryFile(suffix=".h5", delete=False) as tmpf:
+            self.files.append(tmpf.name)
+        with h5py.File(tmpf.name, "w") as f:
+            f.attrs["Conventions"] = numpy.bytes_("ODIM_H5/V2_2")
+            what = f.create_group("what")
+            what.attrs["object"] = numpy.bytes_("PVOL")
+            what.attrs["source"] = numpy.bytes_("NOD:sella,WMO:02092")
+            what.attrs["date"] = numpy.bytes_("20260101")
+            what.attrs["time"] = numpy.bytes_("120000")
+            for i in range(1, nrdatasets + 1):
+                where = f.create_group(f"dataset{i}/where")
+                where.attrs["elangle"] = elangle * i
+                where.attrs["nbins"] = numpy.int64(480)
+                for j, q in enumerate(quantities, 1):
+                    data = f.create_group(f"dataset{i}/data{j}")
+                    data.create_group("what").attrs["quantity"] = numpy.bytes_(q)
+                    data.create_dataset("data", data=numpy.zeros((10, 10), dtype=numpy.uint8))
+        return tmpf.name
+
+    def test_is_wanted(self):
+        reader = odimutil.metadata_reader(["what/quantity", "/how/task"])
+        assert reader.is_wanted("/dataset1/data1/what/quantity")
+        assert reader.is_wanted("/how/task")
+        assert not reader.is_wanted("/dataset1/how/task")
+        assert reader.is_wanted("/what/source")
+        assert reader.is_wanted("/dataset1/where/elangle")
+        assert not reader.is_wanted("/dataset2/where/elangle")
+        assert odimutil.metadata_reader().is_wanted("/dataset2/where/elangle")
+
+    def test_create_metadata_reader(self):
+        assert odimutil.create_metadata_reader("bdb") is None
+        with pytest.raises(RuntimeError):
+            odimutil.create_metadata_reader("nisse")
+
+    def test_h5py_reader(self):
+        path = self.create_pvol()
+        meta, size = odimutil.h5py_metadata_reader().read(path)
+        assert size == os.stat(path).st_size
+        assert "PVOL" == meta.node("/what/object").value
+        assert "NOD:sella,WMO:02092" == meta.node("/what/source").value
+        assert 480 == meta.node("/dataset10/where/nbins").value
+        assert "VRADH" == meta.node("/dataset10/data3/what/quantity").value
+        assert meta.find_node("/dataset1/data1/data") is not None
+
+    def test_h5py_reader_same_as_bdb(self):
+        pytest.importorskip("_pyhl")
+        path = self.create_pvol()
+        expected = oh5.Metadata.from_file(path)
+        meta, size = odimutil.h5py_metadata_reader().read(path)
+        assert sorted(n.path() for n in expected.iternodes()) == sorted(n.path() for n in meta.iternodes())
+        hasher = oh5.MetadataHasher()
+        assert hasher.hash(expected) == hasher.hash(meta)
+
+    def test_h5py_reader_restricted(self):
+        path = self.create_pvol()
+        meta, size = odimutil.h5py_metadata_reader(["what/quantity"]).read(path)
+        assert "PVOL" == meta.node("/what/object").value
+        assert "VRADH" == meta.node("/dataset10/data3/what/quantity").value
+        assert meta.find_node("/dataset10/where/nbins") is None
+        assert meta.find_node("/dataset2/where/elangle") is None
+        assert 0.5 == meta.node("/dataset1/where/elangle").value
+
+    def test_h5py_reader_restricted_same_as_unrestricted(self):
+        path = self.create_pvol()
+        expected, size = odimutil.h5py_metadata_reader().read(path)
+        meta, size = odimutil.h5py_metadata_reader(["what/quantity"]).read(path)
+        attributes = [n for n in meta.iternodes() if isinstance(n, oh5.Attribute)]
+        assert len(attributes) > 0
+        for n in attributes:
+            assert expected.node(n.path()).value == n.value
+
+    def test_h5py_reader_restricted_hash(self):
+        path = self.create_pvol()
+        hasher = oh5.MetadataHasher()
+        expected = odimutil.h5py_metadata_reader().read_hashed(path, hasher)[2]
+        assert expected == hasher.hash(odimutil.h5py_metadata_reader().read(path)[0])
+        assert expected == odimutil.h5py_metadata_reader(["what/quantity"]).read_hashed(path, hasher)[2]
+        assert expected == odimutil.h5py_metadata_reader([]).read_hashed(path, hasher)[2]
+
+        # Files that only differs in attributes that are not read must still get different hashes
+        reader = odimutil.h5py_metadata_reader([])
+        other_quantities = reader.read_hashed(self.create_pvol(quantities=["DBZH", "TH", "WRADH"]), hasher)[2]
+        other_elangles = reader.read_hashed(self.create_pvol(elangle=0.7), hasher)[2]
+        assert len(set([expected, other_quantities, other_elangles])) == 3
+
+    def test_h5py_reader_restricted_hash_same_as_bdb(self):
+        pytest.importorskip("_pyhl")
+        path = self.create_pvol()
+        hasher = oh5.MetadataHasher()
+        expected = hasher.hash(oh5.Metadata.from_file(path))
+        assert expected == odimutil.h5py_metadata_reader().read_hashed(path, hasher)[2]
+        assert expected == odimutil.h5py_metadata_reader(["what/quantity"]).read_hashed(path, hasher)[2]
+
+    def test_h5py_reader_array_attributes(self):
+        path = self.create_pvol(nrdatasets=1)
+        h5py = pytest.importorskip("h5py")
+        numpy = pytest.importorskip("numpy")
+        with h5py.File(path, "a") as f:
+            f["dataset1/where"].attrs["angles"] = numpy.array([0.5, 1.0])
+            f["dataset1/where"].attrs["names"] = numpy.array([b"a", b"b"])
+        meta, size = odimutil.h5py_metadata_reader().read(path)
+        assert [0.5, 1.0] == meta.node("/dataset1/where/angles").value
+        assert ["a", "b"] == meta.node("/dataset1/where/names").value
@@ -0,0 +1,127 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.net.publishers
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+import unittest
+import threading
+import time
+from tempfile import NamedTemporaryFile
+from unittest.mock import MagicMock
+
+from bexchange.net.publishers import standard_publisher, pubSlot
+
+class test_publishers(unittest.TestCase):
+    def setUp(self):
+        self.backend = MagicMock()
+        self.backend.get_spool.return_value = None
+        self.backend.get_tmp_folder.return_value = None
+        self.backend.get_decoration_cache.return_value = None
+        self.file = NamedTemporaryFile()
+        self.file.write(b"data")
+        self.file.flush()
+        self.publishers = []
+
+    def tearDown(self):
+        for p in self.publishers:
+            p.stop()
+        self.file.close()
+
+    def create_publisher(self, connection, config, arguments={}):
+        p = standard_publisher(self.backend, "pub", True, [], MagicMock(), [connection], [], arguments)
+        p.set_configuration(config)
+        return p
+
+    def wait_for(self, mock_method, count=1):
+        for i in range(100):
+            if mock_method.call_count >= count:
+                return
+            time.sleep(0.01)
+        self.fail("Timeout waiting for call")
+
+    def test_take_over_same_connection(self):
+        c1 = MagicMock()
+        c2 = MagicMock()
+        old = self.create_publisher(c1, {"connection":{"class":"a"}, "filter":1})
+        old.start()
+        new = self.create_publisher(c2, {"connection":{"class":"a"}, "filter":2})
+
+        self.assertTrue(new.take_over(old))
+        self.publishers.append(new)
+
+        self.assertEqual([c1], new.connections())
+        c2.stop.assert_called_once()
+
+        new.publish(self.file.name, "meta")
+        self.wait_for(c1.publish)
+        self.assertEqual("meta", c1.publish.call_args[0][1])
+
+        old.release(new)
+        c1.stop.assert_not_called()
+
+    def test_take_over_new_connection(self):
+        c1 = MagicMock()
+        c2 = MagicMock()
+        old = self.create_publisher(c1, {"connection":{"class":"a"}})
+        old.start()
+        new = self.create_publisher(c2, {"connection":{"class":"b"}})
+
+        self.assertTrue(new.take_over(old))
+        self.publishers.append(new)
+
+        # Files published to the previous publisher are put on the shared queue
+        old.publish(self.file.name, "meta")
+        self.wait_for(c2.publish)
+        c1.publish.assert_not_called()
+
+        old.release(new)
+        c1.stop.assert_called_once()
+        c2.stop.assert_not_called()
+
+    def test_take_over_different_threads(self):
+        old = self.create_publisher(MagicMock(), {}, {"threads":1})
+        old.start()
+        self.publishers.append(old)
+        new = self.create_publisher(MagicMock(), {}, {"threads":2})
+        self.assertFalse(new.take_over(old))
+
+    def test_take_over_not_started(self):
+        old = self.create_publisher(MagicMock(), {})
+        new = self.create_publisher(MagicMock(), {})
+        self.assertFalse(new.take_over(old))
+
+class test_pubSlot(unittest.TestCase):
+    def test_wait_idle(self):
+        p1 = object()
+        p2 = object()
+        slot = pubSlot(p1)
+        self.assertTrue(slot.acquire() is p1)
+        slot.replace(p2)
+        self.assertTrue(slot.acquire() is p2)
+
+        t = threading.Thread(target=slot.wait_idle, args=(p1,))
+        t.start()
+        t.join(0.05)
+        self.assertTrue(t.is_alive())
+        slot.done(p1)
+        t.join(1)
+        self.assertFalse(t.is_alive())
+        slot.wait_idle(p1)
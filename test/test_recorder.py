@@ -0,0 +1,120 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.statistics.recorder
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from bexchange.statistics.recorder import statistics_recorder
+
+class TestStatisticsRecorder(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+        self.classUnderTest = statistics_recorder(self.db, 3600, 2)
+
+    def tearDown(self):
+        self.classUnderTest.stop()
+        self.classUnderTest = None
+
+    def test_increment_aggregates(self):
+        self.classUnderTest.increment("server-incomming", "node1", "sekkr")
+        self.classUnderTest.increment("server-incomming", "node1", "sekkr")
+        self.classUnderTest.increment("server-incomming", "node1", "sella")
+
+        self.classUnderTest.flush()
+
+        self.db.increment_statistics_batch.assert_called_once_with({("server-incomming", "node1", "sekkr"):2, ("server-incomming", "node1", "sella"):1})
+        self.db.add_statentries.assert_not_called()
+        stats = self.classUnderTest.get_statistics()
+        self.assertEqual(0, stats["pending_counters"])
+        self.assertEqual(2, stats["counters_written"])
+        self.assertEqual(1, stats["flushes"])
+
+    def test_add_bounded(self):
+        self.assertTrue(self.classUnderTest.add("e1"))
+        self.assertTrue(self.classUnderTest.add("e2"))
+        self.assertFalse(self.classUnderTest.add("e3"))
+
+        self.classUnderTest.flush()
+
+        self.db.add_statentries.assert_called_once_with(["e1", "e2"])
+        stats = self.classUnderTest.get_statistics()
+        self.assertEqual(1, stats["dropped"])
+        self.assertEqual(2, stats["entries_written"])
+        self.assertTrue(self.classUnderTest.add("e4"))
+
+    def test_flush_nothing(self):
+        self.classUnderTest.flush()
+        self.db.increment_statistics_batch.assert_not_called()
+        self.assertEqual(0, self.classUnderTest.get_statistics()["flushes"])
+
+    def test_failed_counters_are_kept(self):
+        self.db.increment_statistics_batch.side_effect = Exception("database is locked")
+        self.classUnderTest.increment("server-incomming", "node1", "sekkr")
+        self.classUnderTest.flush()
+
+        stats = self.classUnderTest.get_statistics()
+        self.assertEqual(1, stats["failures"])
+        self.assertEqual(1, stats["pending_counters"])
+
+        self.db.increment_statistics_batch.side_effect = None
+        self.classUnderTest.increment("server-incomming", "node1", "sekkr")
+        self.classUnderTest.flush()
+        self.db.increment_statistics_batch.assert_called_with({("server-incomming", "node1", "sekkr"):2})
+
+    def test_stop_flushes(self):
+        self.classUnderTest.start()
+        self.classUnderTest.increment("server-incomming", "node1", "sekkr")
+        self.classUnderTest.stop()
+        self.db.increment_statistics_batch.assert_called_once_with({("server-incomming", "node1", "sekkr"):1})
+
+class TestStatisticsRecorderDatabase(unittest.TestCase):
+    def setUp(self):
+        from bexchange.db import sqldatabase
+        self.sqldatabase = sqldatabase
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = sqldatabase.SqlAlchemyDatabase("sqlite:///%s"%os.path.join(self.tmpdir, "statistics.db"))
+
+    def tearDown(self):
+        self.db = None
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_write_behind(self):
+        recorder = statistics_recorder(self.db, 0.05)
+        recorder.start()
+        try:
+            for i in range(10):
+                recorder.increment("server-incomming", "node1", "sekkr")
+                recorder.add(self.sqldatabase.statentry("server-incomming", "node1", "sekkr", "hash%d"%i, datetime(2026,1,1,0,0,i)))
+        finally:
+            recorder.stop()
+
+        entries = self.db.find_statistics("server-incomming", ["node1"], ["sekkr"])
+        self.assertEqual(10, entries[0].counter)
+        self.assertEqual(10, len(self.db.find_statentries("server-incomming", [], [])))
+        self.assertEqual(0, recorder.get_statistics()["pending_entries"])
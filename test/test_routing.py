@@ -0,0 +1,120 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.matching.routing
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import pytest
+from unittest.mock import MagicMock
+from types import SimpleNamespace
+from bexchange.matching.routing import routing_index
+
+class attribute_filter(object):
+    def __init__(self, name, op, value):
+        self.filter_type = "attribute_filter"
+        self.name = name
+        self.operation = op
+        self.value_type = "string"
+        self.value = value
+
+class and_filter(object):
+    def __init__(self, childs):
+        self.filter_type = "and_filter"
+        self.value = childs
+
+class always_filter(object):
+    def __init__(self):
+        self.filter_type = "always_filter"
+
+class TestRoutingIndex:
+    def create_meta(self, source_name, obj, source={}):
+        return SimpleNamespace(bdb_source_name=source_name, what_object=obj, source=lambda: source)
+
+    def create_index(self, filters, matcher=None, fallback=None):
+        if matcher is None:
+            matcher = MagicMock(return_value=True)
+        if fallback is None:
+            fallback = MagicMock(return_value=True)
+        items = [SimpleNamespace(name="item-%d"%i, filter=f) for i, f in enumerate(filters)]
+        return items, routing_index(items, lambda i: i.filter, matcher, fallback)
+
+    def test_match_source_name(self):
+        items, classUnderTest = self.create_index([
+            and_filter([attribute_filter("_bdb/source_name", "in", ["sehem", "seang"])]),
+            and_filter([attribute_filter("_bdb/source_name", "=", ["sella"])])
+        ])
+        assert classUnderTest.match(self.create_meta("sehem", "PVOL")) == [items[0]]
+        assert classUnderTest.match(self.create_meta("sella", "PVOL")) == [items[1]]
+        assert classUnderTest.match(self.create_meta("sekrn", "PVOL")) == []
+
+    def test_match_residual(self):
+        objfilter = attribute_filter("/what/object", "=", ["SCAN"])
+        matcher = MagicMock(return_value=False)
+        items, classUnderTest = self.create_index([
+            and_filter([objfilter, attribute_filter("_bdb/source_name", "in", ["sehem"])])
+        ], matcher=matcher)
+        meta = self.create_meta("sehem", "PVOL")
+
+        assert classUnderTest.match(meta) == []
+
+        residual = matcher.call_args[0][1]
+        assert residual.filter_type == "and_filter"
+        assert residual.value == [objfilter]
+        assert classUnderTest.get_statistics()["keys"]["_bdb/source_name"]["bucket_sizes"] == {"sehem":1}
+
+    def test_match_what_source(self):
+        items, classUnderTest = self.create_index([
+            attribute_filter("what/source:WMO", "in", ["02606"]),
+            attribute_filter("/what/object", "in", ["PVOL"]),
+        ])
+        assert classUnderTest.match(self.create_meta("sehem", "PVOL", {"WMO":"02606"})) == items
+        assert classUnderTest.match(self.create_meta("sehem", "SCAN", {"WMO":"02606"})) == [items[0]]
+        assert classUnderTest.match(self.create_meta("sehem", "SCAN", {})) == []
+
+    def test_match_unindexed_keeps_order(self):
+        fallback = MagicMock(side_effect=lambda meta, item: item.name == "item-0")
+        items, classUnderTest = self.create_index([
+            attribute_filter("/what/date", "=", ["20260101"]),
+            always_filter(),
+            attribute_filter("_bdb/source_name", "in", ["sehem"]),
+            None
+        ], fallback=fallback)
+        assert classUnderTest.match(self.create_meta("sehem", "PVOL")) == items
+        assert classUnderTest.match(self.create_meta("seang", "PVOL")) == [items[0], items[1], items[3]]
+        assert classUnderTest.get_statistics()["unindexed"] == 3
+
+    def test_not_indexable(self):
+        fallback = MagicMock(return_value=False)
+        items, classUnderTest = self.create_index([
+            attribute_filter("_bdb/source_name", "in", "sehem,seang"),
+            attribute_filter("_bdb/source_name", "=", ["sehem", "seang"]),
+            attribute_filter("_bdb/source_name", "like", ["se*"]),
+        ], fallback=fallback)
+        assert classUnderTest.match(self.create_meta("sehem", "PVOL")) == []
+        assert fallback.call_count == 3
+
+    def test_is_current(self):
+        items, classUnderTest = self.create_index([always_filter()])
+        assert classUnderTest.is_current(items)
+        assert not classUnderTest.is_current(list(items))
+        items.append(SimpleNamespace(name="item-1", filter=always_filter()))
+        assert not classUnderTest.is_current(items)
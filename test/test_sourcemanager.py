@@ -24,8 +24,9 @@
 from __future__ import absolute_import
 
 import pytest
+from unittest.mock import MagicMock
 from bexchange.matching import filters
-from bexchange.server import sqlbackend
+from bexchange.server import sqlbackend, sourceresolver
 
 from baltrad.bdbcommon import oh5, expr
 from baltrad.bdbcommon.oh5.meta import Source
@@ -88,3 +89,75 @@ class TestSourceManager:
         assert("se"==source.name)
         assert("ESWI"==source["CCCC"])
         assert("82"==source["ORG"])
+
+class TestMemorySourceManager:
+    SOURCE_FIXTURE=f"{THIS_DIR}/fixtures/odim_source.xml"
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.sqlsourcemanager = sqlbackend.SqlAlchemySourceManager("sqlite://")
+        with open(self.SOURCE_FIXTURE) as f:
+            self.sqlsourcemanager.add_sources(oh5.Source.from_rave_xml(f.read()))
+        self.sourcemanager = sourceresolver.MemorySourceManager(self.sqlsourcemanager, 10)
+
+        yield
+
+        self.sourcemanager = None
+        self.sqlsourcemanager = None
+
+    def create_metadata(self, what_source):
+        meta = oh5.Metadata()
+        meta.add_node("/", Group("what"))
+        meta.add_node("/what", Attribute("source", what_source))
+        return meta
+
+    def test_get_source_without_parent(self):
+        source = self.sourcemanager.get_source(self.create_metadata("NOD:sella"))
+        assert("sella"==source["NOD"])
+        assert("SE41"==source["RAD"])
+        assert("02092"==source["WMO"])
+        assert("se"==source.parent)
+        assert(source.parent_object is None)
+
+    def test_get_source_with_parent(self):
+        source = self.sourcemanager.get_source(self.create_metadata("NOD:sella"), True)
+        assert("sella"==source["NOD"])
+        assert("se"==source.parent)
+        assert("ESWI"==source.parent_object["CCCC"])
+        assert("82"==source.parent_object["ORG"])
+
+    def test_get_source_not_found(self):
+        with pytest.raises(LookupError):
+            self.sourcemanager.get_source(self.create_metadata("NOD:xxxxx"))
+
+    def test_get_source_same_as_sql(self):
+        for what_source in ["NOD:sella", "WMO:02092", "RAD:SE41,ORG:82", "ORG:82,NOD:sella", "WMO:02092,PLC:Luleå", "NOD:sella,CMT:abc"]:
+            meta = self.create_metadata(what_source)
+            expected = self.sqlsourcemanager.get_source(meta, True)
+            source = self.sourcemanager.get_source(meta, True)
+            assert expected.name == source.name
+            assert expected.to_string() == source.to_string()
+            assert expected.parent_object.to_string() == source.parent_object.to_string()
+
+    def test_get_source_ambiguous(self):
+        manager = MagicMock()
+        manager.get_sources.return_value = [oh5.Source("s1", {"NOD":"s1", "PLC":"same"}), oh5.Source("s2", {"NOD":"s2", "PLC":"same"})]
+        sourcemanager = sourceresolver.MemorySourceManager(manager)
+        with pytest.raises(LookupError):
+            sourcemanager.get_source(self.create_metadata("PLC:same"))
+        assert("s2"==sourcemanager.get_source(self.create_metadata("PLC:same,NOD:s2")).name)
+
+    def test_get_source_cached(self):
+        self.sourcemanager.get_source(self.create_metadata("NOD:sella"))
+        self.sourcemanager.get_source(self.create_metadata("NOD:sella"))
+        stats = self.sourcemanager.get_statistics()
+        assert(1==stats["hits"])
+        assert(1==stats["misses"])
+        assert(1==stats["cached"])
+
+    def test_get_parent_source(self):
+        source = self.sourcemanager.get_parent_source("se")
+        assert("se"==source.name)
+        assert("ESWI"==source["CCCC"])
+        assert("82"==source["ORG"])
+        with pytest.raises(LookupError):
+            self.sourcemanager.get_parent_source("sella")
@@ -0,0 +1,106 @@
+# Copyright (C) 2026- Swedish Meteorological and Hydrological Institute (SMHI)
+#
+# This file is part of baltrad-exchange.
+#
+# baltrad-exchange is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# baltrad-exchange is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with baltrad-exchange.  If not, see <http://www.gnu.org/licenses/>.
+###############################################################################
+
+## Tests bexchange.server.spool
+
+## @file
+## @author Anders Henja, SMHI
+## @date 2026-10-16
+from __future__ import absolute_import
+
+import os
+import pytest
+from tempfile import TemporaryDirectory
+from bexchange.server.spool import spool_manager
+
+class TestSpoolManager:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.tmpdir = TemporaryDirectory()
+        self.spooldir = os.path.join(self.tmpdir.name, "spool")
+        self.path = os.path.join(self.tmpdir.name, "incomming.h5")
+        with open(self.path, "wb") as fp:
+            fp.write(b"0123456789")
+        yield
+        self.tmpdir.cleanup()
+
+    def test_acquire(self):
+        classUnderTest = spool_manager(self.spooldir)
+        handle = classUnderTest.acquire(self.path, "hash")
+        assert handle.name.startswith(self.spooldir)
+        with open(handle.name, "rb") as fp:
+            assert b"0123456789" == fp.read()
+        stats = classUnderTest.get_statistics()
+        assert 1 == stats["files"]
+        assert 10 == stats["size"]
+        assert 1 == stats["references"]
+        assert 1 == stats["linked"]
+        handle.close()
+        assert not os.path.exists(handle.name)
+        assert os.path.exists(self.path)
+        assert 0 == classUnderTest.get_statistics()["files"]
+
+    def test_acquire_shared(self):
+        classUnderTest = spool_manager(self.spooldir)
+        h1 = classUnderTest.acquire(self.path, "hash")
+        h2 = classUnderTest.acquire(self.path, "hash")
+        h3 = classUnderTest.acquire(h1.name)
+        assert h1.name == h2.name
+        assert h1.name == h3.name
+        stats = classUnderTest.get_statistics()
+        assert 1 == stats["files"]
+        assert 3 == stats["references"]
+        assert 2 == stats["shared"]
+        h1.close()
+        h1.close()
+        h2.close()
+        assert os.path.exists(h3.name)
+        h3.close()
+        assert not os.path.exists(h3.name)
+
+    def test_acquire_removed_original(self):
+        classUnderTest = spool_manager(self.spooldir)
+        handle = classUnderTest.acquire(self.path, "hash")
+        os.unlink(self.path)
+        with open(handle.name, "rb") as fp:
+            assert b"0123456789" == fp.read()
+        handle.close()
+
+    def test_acquire_copy(self):
+        classUnderTest = spool_manager(self.spooldir, use_links=False)
+        with classUnderTest.acquire(self.path) as handle:
+            assert os.stat(handle.name).st_ino != os.stat(self.path).st_ino
+        assert 1 == classUnderTest.get_statistics()["copied"]
+        assert 0 == classUnderTest.get_statistics()["files"]
+
+    def test_leaked(self):
+        classUnderTest = spool_manager(self.spooldir)
+        handle = classUnderTest.acquire(self.path, "hash")
+        name = handle.name
+        del handle
+        assert not os.path.exists(name)
+        stats = classUnderTest.get_statistics()
+        assert 1 == stats["leaked"]
+        assert 0 == stats["references"]
+
+    def test_removes_left_over_files(self):
+        os.makedirs(self.spooldir)
+        with open(os.path.join(self.spooldir, "old.h5"), "wb") as fp:
+            fp.write(b"x")
+        spool_manager(self.spooldir)
+        assert [] == os.listdir(self.spooldir)
@@ -130,3 +130,157 @@ class TestSqlDatabase(unittest.TestCase):
         entries = self._database.find_statentries("abcd", [], [], hashid=None, filters=[["delay","<", 2], ["datetime",">", datetime(2023,11,27,1,15,0)]], object_type=None)
         self.assertEqual(0, len(entries))
 
+
+    def test_increment_statistics_batch(self):
+        self._database.add(sqldatabase.statistics("abc", "myorigin", "sekkr", 1, datetime.now()))
+
+        self._database.increment_statistics_batch({("abc", "myorigin", "sekkr"):3, ("abc", "myorigin", "sella"):2})
+
+        entries = self._database.find_statistics("abc", ["myorigin"], ["sekkr"])
+        self.assertEqual(4, entries[0].counter)
+        entries = self._database.find_statistics("abc", ["myorigin"], ["sella"])
+        self.assertEqual(2, entries[0].counter)
+
+    def test_add_statentries(self):
+        self._database.add_statentries([
+            sqldatabase.statentry("abcd", "myorigin", "sella", '123123', datetime(2023,11,27,1,15,31), 10, None, 31, datetime(2023,11,27,1,15,0), 'SCAN', 0.5),
+            sqldatabase.statentry("abcd", "myorigin", "sella", '123124', datetime(2023,11,27,1,15,32), 10, None, 32, datetime(2023,11,27,1,15,0), 'SCAN', 1.0)])
+
+        entries = self._database.find_statentries("abcd", [], [])
+        self.assertEqual(2, len(entries))
+        self.assertEqual("123123", entries[0].hashid)
+        self.assertAlmostEqual(1.0, entries[1].elevation_angle)
+
+    def test_add_statentries_duplicate(self):
+        self._database.add_statentries([
+            sqldatabase.statentry("abcd", "myorigin", "sella", '123123', datetime(2023,11,27,1,15,31), 10, None, 31, datetime(2023,11,27,1,15,0), 'SCAN', 0.5),
+            sqldatabase.statentry("abcd", "myorigin", "sella", '123123', datetime(2023,11,27,1,15,31), 10, None, 31, datetime(2023,11,27,1,15,0), 'SCAN', 0.5),
+            sqldatabase.statentry("abcd", "myorigin", "sella", '123124', datetime(2023,11,27,1,15,32), 10, None, 32, datetime(2023,11,27,1,15,0), 'SCAN', 1.0)])
+
+        entries = self._database.find_statentries("abcd", [], [])
+        self.assertEqual(2, len(entries))
+
+    def test_find_statentries_paged(self):
+        for i in range(5):
+            self._database.add(sqldatabase.statentry("abcd", "myorigin", "sella", '12312%d'%i, datetime(2023,11,27,1,15,i), 10, None, 31, datetime(2023,11,27,1,15,0), 'SCAN', 0.5))
+
+        entries = self._database.find_statentries("abcd", [], [], limit=2)
+        self.assertEqual(["123120", "123121"], [e.hashid for e in entries])
+        self.assertEqual(entries[1].id, entries[1].json_repr()["id"])
+
+        entries = self._database.find_statentries("abcd", [], [], after_id=entries[1].id, limit=2)
+        self.assertEqual(["123122", "123123"], [e.hashid for e in entries])
+
+        entries = self._database.find_statentries("abcd", [], [], after_id=entries[1].id, limit=2)
+        self.assertEqual(["123124"], [e.hashid for e in entries])
+
+        entries = self._database.find_statentries("abcd", [], [], after_id=entries[0].id)
+        self.assertEqual(0, len(entries))
+
+    def test_cleanup_statentries_limit(self):
+        for i in range(5):
+            self._database.add(sqldatabase.statentry("abcd", "myorigin", "sella", '12312%d'%i, datetime(2023,11,27,1,15,i), 10, None, 31, datetime(2023,11,27,1,15,0), 'SCAN', 0.5))
+        self._database.add(sqldatabase.statentry("abcd", "myorigin", "sella", '123130', datetime(2023,11,28,1,15,0), 10, None, 31, datetime(2023,11,28,1,15,0), 'SCAN', 0.5))
+
+        self.assertEqual(2, self._database.cleanup_statentries(datetime(2023,11,28,0,0,0), 2))
+        self.assertEqual(4, len(self._database.find_statentries("abcd", [], [])))
+        self.assertEqual(3, self._database.cleanup_statentries(datetime(2023,11,28,0,0,0)))
+        self.assertEqual(0, self._database.cleanup_statentries(datetime(2023,11,28,0,0,0), 2))
+        self.assertEqual(["123130"], [e.hashid for e in self._database.find_statentries("abcd", [], [])])
+
+class TestSqlDatabaseMigration(unittest.TestCase):
+    def setUp(self):
+        self._dbfile = NamedTemporaryFile(suffix=".db")
+
+    def tearDown(self):
+        self._dbfile.close()
+
+    def test_migrate_indexes(self):
+        import sqlite3
+        conn = sqlite3.connect(self._dbfile.name)
+        conn.execute("CREATE TABLE exchange_statentry (id INTEGER NOT NULL, spid TEXT NOT NULL, origin TEXT NOT NULL, source TEXT, hashid TEXT, entrytime TIMESTAMP NOT NULL, optime INTEGER NOT NULL, delay INTEGER NOT NULL, optime_info TEXT, datetime DATETIME, object_type TEXT, elevation_angle FLOAT, PRIMARY KEY (id), UNIQUE (spid, origin, source, entrytime))")
+        conn.commit()
+        conn.close()
+
+        sqldatabase.SqlAlchemyDatabase("sqlite:///%s"%self._dbfile.name)
+
+        conn = sqlite3.connect(self._dbfile.name)
+        indexes = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='exchange_statentry'")]
+        plan = " ".join([str(r) for r in conn.execute("EXPLAIN QUERY PLAN SELECT * FROM exchange_statentry WHERE spid='server-incomming' AND source='sella' AND datetime > '2023-11-27'")])
+        conn.close()
+        self.assertTrue("exchange_statentry_spid_source_datetime_idx" in indexes)
+        self.assertTrue("exchange_statentry_spid_datetime_idx" in indexes)
+        self.assertTrue("exchange_statentry_entrytime_idx" in indexes)
+        self.assertTrue("exchange_statentry_spid_source_datetime_idx" in plan)
+
+        # Running the migration again should not fail
+        sqldatabase.SqlAlchemyDatabase("sqlite:///%s"%self._dbfile.name)
+
+class TestSqliteProfile(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def create_database(self, name, profile=None):
+        return sqldatabase.SqlAlchemyDatabase("sqlite:///%s"%os.path.join(self._tmpdir, name), sqlite_profile=profile)
+
+    def test_pragmas(self):
+        from bexchange.db import util as dbutil
+        db = self.create_database("profile.db", dbutil.sqlite_profile(busy_timeout=2000, cache_size=-1000))
+        with db.get_connection() as conn:
+            self.assertEqual("wal", conn.exec_driver_sql("pragma journal_mode").scalar())
+            self.assertEqual(1, conn.exec_driver_sql("pragma synchronous").scalar())
+            self.assertEqual(2000, conn.exec_driver_sql("pragma busy_timeout").scalar())
+            self.assertEqual(-1000, conn.exec_driver_sql("pragma cache_size").scalar())
+            self.assertEqual(1, conn.exec_driver_sql("pragma foreign_keys").scalar())
+
+    def test_memory_database_not_affected(self):
+        from bexchange.db import util as dbutil
+        db = sqldatabase.SqlAlchemyDatabase("sqlite:///:memory:", sqlite_profile=dbutil.sqlite_profile())
+        with db.get_connection() as conn:
+            self.assertEqual("memory", conn.exec_driver_sql("pragma journal_mode").scalar())
+
+    def test_from_conf(self):
+        from bexchange.db import util as dbutil
+        conf = MagicMock()
+        conf.get_boolean.return_value = False
+        self.assertEqual(None, dbutil.sqlite_profile.from_conf(conf))
+
+        conf.get_boolean.return_value = True
+        conf.get.side_effect = lambda key, default: {"synchronous":"full"}.get(key, default)
+        conf.get_int.side_effect = lambda key, default: {"poolsize":4}.get(key, default)
+        profile = dbutil.sqlite_profile.from_conf(conf)
+        self.assertEqual("wal", profile.journal_mode)
+        self.assertEqual("full", profile.synchronous)
+        self.assertEqual(5000, profile.busy_timeout)
+        self.assertEqual(4, profile.poolsize)
+
+    def insert_throughput(self, db, nthreads=4, count=50):
+        import threading, time
+        def insert(tid):
+            for i in range(count):
+                db.add(sqldatabase.statentry("server-incomming", "node%d"%tid, "sella", "hash%d"%i, datetime(2026,1,1,0,0,0,i)))
+        threads = [threading.Thread(target=insert, args=(t,)) for t in range(nthreads)]
+        starttime = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - starttime
+        self.assertEqual(nthreads*count, len(db.find_statentries("server-incomming", [], [])))
+        return nthreads*count / elapsed
+
+    def test_insert_benchmark(self):
+        from bexchange.db import util as dbutil
+        # Without the profile concurrent writers might fail with database is locked so only one thread is used
+        before = self.insert_throughput(self.create_database("default.db"), 1, 200)
+        after = self.insert_throughput(self.create_database("profile.db", dbutil.sqlite_profile()), 4, 50)
+        msg = "statentry inserts: %.0f/s default, %.0f/s with sqlite profile and 4 threads"%(before, after)
+        # Concurrent writers with the profile should at least keep up with a single writer without it. The margin
+        # is there to avoid failures on loaded build machines.
+        self.assertGreater(after, before * 0.5, msg)
+        self.assertGreater(after, 50, msg)